@@ -0,0 +1,166 @@
+# dashboard_agregados.py - Agregados incrementales para /api/dashboard_stats
+
+import heapq
+import math
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+
+from backend.models.historial_columnar import fechas_unicas
+from backend.utils.lazy_import import ModuloPerezoso
+
+pd = ModuloPerezoso('pandas')
+
+
+def _num(valor):
+    """Convierte a float como pd.to_numeric(errors='coerce'); None si no es numérico."""
+    try:
+        v = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(v) else v
+
+def _numerica(serie):
+    if not pd.api.types.is_numeric_dtype(serie): serie = pd.to_numeric(serie, errors='coerce')
+    return serie.astype('float64')
+
+def _es_nulo(valor):
+    return valor is None or (isinstance(valor, float) and math.isnan(valor))
+
+def _fecha(valor):
+    if isinstance(valor, datetime): return valor.date()
+    if isinstance(valor, date): return valor
+    # 'YYYY-MM-DD' (lo que escriben el registro y la importación) sin pasar por pandas: ~100x más rápido por fila
+    if isinstance(valor, str) and len(valor) == 10:
+        try: return date.fromisoformat(valor)
+        except ValueError: pass
+    ts = pd.to_datetime(valor, errors='coerce')
+    return None if pd.isna(ts) else ts.date()
+
+
+class AgregadosDashboard:
+    """
+    Estado agregado del historial que se actualiza con cada sesión registrada,
+    de modo que el dashboard se responde en O(1) / O(top-k) sin recorrer el CSV.
+    `firma` indica a qué versión del archivo corresponde; si no coincide con la
+    actual (escritura externa) hay que reconstruir desde el DataFrame.
+    """
+
+    TOP_MATERIAS = 5
+    VENTANA_ENERGIA = 7
+    MAX_FILAS_INCREMENTAL = 1000   # lotes más grandes: reconstrucción vectorizada en la próxima lectura
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.firma = None
+        self.sesiones = 0
+        self.total_horas = 0.0
+        self.suma_energia = 0.0
+        self.exitos = 0
+        self.pomodoros = 0
+        self.maraton = False
+        self.horas_materia = {}
+        self.ultimas_energias = deque(maxlen=self.VENTANA_ENERGIA)
+        self.fechas = set()
+        self.fecha_max = None
+
+    # --- ACTUALIZACIÓN ---
+    def vigente(self, firma):
+        with self._lock:
+            return self.firma is not None and self.firma == firma
+
+    def reconstruir(self, df, firma):
+        """Carga completa (vectorizada) desde el DataFrame del historial."""
+        with self._lock:
+            self._reiniciar()
+            self.firma = firma
+            if df.empty: return
+            # El historial llega tipado (float32/int8): se acumula en float64 sin volver a coercionar
+            horas = _numerica(df['Horas_Estudio_Real'])
+            energia = _numerica(df['Nivel_Energia']).fillna(0)
+            self.sesiones = len(df)
+            self.total_horas = float(horas.sum())
+            self.suma_energia = float(energia.sum())
+            self.exitos = int((df['Cumplio_Objetivo'] == 'sí').sum())
+            self.pomodoros = int((df['Tipo_Sesion'] == 'Pomodoro').sum())
+            self.maraton = bool((horas >= 3).any())
+            self.horas_materia = {m: float(h) for m, h in horas.groupby(df['Materia'], observed=True).sum().items()}
+            for label, e in zip(df['Dia_Semana'].tail(self.VENTANA_ENERGIA), energia.tail(self.VENTANA_ENERGIA)):
+                self.ultimas_energias.append((str(label)[:3], float(e)))
+            self.fechas = fechas_unicas(df['Fecha'])
+            self.fecha_max = max(self.fechas) if self.fechas else None
+
+    def agregar(self, filas):
+        with self._lock:
+            for fila in filas: self._agregar_fila(fila)
+
+    def aplicar(self, filas, firma_antes, firma_despues):
+        """Listener de HistorialStore: aplica las filas nuevas si el estado estaba al día."""
+        with self._lock:
+            if self.firma is None or self.firma != firma_antes or len(filas) > self.MAX_FILAS_INCREMENTAL:
+                self.firma = None
+                return
+            for fila in filas: self._agregar_fila(fila)
+            self.firma = firma_despues
+
+    def _agregar_fila(self, fila):
+        horas = _num(fila.get('Horas_Estudio_Real'))
+        energia = _num(fila.get('Nivel_Energia')) or 0.0
+        self.sesiones += 1
+        self.suma_energia += energia
+        if fila.get('Cumplio_Objetivo') == 'sí': self.exitos += 1
+        if fila.get('Tipo_Sesion') == 'Pomodoro': self.pomodoros += 1
+        if horas is not None:
+            self.total_horas += horas
+            if horas >= 3: self.maraton = True
+        materia = fila.get('Materia')
+        if not _es_nulo(materia):
+            self.horas_materia[materia] = self.horas_materia.get(materia, 0.0) + (horas or 0.0)
+        self.ultimas_energias.append((str(fila.get('Dia_Semana'))[:3], energia))
+        f = _fecha(fila.get('Fecha'))
+        if f is not None:
+            self.fechas.add(f)
+            if self.fecha_max is None or f > self.fecha_max: self.fecha_max = f
+
+    # --- CONSULTA ---
+    def racha(self):
+        if self.fecha_max is None: return 0
+        hoy = datetime.now().date()
+        if self.fecha_max != hoy and self.fecha_max != (hoy - timedelta(days=1)): return 0
+        racha, dia = 0, self.fecha_max
+        while dia in self.fechas:
+            racha += 1
+            dia -= timedelta(days=1)
+        return racha
+
+    def logros(self, racha):
+        logros = []
+        if self.sesiones >= 1: logros.append({"id": "novato", "icon": "🌱", "title": "Primeros Pasos", "desc": "Registraste tu primera sesión."})
+        if self.maraton: logros.append({"id": "maraton", "icon": "🏃", "title": "Maratonista", "desc": "Estudiaste +3 horas seguidas."})
+        if racha >= 3: logros.append({"id": "fire", "icon": "🔥", "title": "On Fire", "desc": "Racha de 3 días."})
+        if self.sesiones >= 10: logros.append({"id": "vet", "icon": "🎖️", "title": "Veterano", "desc": "10 sesiones registradas."})
+        if self.total_horas >= 50: logros.append({"id": "king", "icon": "👑", "title": "Imparable", "desc": "50 horas totales."})
+        if self.pomodoros >= 5: logros.append({"id": "focus", "icon": "🍅", "title": "Maestro del Tiempo", "desc": "5 Pomodoros completados."})
+        return logros
+
+    def snapshot(self):
+        with self._lock:
+            if self.sesiones == 0:
+                return {"total_horas": 0, "sesiones_totales": 0, "promedio_energia": 0, "tasa_exito": 0, "materias_chart": [], "energia_chart": [], "nivel": 1, "xp_actual": 0, "xp_siguiente": 500, "racha_dias": 0, "logros": []}
+            xp_total = int((self.total_horas * 100) + (self.sesiones * 50))
+            racha = self.racha()
+
+            top = heapq.nlargest(self.TOP_MATERIAS, self.horas_materia.items(), key=lambda kv: kv[1])
+            max_horas = top[0][1] if top else 1
+            materias_chart = [{"label": m, "value": round(h, 1), "percent": int((h / max_horas) * 100)} for m, h in top]
+            energia_chart = [{"label": label, "value": e, "percent": int((e / 5) * 100)} for label, e in self.ultimas_energias]
+
+            return {
+                "total_horas": round(self.total_horas, 1), "sesiones_totales": self.sesiones,
+                "promedio_energia": round(self.suma_energia / self.sesiones, 1),
+                "tasa_exito": int((self.exitos / self.sesiones) * 100), "materias_chart": materias_chart, "energia_chart": energia_chart,
+                "nivel": int(xp_total / 1000) + 1, "xp_actual": xp_total % 1000, "xp_siguiente": 1000, "racha_dias": racha, "logros": self.logros(racha)
+            }
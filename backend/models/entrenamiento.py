@@ -0,0 +1,70 @@
+# entrenamiento.py - Reentrenamiento del modelo en segundo plano
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+
+class PlanificadorEntrenamiento:
+    """
+    Hilo de fondo que agrupa las solicitudes de reentrenamiento: espera `debounce`
+    segundos sin solicitudes nuevas, o entrena de inmediato al acumular
+    `umbral_filas` filas nuevas. El registro de sesiones ya no paga el fit.
+    `entrenar` debe devolver el número de filas usadas (o None si no entrenó).
+    """
+
+    def __init__(self, entrenar, debounce=5.0, umbral_filas=20):
+        self._entrenar = entrenar
+        self.debounce = debounce
+        self.umbral_filas = umbral_filas
+        self._cond = threading.Condition()
+        self._pendientes = 0
+        self._ultima_solicitud = 0.0
+        self._hilo = None
+        self._estado = {
+            "entrenando": False, "pendientes": 0, "solicitudes": 0, "entrenamientos": 0,
+            "ultimo_entrenamiento": None, "filas": None, "duracion_s": None, "ultimo_error": None
+        }
+
+    def solicitar(self, nuevas_filas=1):
+        with self._cond:
+            self._pendientes += nuevas_filas
+            self._ultima_solicitud = time.monotonic()
+            self._estado["solicitudes"] += 1
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="reentrenamiento", daemon=True)
+                self._hilo.start()
+            self._cond.notify()
+
+    def estado(self):
+        with self._cond:
+            return dict(self._estado, pendientes=self._pendientes)
+
+    def _esperar_lote(self):
+        with self._cond:
+            while self._pendientes == 0: self._cond.wait()
+            while self._pendientes < self.umbral_filas:
+                restante = self._ultima_solicitud + self.debounce - time.monotonic()
+                if restante <= 0: break
+                self._cond.wait(restante)
+            self._pendientes = 0
+            self._estado["entrenando"] = True
+
+    def _bucle(self):
+        while True:
+            self._esperar_lote()
+            inicio = time.perf_counter()
+            try:
+                filas = self._entrenar()
+                error = None
+            except Exception as e:
+                logging.exception("Error reentrenando el modelo")
+                filas, error = None, str(e)
+            with self._cond:
+                self._estado["entrenando"] = False
+                self._estado["ultimo_error"] = error
+                if error is None and filas is not None:
+                    self._estado.update(entrenamientos=self._estado["entrenamientos"] + 1, filas=filas,
+                                        duracion_s=round(time.perf_counter() - inicio, 3),
+                                        ultimo_entrenamiento=datetime.now().isoformat(timespec='seconds'))
@@ -0,0 +1,62 @@
+# historial_cache.py - DataFrame del historial cacheado en memoria
+
+import threading
+
+
+class HistorialCache:
+    """
+    Mantiene en memoria el DataFrame ya parseado y tipado del historial.
+    Se invalida explícitamente en cada escritura (suscrito a HistorialStore) o
+    cuando cambia la firma (mtime, tamaño) del archivo por una escritura externa.
+
+    La carga (que lee el CSV bajo el lock de archivo) se hace bajo `_carga`, no bajo
+    `_lock`: invalidar() corre como listener del store y nunca espera a esa E/S.
+    """
+
+    def __init__(self, cargador, firma):
+        self._cargador = cargador
+        self._firma = firma
+        self._lock = threading.Lock()
+        self._carga = threading.Lock()
+        self._version = 0
+        self._df = None
+        self._firma_df = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+
+    def obtener(self):
+        """Devuelve una copia del DataFrame para que los lectores puedan modificarla."""
+        firma = self._firma()
+        with self._lock:
+            if self._df is not None and self._firma_df == firma:
+                self.hits += 1
+                return self._df.copy()
+        with self._carga:
+            with self._lock:
+                if self._df is not None and self._firma_df == firma:  # lo cargó otro hilo mientras esperábamos
+                    self.hits += 1
+                    return self._df.copy()
+                self.misses += 1
+                version = self._version
+            df = self._cargador()
+            with self._lock:
+                # Si hubo una escritura durante la carga, no se cachea (puede no incluirla)
+                if self._version == version: self._df, self._firma_df = df, firma
+            return df.copy()
+
+    def invalidar(self, *_):
+        with self._lock:
+            self._df = None
+            self._firma_df = None
+            self._version += 1
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "invalidaciones": self.invalidaciones,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "filas": 0 if self._df is None else len(self._df)
+            }
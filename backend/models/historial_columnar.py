@@ -0,0 +1,260 @@
+# historial_columnar.py - Esquema tipado del historial y snapshot binario opcional (columnas .npy / Parquet)
+
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import time
+
+from backend.utils.file_lock import bloqueo_archivo
+from backend.utils.lazy_import import ModuloPerezoso
+
+np = ModuloPerezoso('numpy')
+pd = ModuloPerezoso('pandas')
+
+# --- ESQUEMA ---
+CATEGORICAS = ['Materia', 'Dificultad_Cat', 'Cumplio_Objetivo', 'Factor_Bloqueo', 'Lugar_Estudio',
+               'Actividad_Fisica', 'Dia_Semana', 'Tipo_Sesion']
+FLOTANTES = ['Horas_Estudio_Real', 'Horas_Sueno']
+ENTEROS = ['Dificultad_Num', 'Nivel_Energia', 'Calificacion']   # int8 si caben (Int8 si hay nulos), si no float32
+
+
+def _entero_pequeno(serie):
+    valores = pd.to_numeric(serie, errors='coerce')
+    validos = valores.dropna()
+    if len(validos) and ((validos % 1 != 0).any() or validos.min() < -128 or validos.max() > 127):
+        return valores.astype('float32')
+    return valores.astype('int8' if len(validos) == len(valores) else 'Int8')
+
+def _fechas(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie): return serie
+    fechas = pd.to_datetime(serie, format='%Y-%m-%d', errors='coerce')
+    otras = fechas.isna() & serie.notna()
+    if otras.any(): fechas[otras] = pd.to_datetime(serie[otras], format='mixed', errors='coerce')
+    return fechas
+
+def fechas_unicas(serie):
+    """Días distintos (datetime.date) de una columna Fecha, tipada o en texto; deduplica antes de convertir."""
+    dias = _fechas(serie).dropna().dt.normalize().unique()
+    return {ts.date() for ts in pd.DatetimeIndex(dias)}
+
+def tipar(df, columnas, valores_defecto):
+    """Completa columnas ausentes y aplica el esquema: categorías, int8/float32 y Fecha datetime64."""
+    for col in columnas:
+        if col not in df.columns: df[col] = valores_defecto.get(col, 0)
+    for col in FLOTANTES:
+        if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    for col in ENTEROS:
+        if col in df.columns: df[col] = _entero_pequeno(df[col])
+    for col in CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype): df[col] = df[col].astype('category')
+    if 'Fecha' in df.columns: df['Fecha'] = _fechas(df['Fecha'])
+    return df
+
+def _bytes_csv(ruta, desde=0):
+    """(cabecera, bytes desde `desde`, offset real de inicio), leídos bajo el lock del store."""
+    with bloqueo_archivo(ruta), open(ruta, 'rb') as f:
+        cabecera = f.readline()
+        inicio = max(desde, len(cabecera))
+        f.seek(inicio)
+        return cabecera, f.read(), inicio
+
+def _parsear(cabecera, datos, columnas, valores_defecto):
+    nombres = cabecera.decode('utf-8').strip().split(',')
+    dtype = {c: 'category' for c in CATEGORICAS if c in nombres}
+    df = pd.read_csv(io.BytesIO(cabecera + datos), dtype=dtype)
+    return tipar(df, columnas, valores_defecto)
+
+def leer_csv(ruta, columnas, valores_defecto, desde=0):
+    """
+    Lee el CSV (o solo la cola a partir del byte `desde`) ya tipado. Devuelve (df, bytes_cubiertos).
+    Los bytes se leen bajo el lock del store (nunca un append a medias); el parseo, fuera de él.
+    """
+    cabecera, datos, inicio = _bytes_csv(ruta, desde)
+    return _parsear(cabecera, datos, columnas, valores_defecto), inicio + len(datos)
+
+def concatenar(base, cola):
+    """concat que conserva las categorías (pd.concat de categóricas distintas degrada a object)."""
+    if cola.empty: return base
+    if base.empty: return cola
+    df = pd.concat([base, cola], ignore_index=True)
+    for col in base.columns:
+        if isinstance(base[col].dtype, pd.CategoricalDtype) and col in cola.columns:
+            df[col] = pd.api.types.union_categoricals([base[col], cola[col].astype('category')], ignore_order=True)
+    return df
+
+
+# --- COLA EN MEMORIA ---
+class LectorIncremental:
+    """
+    Último DataFrame leído y hasta qué byte del CSV cubre. Si el archivo solo creció (mismo
+    inodo y mismos últimos bytes cubiertos: appends propios o de otro worker) se parsea
+    únicamente la cola; si se reemplazó, borró o encogió, lectura completa.
+    """
+
+    def __init__(self, ruta_csv):
+        self.ruta_csv = ruta_csv
+        self._df = None
+        self._hasta = 0
+        self._inodo = None
+        self._final = b''
+
+    def _final_cubierto(self, hasta):
+        with open(self.ruta_csv, 'rb') as f:
+            f.seek(max(0, hasta - 64))
+            return f.read(hasta - max(0, hasta - 64))
+
+    def cargar(self, columnas, valores_defecto):
+        # Bajo el lock solo la comprobación y la lectura de bytes; parseo y concat fuera
+        with bloqueo_archivo(self.ruta_csv):
+            st = os.stat(self.ruta_csv)
+            incremental = (self._df is not None and st.st_ino == self._inodo and st.st_size >= self._hasta
+                           and self._final_cubierto(self._hasta) == self._final)
+            cabecera, datos, inicio = _bytes_csv(self.ruta_csv, self._hasta if incremental else 0)
+            hasta = inicio + len(datos)
+            final = self._final_cubierto(hasta)
+        df = _parsear(cabecera, datos, columnas, valores_defecto)
+        if incremental: df = concatenar(self._df, df)
+        self._df, self._hasta, self._inodo, self._final = df, hasta, st.st_ino, final
+        return df
+
+
+# --- SNAPSHOT BINARIO ---
+class SnapshotHistorial:
+    """
+    Copia binaria del historial tipado más cuántos bytes del CSV refleja. Como el CSV es
+    append-only, cargar = leer el snapshot + parsear solo la cola nueva del CSV; el snapshot
+    se reescribe cuando la cola crece. Si el prefijo del CSV cambió (reescritura, borrado),
+    se descarta y se vuelve a la lectura completa.
+
+    Cada escritura crea una versión nueva dentro de `ruta` y el .json de metadatos la nombra:
+    el único paso visible es el os.replace de ese .json, así que un lector ve el snapshot
+    anterior o el nuevo completos, nunca columnas nuevas con metadatos viejos. Se conservan
+    la versión vigente y la anterior (la que puede estar leyendo otro proceso).
+
+    formato: 'npy' (un .npy por columna), 'parquet' (requiere pyarrow), 'auto' (parquet si
+    está disponible) o '' (desactivado).
+    """
+
+    def __init__(self, ruta_csv, formato='', min_filas_reescritura=1000):
+        if formato == 'auto': formato = 'parquet' if _hay_pyarrow() else 'npy'
+        if formato == 'parquet' and not _hay_pyarrow():
+            logging.warning("HISTORIAL_SNAPSHOT=parquet requiere pyarrow; se usa 'npy'")
+            formato = 'npy'
+        self.formato = formato
+        self.ruta_csv = ruta_csv
+        self.ruta = f"{ruta_csv}.{'parquet' if formato == 'parquet' else 'columnas'}"
+        self.ruta_meta = self.ruta + '.json'
+        self.min_filas_reescritura = min_filas_reescritura
+
+    @property
+    def activo(self):
+        return self.formato in ('npy', 'parquet')
+
+    def cargar(self, columnas, valores_defecto):
+        base, desde = self._leer()
+        cola, hasta = leer_csv(self.ruta_csv, columnas, valores_defecto, desde)
+        if base is None: df = cola
+        else: df = concatenar(base, cola)
+        if base is None or len(cola) >= max(self.min_filas_reescritura, len(df) // 10):
+            try: self._escribir(df, hasta)
+            except Exception: logging.exception("No se pudo escribir el snapshot del historial")
+        return df
+
+    def eliminar(self):
+        for ruta in (self.ruta_meta, self.ruta):   # `ruta` es un directorio (o un archivo en el formato anterior)
+            if os.path.isdir(ruta): shutil.rmtree(ruta, ignore_errors=True)
+            elif os.path.exists(ruta): os.remove(ruta)
+
+    # --- internos ---
+    def _huella(self, hasta):
+        """Hash de los primeros y últimos 4 KB del prefijo cubierto: detecta reescrituras del CSV."""
+        with open(self.ruta_csv, 'rb') as f:
+            inicio = f.read(min(hasta, 4096))
+            f.seek(max(0, hasta - 4096))
+            fin = f.read(min(hasta, 4096))
+        return hashlib.sha1(inicio + fin).hexdigest()
+
+    def _leer(self):
+        try:
+            with open(self.ruta_meta) as f: meta = json.load(f)
+            if meta.get('formato') != self.formato or os.path.getsize(self.ruta_csv) < meta['bytes']: return None, 0
+            if self._huella(meta['bytes']) != meta['huella']: return None, 0
+            ruta = os.path.join(self.ruta, meta['version'])
+            df = pd.read_parquet(ruta) if self.formato == 'parquet' else self._leer_npy(ruta, meta)
+            if len(df) != meta['filas']: return None, 0
+            return df, meta['bytes']
+        except (OSError, ValueError, KeyError):
+            return None, 0
+
+    def _leer_npy(self, ruta, meta):
+        # Lectura completa (sin mmap): el DataFrame, tipar y la caché copian igual, y un mmap abierto
+        # impediría borrar la versión anterior en Windows
+        datos = {}
+        for col, info in meta['columnas'].items():
+            valores = np.load(os.path.join(ruta, f"{col}.npy"))
+            if info['tipo'] == 'category':
+                datos[col] = pd.Categorical.from_codes(valores, categories=info['categorias'])
+            else:
+                datos[col] = pd.array(valores, dtype=info['tipo']) if info['tipo'] == 'Int8' else valores
+        return pd.DataFrame(datos, columns=list(meta['columnas']))
+
+    def _version_vigente(self):
+        try:
+            with open(self.ruta_meta) as f: return json.load(f).get('version')
+        except (OSError, ValueError):
+            return None
+
+    def _escribir(self, df, hasta):
+        with bloqueo_archivo(self.ruta):
+            if os.path.isfile(self.ruta): os.remove(self.ruta)   # formato anterior: un único .parquet
+            os.makedirs(self.ruta, exist_ok=True)
+            version = f"v{time.time_ns()}-{os.getpid()}" + ('.parquet' if self.formato == 'parquet' else '')
+            destino = os.path.join(self.ruta, version)
+            meta = {"formato": self.formato, "version": version, "bytes": hasta, "filas": len(df), "huella": self._huella(hasta)}
+            if self.formato == 'parquet': df.to_parquet(destino, index=False)
+            else: meta["columnas"] = self._escribir_npy(df, destino)
+            anterior = self._version_vigente()
+            tmp = f"{self.ruta_meta}.tmp{os.getpid()}"
+            with open(tmp, 'w') as f: json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp, self.ruta_meta)   # cambio de versión atómico
+            self._podar({version, anterior})
+
+    def _podar(self, conservar):
+        """Borra las versiones (y restos del formato anterior) que no están en `conservar`."""
+        for nombre in os.listdir(self.ruta):
+            if nombre in conservar: continue
+            ruta = os.path.join(self.ruta, nombre)
+            if os.path.isdir(ruta): shutil.rmtree(ruta, ignore_errors=True)
+            else:
+                try: os.remove(ruta)
+                except OSError: pass
+
+    def _escribir_npy(self, df, destino):
+        os.makedirs(destino)
+        columnas = {}
+        for col in df.columns:
+            serie = df[col]
+            if not (pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_any_dtype(serie)):
+                serie = serie.astype('category')
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                valores = serie.cat.codes.to_numpy()
+                columnas[col] = {"tipo": "category", "categorias": [str(c) for c in serie.cat.categories]}
+            elif str(serie.dtype) == 'Int8':
+                valores = serie.to_numpy(dtype='float32', na_value=np.nan)
+                columnas[col] = {"tipo": "Int8"}
+            else:
+                valores = serie.to_numpy()
+                columnas[col] = {"tipo": str(valores.dtype)}
+            np.save(os.path.join(destino, f"{col}.npy"), valores)
+        return columnas
+
+
+def _hay_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
@@ -0,0 +1,126 @@
+# historial_store.py - Registro append-only de sesiones sobre historial.csv
+
+import csv
+import io
+import os
+import shutil
+import threading
+
+from backend.utils.file_lock import bloqueo_archivo
+
+
+class LoteCSV:
+    """
+    Filas de un append masivo, tal como se notifican a los listeners: tienen len() y se
+    iteran como dicts leyendo el CSV temporal bajo demanda (no se materializan en memoria).
+    """
+
+    def __init__(self, ruta, columnas, n):
+        self.ruta = ruta
+        self.columnas = columnas
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        with open(self.ruta, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f, fieldnames=self.columnas)
+
+
+class HistorialStore:
+    """
+    Log append-only de sesiones de estudio. Registrar una sesión escribe solo la
+    fila nueva (O(1)) en lugar de reescribir todo el CSV, y las escrituras se
+    serializan con un lock de hilo más un lock de archivo entre procesos.
+    """
+
+    def __init__(self, ruta, columnas, valores_defecto=None):
+        self.ruta = ruta
+        self.columnas = list(columnas)
+        self.valores_defecto = valores_defecto or {}
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    def suscribir(self, callback):
+        """callback(filas, firma_antes, firma_despues) se invoca tras cada append."""
+        self._listeners.append(callback)
+
+    def firma(self):
+        """(mtime_ns, tamaño) del archivo; None si no existe."""
+        try:
+            st = os.stat(self.ruta)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def agregar(self, filas):
+        filas = list(filas)
+        if not filas: return
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=self.columnas, extrasaction='ignore', lineterminator='\n')
+        writer.writerows({col: fila.get(col, self.valores_defecto.get(col, 0)) for col in self.columnas} for fila in filas)
+        self._anexar(lambda f: f.write(buf.getvalue().encode('utf-8')), filas)
+
+    def agregar_csv(self, ruta, n_filas):
+        """
+        Append masivo: copia un CSV sin cabecera (columnas en el orden del store) con una
+        sola escritura bajo el lock; los listeners reciben un LoteCSV y se notifican una vez.
+        """
+        if not n_filas: return
+        def copiar(f):
+            with open(ruta, 'rb') as origen: shutil.copyfileobj(origen, f, 1 << 20)
+        self._anexar(copiar, LoteCSV(ruta, self.columnas, n_filas))
+
+    def leer_bloques(self, tamano_bloque=1 << 16):
+        """Bytes del CSV en bloques, hasta el tamaño que tenía al empezar (nunca un append a medias)."""
+        with self._lock, bloqueo_archivo(self.ruta):
+            if not os.path.exists(self.ruta): return
+            self._importar_legado()
+            f = open(self.ruta, 'rb')
+            restante = os.fstat(f.fileno()).st_size
+        with f:
+            while restante > 0:
+                bloque = f.read(min(tamano_bloque, restante))
+                if not bloque: break
+                restante -= len(bloque)
+                yield bloque
+
+    def _anexar(self, escribir, filas):
+        with self._lock:
+            with bloqueo_archivo(self.ruta):
+                self._importar_legado()
+                antes = self.firma()
+                with open(self.ruta, 'ab') as f:
+                    if antes is None or antes[1] == 0:
+                        f.write((','.join(self.columnas) + '\n').encode('utf-8'))
+                    elif not self._termina_en_salto():
+                        f.write(b'\n')
+                    escribir(f)
+                despues = self.firma()
+            # Fuera del lock de archivo: los listeners toman los locks de las cachés, que a su vez
+            # leen el CSV bajo ese mismo lock (orden invertido = deadlock entre hilos del worker)
+            for cb in self._listeners: cb(filas, antes, despues)
+
+    def _termina_en_salto(self):
+        with open(self.ruta, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _importar_legado(self):
+        """
+        Importador de una sola vez: si el historial.csv existente tiene otra
+        cabecera (columnas faltantes o en otro orden), se reescribe una vez con el
+        esquema COLUMNAS para que los appends posteriores queden alineados.
+        """
+        if not os.path.exists(self.ruta) or os.path.getsize(self.ruta) == 0: return
+        with open(self.ruta, newline='', encoding='utf-8') as f:
+            cabecera = next(csv.reader(f), [])
+        if cabecera == self.columnas: return
+        tmp = self.ruta + '.tmp'
+        with open(self.ruta, newline='', encoding='utf-8') as origen, open(tmp, 'w', newline='', encoding='utf-8') as destino:
+            writer = csv.DictWriter(destino, fieldnames=self.columnas, extrasaction='ignore', lineterminator='\n')
+            writer.writeheader()
+            for fila in csv.DictReader(origen):
+                writer.writerow({col: fila[col] if col in cabecera else self.valores_defecto.get(col, 0) for col in self.columnas})
+        os.replace(tmp, self.ruta)
@@ -1,13 +1,26 @@
-import pandas as pd
 import os
-import joblib
-from sklearn.ensemble import RandomForestRegressor
+import logging
+import threading
 from datetime import datetime, timedelta
+from backend.utils.lazy_import import ModuloPerezoso
+from backend.utils import metricas
+from backend.utils.config_utils import ruta_datos
+from backend.utils.file_lock import bloqueo_archivo, escribir_atomico
+from backend.models.historial_store import HistorialStore
+from backend.models.historial_columnar import LectorIncremental, SnapshotHistorial, fechas_unicas, tipar
+from backend.models.historial_cache import HistorialCache
+from backend.models.dashboard_agregados import AgregadosDashboard
+from backend.models.entrenamiento import PlanificadorEntrenamiento
+from backend.models.modelo_horas import MIN_FILAS, ModeloHoras
+from backend.models.reporte_analitico import ReporteAnalitico, texto_reporte
+
+# pandas/sklearn/joblib se importan en el primer uso: el arranque de la app no los paga
+pd = ModuloPerezoso('pandas')
+joblib = ModuloPerezoso('joblib')
 
 # Rutas
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_FILE = os.path.join(BASE_DIR, 'historial.csv')
-MODEL_FILE = os.path.join(BASE_DIR, 'modelo_horas.pkl')
+DATA_FILE = ruta_datos('historial.csv', 'HISTORIAL_ARCHIVO')
+MODEL_FILE = ruta_datos('modelo_horas.pkl', 'MODELO_ARCHIVO')
 
 COLUMNAS = [
     'Materia', 'Horas_Estudio_Real', 'Dificultad_Cat', 'Dificultad_Num', 
@@ -15,51 +28,146 @@ COLUMNAS = [
     'Horas_Sueno', 'Lugar_Estudio', 'Actividad_Fisica', 'Dia_Semana', 
     'Fecha', 'Tipo_Sesion'
 ]
+# Valor de relleno para columnas ausentes en historiales antiguos (el resto usa 0)
+VALORES_DEFECTO = {'Tipo_Sesion': 'Manual', 'Fecha': '2000-01-01'}
 
-def inicializar_o_cargar_datos():
+# Snapshot binario opcional del historial tipado (HISTORIAL_SNAPSHOT = npy | parquet | auto; vacío = solo CSV)
+historial_snapshot = SnapshotHistorial(DATA_FILE, os.getenv('HISTORIAL_SNAPSHOT', ''))
+# Sin snapshot: tras un append (de este u otro worker) solo se parsea la cola nueva del CSV
+historial_lector = LectorIncremental(DATA_FILE)
+
+def _leer_historial():
+    """DataFrame tipado (categorías, int8/float32, Fecha datetime64) desde el snapshot o el último leído + cola del CSV."""
     if os.path.exists(DATA_FILE):
         try:
-            df = pd.read_csv(DATA_FILE)
-            for col in COLUMNAS:
-                if col not in df.columns:
-                    val = 'Manual' if col == 'Tipo_Sesion' else ('2000-01-01' if col == 'Fecha' else 0)
-                    df[col] = val
-            return df
+            with metricas.cronometro('historial_carga'):
+                if historial_snapshot.activo: return historial_snapshot.cargar(COLUMNAS, VALORES_DEFECTO)
+                return historial_lector.cargar(COLUMNAS, VALORES_DEFECTO)
         except Exception as e:
-            print(f"Error CSV: {e}")
-    return pd.DataFrame(columns=COLUMNAS)
+            logging.error(f"Error CSV: {e}")
+    return tipar(pd.DataFrame(columns=COLUMNAS), COLUMNAS, VALORES_DEFECTO)
+
+historial_store = HistorialStore(DATA_FILE, COLUMNAS, VALORES_DEFECTO)
+historial_cache = HistorialCache(_leer_historial, historial_store.firma)
+historial_store.suscribir(historial_cache.invalidar)
+dashboard_agregados = AgregadosDashboard()
+historial_store.suscribir(dashboard_agregados.aplicar)
+reporte_analitico = ReporteAnalitico(historial_cache.obtener, historial_store.firma)
+historial_store.suscribir(reporte_analitico.invalidar)
+
+def inicializar_o_cargar_datos():
+    """DataFrame del historial (copia), servido desde la caché en memoria."""
+    return historial_cache.obtener()
+
+def registrar_sesion(sesion):
+    """Agrega una sesión al historial con un append O(1) (sin reescribir el CSV)."""
+    historial_store.agregar([sesion])
+
+def _guardar_modelo(model):
+    # Temporal + os.replace bajo lock: los lectores (y otros workers) nunca ven un .pkl a medio escribir
+    escribir_atomico(MODEL_FILE, lambda f: joblib.dump(model, f))
+    _publicar_modelo(model)
 
 def entrenar_modelo():
+    """Fit completo del pipeline y publicación atómica. Devuelve las filas usadas (None si no hay datos suficientes)."""
     df = inicializar_o_cargar_datos()
-    if len(df) < 5: return
-    df = df[df['Horas_Estudio_Real'] > 0].copy()
-    df['Dificultad_Num'] = df['Dificultad_Num'].fillna(2)
-    df['Calificacion'] = df['Calificacion'].fillna(15) 
-    X = df[['Dificultad_Num', 'Calificacion']]
-    y = df['Horas_Estudio_Real']
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    joblib.dump(model, MODEL_FILE)
-
-def predict_study_hours(dificultad_num, calificacion_deseada=20):
-    if os.path.exists(MODEL_FILE):
-        try:
-            model = joblib.load(MODEL_FILE)
-            prediction = model.predict([[dificultad_num, calificacion_deseada]])
-            return max(0.5, min(12.0, prediction[0]))
-        except: pass
-    return 1.0 + (dificultad_num * 0.5)
+    if len(df) < MIN_FILAS: return None
+    with metricas.cronometro('modelo_entrenamiento', modo='completo'):
+        model = ModeloHoras().ajustar(df)
+        if model is None: return None
+        _guardar_modelo(model)
+    return model.n_entrenamiento
+
+def actualizar_modelo():
+    """
+    Aprende las sesiones nuevas desde la última fila vista (una pasada de partial_fit, con un
+    repaso de filas ya aprendidas para no olvidar el resto del historial). Cae al fit completo
+    si no hay modelo del pipeline, si el historial se reescribió/encogió o si las filas nuevas
+    superan a las ya aprendidas. Devuelve las filas usadas (None si no entrenó).
+    """
+    # Un worker a la vez: el siguiente recarga el .pkl recién publicado y solo aprende lo que falte
+    with bloqueo_archivo(MODEL_FILE):
+        model, df = cargar_modelo(), inicializar_o_cargar_datos()
+        if not isinstance(model, ModeloHoras) or model.filas_vistas > len(df) or len(df) - model.filas_vistas > model.filas_vistas:
+            return entrenar_modelo()
+        if len(df) == model.filas_vistas: return 0
+        with metricas.cronometro('modelo_entrenamiento', modo='incremental'):
+            nuevas = df.iloc[model.filas_vistas:]
+            nuevo = model.actualizar(nuevas, len(df), repaso=model.muestra_repaso(df, len(nuevas)))
+            _guardar_modelo(nuevo)
+        return nuevo.metricas["filas"]
+
+planificador_entrenamiento = PlanificadorEntrenamiento(
+    actualizar_modelo,
+    debounce=float(os.getenv('REENTRENO_DEBOUNCE_S', 5)),
+    umbral_filas=int(os.getenv('REENTRENO_UMBRAL_FILAS', 20))
+)
+historial_store.suscribir(lambda filas, *_: planificador_entrenamiento.solicitar(len(filas)))
+
+# --- MODELO EN MEMORIA ---
+# El modelo queda residente y solo se recarga si cambia la firma (inodo, mtime, tamaño) del .pkl
+_modelo_lock = threading.Lock()
+_modelo_cache = {"firma": None, "modelo": None}
+
+def _firma_modelo():
+    try:
+        st = os.stat(MODEL_FILE)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def _publicar_modelo(model):
+    with _modelo_lock:
+        _modelo_cache.update(firma=_firma_modelo(), modelo=model)
+
+def cargar_modelo():
+    firma = _firma_modelo()
+    if firma is None: return None
+    with _modelo_lock:
+        if _modelo_cache["firma"] != firma:
+            _modelo_cache.update(firma=firma, modelo=joblib.load(MODEL_FILE))
+        return _modelo_cache["modelo"]
+
+def _fila_prediccion(p):
+    if isinstance(p, dict): return dict(p, Dificultad_Num=float(p.get('Dificultad_Num', 2)), Calificacion=float(p.get('Calificacion', 20)))
+    d, c = p
+    return {'Dificultad_Num': float(d), 'Calificacion': float(c)}
+
+def predict_study_hours_batch(pares):
+    """
+    Predice horas para una lista de (dificultad_num, calificacion_deseada) o de dicts con más
+    features (Materia, Dia_Semana, Nivel_Energia, ...) en una sola llamada al modelo.
+    Sin modelo entrenado (o si falla) se usa la heurística 1 + 0.5·dificultad.
+    """
+    filas = [_fila_prediccion(p) for p in pares]
+    if not filas: return []
+    try:
+        model = cargar_modelo()
+        if isinstance(model, ModeloHoras):
+            with metricas.cronometro('modelo_prediccion'):
+                return model.predecir(filas)
+        if model is not None:
+            # .pkl anterior (RandomForest sobre dificultad y calificación) hasta el próximo entrenamiento
+            with metricas.cronometro('modelo_prediccion'):
+                X = pd.DataFrame([(f['Dificultad_Num'], f['Calificacion']) for f in filas], columns=['Dificultad_Num', 'Calificacion'])
+                return [max(0.5, min(12.0, float(p))) for p in model.predict(X)]
+    except Exception:
+        logging.exception("Error prediciendo con el modelo; se usa la heurística")
+    metricas.incrementar('predicciones_heuristicas_total', len(filas))
+    return [1.0 + (f['Dificultad_Num'] * 0.5) for f in filas]
+
+def predict_study_hours(dificultad_num, calificacion_deseada=20, **features):
+    return predict_study_hours_batch([dict(features, Dificultad_Num=dificultad_num, Calificacion=calificacion_deseada)])[0]
 
 def obtener_materias_unicas():
     df = inicializar_o_cargar_datos()
     if df.empty: return []
-    return sorted(df['Materia'].astype(str).unique().tolist())
+    return sorted(str(m) for m in df['Materia'].dropna().unique())
 
 # --- GAMIFICACIÓN & DASHBOARD ---
 def calcular_racha(df):
     if df.empty or 'Fecha' not in df.columns: return 0
-    fechas = pd.to_datetime(df['Fecha'], errors='coerce').dropna().dt.date.unique()
-    fechas = sorted(fechas, reverse=True)
+    fechas = sorted(fechas_unicas(df['Fecha']), reverse=True)
     if not fechas: return 0
     hoy = datetime.now().date()
     if fechas[0] != hoy and fechas[0] != (hoy - timedelta(days=1)): return 0
@@ -83,14 +191,21 @@ def calcular_logros(df):
     return logros
 
 def obtener_datos_dashboard():
-    df = inicializar_o_cargar_datos()
+    """Responde desde los agregados incrementales; solo reconstruye si el archivo cambió por fuera."""
+    firma = historial_store.firma()
+    if not dashboard_agregados.vigente(firma):
+        dashboard_agregados.reconstruir(inicializar_o_cargar_datos(), firma)
+    return dashboard_agregados.snapshot()
+
+def calcular_dashboard_pandas(df):
+    """Implementación de referencia (recalcula todo con pandas); usada para verificar los agregados."""
     stats = { "total_horas": 0, "sesiones_totales": 0, "promedio_energia": 0, "tasa_exito": 0, "materias_chart": [], "energia_chart": [], "nivel": 1, "xp_actual": 0, "xp_siguiente": 500, "racha_dias": 0, "logros": [] }
     if df.empty: return stats
 
-    total_horas = df['Horas_Estudio_Real'].sum()
+    total_horas = float(df['Horas_Estudio_Real'].astype('float64').sum())
     sesiones = len(df)
-    df['Nivel_Energia'] = pd.to_numeric(df['Nivel_Energia'], errors='coerce').fillna(0)
-    promedio_energia = round(df['Nivel_Energia'].mean(), 1)
+    df['Nivel_Energia'] = df['Nivel_Energia'].fillna(0)
+    promedio_energia = round(float(df['Nivel_Energia'].mean()), 1)
     exitos = df[df['Cumplio_Objetivo'] == 'sí']
     tasa_exito = int((len(exitos) / sesiones) * 100) if sesiones > 0 else 0
 
@@ -101,7 +216,7 @@ def obtener_datos_dashboard():
     racha = calcular_racha(df)
     logros = calcular_logros(df)
 
-    materia_grp = df.groupby('Materia')['Horas_Estudio_Real'].sum().sort_values(ascending=False).head(5)
+    materia_grp = df.groupby('Materia', observed=True)['Horas_Estudio_Real'].sum().astype('float64').sort_values(ascending=False).head(5)
     materias_chart = []
     max_horas = materia_grp.max() if not materia_grp.empty else 1
     for materia, horas in materia_grp.items():
@@ -111,7 +226,7 @@ def obtener_datos_dashboard():
     ultimas['Label'] = ultimas.get('Dia_Semana', ultimas.index.astype(str))
     energia_chart = []
     for _, row in ultimas.iterrows():
-        energia_chart.append({"label": str(row['Label'])[:3], "value": row['Nivel_Energia'], "percent": int((row['Nivel_Energia'] / 5) * 100)})
+        energia_chart.append({"label": str(row['Label'])[:3], "value": float(row['Nivel_Energia']), "percent": int((row['Nivel_Energia'] / 5) * 100)})
 
     return {
         "total_horas": round(total_horas, 1), "sesiones_totales": sesiones, "promedio_energia": promedio_energia,
@@ -119,22 +234,42 @@ def obtener_datos_dashboard():
         "nivel": nivel, "xp_actual": xp_en_nivel, "xp_siguiente": xp_siguiente, "racha_dias": racha, "logros": logros
     }
 
+def verificar_agregados_dashboard(df=None):
+    """
+    Compara los agregados incrementales (aplicando las filas una a una) contra la
+    implementación pandas sobre un historial registrado. Devuelve la lista de diferencias.
+    """
+    df = inicializar_o_cargar_datos() if df is None else df
+    esperado = calcular_dashboard_pandas(df.copy())
+    agregados = AgregadosDashboard()
+    for fila in df.to_dict('records'): agregados.agregar([fila])
+    obtenido = agregados.snapshot()
+
+    # Valores redondeados a 1 decimal desde sumas en distinto orden/precisión: si la suma cae en x.x5
+    # un lado redondea hacia arriba y el otro hacia abajo, así que se admite un paso de redondeo
+    tolerancia = 0.1 + 1e-9
+    diferencias = []
+    for clave in ('sesiones_totales', 'tasa_exito', 'nivel', 'racha_dias', 'xp_siguiente'):
+        if esperado[clave] != obtenido[clave]: diferencias.append((clave, esperado[clave], obtenido[clave]))
+    for clave in ('total_horas', 'promedio_energia'):
+        if abs(float(esperado[clave]) - float(obtenido[clave])) > tolerancia: diferencias.append((clave, esperado[clave], obtenido[clave]))
+    if abs(esperado['xp_actual'] - obtenido['xp_actual']) > 1:
+        diferencias.append(('xp_actual', esperado['xp_actual'], obtenido['xp_actual']))
+    if [l['id'] for l in esperado['logros']] != [l['id'] for l in obtenido['logros']]:
+        diferencias.append(('logros', esperado['logros'], obtenido['logros']))
+    # Los empates en horas pueden ordenarse distinto: se comparan los valores y no las etiquetas
+    valores = lambda chart: [float(x['value']) for x in chart]
+    distintos = lambda a, b: len(a) != len(b) or any(abs(x - y) > tolerancia for x, y in zip(a, b))
+    if distintos(valores(esperado['materias_chart']), valores(obtenido['materias_chart'])):
+        diferencias.append(('materias_chart', esperado['materias_chart'], obtenido['materias_chart']))
+    if distintos(valores(esperado['energia_chart']), valores(obtenido['energia_chart'])) or [x['label'] for x in esperado['energia_chart']] != [x['label'] for x in obtenido['energia_chart']]:
+        diferencias.append(('energia_chart', esperado['energia_chart'], obtenido['energia_chart']))
+    return diferencias
+
+def obtener_reporte_analitico():
+    """Estadísticas materializadas del historial (se recalculan solo si el historial cambió)."""
+    with metricas.cronometro('reporte_analitico'):
+        return reporte_analitico.obtener()
+
 def generar_reporte_analitico():
-    df = inicializar_o_cargar_datos()
-    if df.empty: return "No hay datos registrados aún."
-    
-    top_materias = df.groupby('Materia')['Horas_Estudio_Real'].sum().sort_values(ascending=False).head(3)
-    texto_materias = ", ".join([f"{m} ({h}h)" for m, h in top_materias.items()])
-    
-    df['Nivel_Energia'] = pd.to_numeric(df['Nivel_Energia'], errors='coerce')
-    energia_avg = df['Nivel_Energia'].mean()
-    dia_mejor = df.groupby('Dia_Semana')['Nivel_Energia'].mean().idxmax() if not df.empty else "N/A"
-    
-    sueno_avg = df['Horas_Sueno'].mean() if 'Horas_Sueno' in df.columns else 0
-    gym_freq = len(df[df['Actividad_Fisica'].str.contains('Gimnasio|Deporte', na=False)])
-
-    return (
-        f"ANÁLISIS DE DATOS:\n- Total estudiado: {df['Horas_Estudio_Real'].sum()}h.\n"
-        f"- Top Materias: {texto_materias}.\n- Energía media: {energia_avg:.1f}/5. Mejor día: {dia_mejor}.\n"
-        f"- Sueño promedio: {sueno_avg:.1f}h. Sesiones con Gym: {gym_freq}.\n"
-    )
\ No newline at end of file
+    return texto_reporte(obtener_reporte_analitico())
@@ -0,0 +1,124 @@
+# modelo_horas.py - Modelo incremental de horas de estudio (features + SGDRegressor.partial_fit)
+
+import copy
+import time
+
+from backend.utils.lazy_import import ModuloPerezoso
+
+np = ModuloPerezoso('numpy')
+pd = ModuloPerezoso('pandas')
+sparse = ModuloPerezoso('scipy.sparse')
+feature_extraction = ModuloPerezoso('sklearn.feature_extraction')
+linear_model = ModuloPerezoso('sklearn.linear_model')
+preprocessing = ModuloPerezoso('sklearn.preprocessing')
+
+# Solo lo que se conoce al planificar (Cumplio_Objetivo / Factor_Bloqueo son resultados de la sesión)
+NUMERICAS = ['Dificultad_Num', 'Calificacion', 'Nivel_Energia', 'Horas_Sueno']
+CATEGORICAS = ['Materia', 'Dia_Semana', 'Lugar_Estudio', 'Actividad_Fisica', 'Tipo_Sesion']
+OBJETIVO = 'Horas_Estudio_Real'
+MIN_FILAS = 5
+HORAS_MIN, HORAS_MAX = 0.5, 12.0
+REPASO_POR_FILA = 3   # filas ya aprendidas que se repasan por cada fila nueva en `actualizar`
+
+
+class ModeloHoras:
+    """
+    Pipeline de features + regresor lineal entrenable por partes:
+    - numéricas estandarizadas con StandardScaler.partial_fit (los faltantes quedan en la media),
+    - categóricas e interacción materia×dificultad con FeatureHasher (sin vocabulario: acepta
+      materias nuevas sin reentrenar el encoder),
+    - SGDRegressor: `ajustar` hace el fit completo, `actualizar` una pasada de partial_fit con las
+      filas nuevas mezcladas con un repaso de las ya aprendidas.
+    `filas_vistas` indica hasta qué fila del historial (append-only) está aprendido.
+    """
+
+    def __init__(self, n_features=2 ** 12, epocas=5, semilla=42):
+        self.n_features = n_features
+        self.epocas = epocas
+        self.semilla = semilla
+        self.hasher = feature_extraction.FeatureHasher(n_features=n_features, input_type='string', alternate_sign=False)
+        self.escalador = preprocessing.StandardScaler()
+        self.regresor = linear_model.SGDRegressor(loss='huber', epsilon=1.0, alpha=1e-4, learning_rate='invscaling',
+                                                  eta0=0.02, random_state=semilla)
+        self.filas_vistas = 0
+        self.n_entrenamiento = 0
+        self.ajustado = False
+        self.metricas = {}
+
+    # --- FEATURES ---
+    def _matriz(self, df, ajustar_escalador=False):
+        num = np.column_stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype='float64') if c in df else np.full(len(df), np.nan)
+                               for c in NUMERICAS])
+        if ajustar_escalador:
+            with np.errstate(invalid='ignore', divide='ignore'): self.escalador.partial_fit(num)
+            # Columna aún sin ningún valor (p. ej. Calificacion vacía): su media NaN se arrastraría en
+            # cada partial_fit siguiente (NaN * 0), así que se deja neutra hasta que lleguen datos
+            vacias = np.broadcast_to(self.escalador.n_samples_seen_ == 0, self.escalador.mean_.shape)
+            if vacias.any(): self.escalador.mean_[vacias], self.escalador.var_[vacias], self.escalador.scale_[vacias] = 0.0, 0.0, 1.0
+        num = np.nan_to_num(self.escalador.transform(num), nan=0.0)
+        textos = [c + '=' + df[c].astype(str).to_numpy(dtype=object) if c in df else np.full(len(df), c + '=?', dtype=object)
+                  for c in CATEGORICAS]
+        if 'Materia' in df and 'Dificultad_Num' in df:
+            dificultad = pd.to_numeric(df['Dificultad_Num'], errors='coerce').round().astype('Int64').astype(str)
+            textos.append('Materia×Dif=' + df['Materia'].astype(str).to_numpy(dtype=object) + '|' + dificultad.to_numpy(dtype=object))
+        cat = self.hasher.transform(zip(*textos))
+        return sparse.hstack([sparse.csr_matrix(num), cat], format='csr')
+
+    @staticmethod
+    def _entrenables(df):
+        y = pd.to_numeric(df[OBJETIVO], errors='coerce')
+        return df[y > 0], y[y > 0].to_numpy(dtype='float64')
+
+    # --- ENTRENAMIENTO ---
+    def ajustar(self, df):
+        """Fit completo sobre el historial: varias épocas de partial_fit en lotes barajados."""
+        inicio = time.perf_counter()
+        datos, y = self._entrenables(df)
+        if len(datos) < MIN_FILAS: return None
+        self.escalador = preprocessing.StandardScaler()
+        X = self._matriz(datos, ajustar_escalador=True)
+        rng = np.random.default_rng(self.semilla)
+        lote = max(256, min(10_000, len(y) // 10))
+        for _ in range(self.epocas):
+            orden = rng.permutation(len(y))
+            for i in range(0, len(y), lote):
+                idx = orden[i:i + lote]
+                self.regresor.partial_fit(X[idx], y[idx])
+        self.filas_vistas = len(df)
+        self.n_entrenamiento = len(y)
+        self.ajustado = True
+        self.metricas = {"modo": "completo", "filas": len(y), "segundos": round(time.perf_counter() - inicio, 4)}
+        return self
+
+    def actualizar(self, df_nuevas, total_filas, repaso=None):
+        """
+        Una sola pasada de partial_fit sobre las filas nuevas barajadas con `repaso` (muestra de filas
+        ya aprendidas, ver muestra_repaso): varias épocas solo sobre lo nuevo arrastran el regresor
+        hacia las últimas sesiones. Devuelve una copia (la publicada no se muta mientras se predice).
+        """
+        inicio = time.perf_counter()
+        nuevo = copy.deepcopy(self)
+        datos, y = self._entrenables(df_nuevas)
+        if len(y):
+            X = nuevo._matriz(datos, ajustar_escalador=True)   # el escalador solo acumula lo nuevo
+            n_nuevas = len(y)
+            if repaso is not None and len(repaso):
+                datos_repaso, y_repaso = self._entrenables(repaso)
+                X, y = sparse.vstack([X, nuevo._matriz(datos_repaso)], format='csr'), np.concatenate([y, y_repaso])
+            orden = np.random.default_rng(self.semilla + total_filas).permutation(len(y))
+            nuevo.regresor.partial_fit(X[orden], y[orden])
+            nuevo.n_entrenamiento += n_nuevas
+        nuevo.filas_vistas = total_filas
+        nuevo.metricas = {"modo": "incremental", "filas": len(y), "segundos": round(time.perf_counter() - inicio, 4)}
+        return nuevo
+
+    def muestra_repaso(self, df, n_nuevas):
+        """Hasta REPASO_POR_FILA * n_nuevas filas al azar de las ya aprendidas (df.iloc[:filas_vistas])."""
+        vistas = df.iloc[:self.filas_vistas]
+        return vistas.sample(n=min(len(vistas), REPASO_POR_FILA * n_nuevas), random_state=self.semilla + self.filas_vistas)
+
+    # --- PREDICCIÓN ---
+    def predecir(self, filas):
+        """filas: lista de dicts con cualquier subconjunto de NUMERICAS/CATEGORICAS; horas recortadas a [0.5, 12]."""
+        df = pd.DataFrame(filas)
+        return np.clip(self.regresor.predict(self._matriz(df)), HORAS_MIN, HORAS_MAX).tolist()
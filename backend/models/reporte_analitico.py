@@ -0,0 +1,182 @@
+# reporte_analitico.py - Reporte analítico materializado y respuestas por plantilla para ConsultarEstadisticas
+
+import functools
+import re
+import threading
+import unicodedata
+from datetime import timedelta
+
+from backend.utils.lazy_import import ModuloPerezoso
+
+pd = ModuloPerezoso('pandas')
+
+SIN_DATOS = "No hay datos registrados aún."
+TOP_MATERIAS = 5
+PATRON_ACTIVIDAD = re.compile('Gimnasio|Deporte')
+
+
+def _normalizar(texto):
+    """Minúsculas y sin tildes, para comparar consultas y nombres de materia."""
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+@functools.lru_cache(maxsize=512)
+def _patron(clave):
+    """'dorm*' = palabra que empieza por 'dorm'; si no, palabra completa (admite plural: meta/metas, no 'metabolismo')."""
+    if clave.endswith('*'): return re.compile(r'\b' + re.escape(clave[:-1]))
+    return re.compile(r'\b' + re.escape(clave) + r'(?:s|es)?\b')
+
+def _menciona(consulta, clave):
+    """¿`consulta` (ya normalizada) nombra `clave` como palabra, no como trozo de otra ('curso' en 'recurso')?"""
+    return _patron(clave).search(consulta) is not None
+
+def _float(valor, decimales=2):
+    return 0.0 if pd.isna(valor) else round(float(valor), decimales)
+
+def _moda(serie, excluir=()):
+    for valor, n in serie.value_counts().items():
+        if n and str(valor) not in excluir: return str(valor)
+    return None
+
+def _coincide_categoria(serie, patron):
+    """str.contains evaluado sobre las categorías (pocas) en vez de sobre cada fila."""
+    if not isinstance(serie.dtype, pd.CategoricalDtype): serie = serie.astype('category')
+    categorias = [c for c in serie.cat.categories if patron.search(str(c))]
+    return serie.isin(categorias)
+
+
+def calcular(df):
+    """Estadísticas del historial tipado en una sola pasada de groupbys; dict serializable."""
+    if df.empty: return {"sesiones": 0}
+    horas = df['Horas_Estudio_Real'].astype('float64')
+    energia = pd.to_numeric(df['Nivel_Energia'], errors='coerce').astype('float64')
+    por_materia = horas.groupby(df['Materia'], observed=True).sum().sort_values(ascending=False)
+    energia_dia = energia.groupby(df['Dia_Semana'], observed=True).mean().dropna()
+    fechas = df['Fecha'] if pd.api.types.is_datetime64_any_dtype(df['Fecha']) else pd.to_datetime(df['Fecha'], errors='coerce')
+    ultima = fechas.max()
+    semana = horas[fechas > ultima - timedelta(days=7)].sum() if pd.notna(ultima) else 0.0
+    return {
+        "sesiones": len(df),
+        "total_horas": _float(horas.sum()),
+        "materias": [{"materia": str(m), "horas": _float(h)} for m, h in por_materia.items()],
+        "energia_media": _float(energia.mean(), 1),
+        "mejor_dia": str(energia_dia.idxmax()) if len(energia_dia) else "N/A",
+        "sueno_medio": _float(df['Horas_Sueno'].astype('float64').mean(), 1) if 'Horas_Sueno' in df.columns else 0.0,
+        "sesiones_actividad": int(_coincide_categoria(df['Actividad_Fisica'], PATRON_ACTIVIDAD).sum()),
+        "tasa_exito": int((df['Cumplio_Objetivo'] == 'sí').sum() * 100 / len(df)),
+        "bloqueo_frecuente": _moda(df['Factor_Bloqueo'], excluir=('Ninguno', '0', 'nan')),
+        "lugar_frecuente": _moda(df['Lugar_Estudio'], excluir=('0', 'nan')),
+        "horas_ultima_semana": _float(semana),
+        "ultima_fecha": ultima.strftime('%Y-%m-%d') if pd.notna(ultima) else None,
+    }
+
+def texto_reporte(stats):
+    """Texto compacto del reporte (el mismo formato que recibía Gemini como contexto)."""
+    if not stats.get("sesiones"): return SIN_DATOS
+    top = ", ".join(f"{m['materia']} ({m['horas']}h)" for m in stats['materias'][:3])
+    return (
+        f"ANÁLISIS DE DATOS:\n- Total estudiado: {stats['total_horas']}h.\n"
+        f"- Top Materias: {top}.\n- Energía media: {stats['energia_media']:.1f}/5. Mejor día: {stats['mejor_dia']}.\n"
+        f"- Sueño promedio: {stats['sueno_medio']:.1f}h. Sesiones con Gym: {stats['sesiones_actividad']}.\n"
+    )
+
+
+# --- RESPUESTAS POR PLANTILLA ---
+def _materias(s, consulta):
+    nombradas = [m for m in s['materias'] if _menciona(consulta, _normalizar(m['materia']))]
+    if nombradas:
+        return " ".join(f"Llevas **{m['horas']}h** de {m['materia']} ({round(m['horas'] * 100 / s['total_horas']) if s['total_horas'] else 0}% del total)."
+                        for m in nombradas)
+    top = ", ".join(f"{m['materia']} ({m['horas']}h)" for m in s['materias'][:TOP_MATERIAS])
+    return f"📚 Tus materias con más horas: {top}."
+
+def _total(s, _):
+    return f"⏱️ En total estudiaste **{s['total_horas']}h** en {s['sesiones']} sesiones."
+
+# (nombre, palabras clave normalizadas —'*' final = raíz—, plantilla)
+_INTENCIONES = [
+    ("materias", ("materia", "asignatura", "curso", "ramo"), _materias),
+    ("energia", ("energia", "cansad*", "animo", "mejor dia"),
+     lambda s, _: f"⚡ Tu energía media es {s['energia_media']:.1f}/5; el día en que rindes con más energía es el **{s['mejor_dia']}**."),
+    ("sueno", ("sueno", "dorm*"), lambda s, _: f"😴 Duermes en promedio {s['sueno_medio']:.1f}h."),
+    ("actividad", ("gym", "gimnasio", "deporte", "ejercicio", "actividad"),
+     lambda s, _: f"🏋️ Registraste {s['sesiones_actividad']} sesiones con gimnasio o deporte."),
+    ("exito", ("exito", "objetivo", "cumpl*", "meta"), lambda s, _: f"🎯 Cumpliste el objetivo en el {s['tasa_exito']}% de tus sesiones."),
+    ("bloqueos", ("bloque*", "distra*", "problema", "obstaculo"),
+     lambda s, _: f"🚧 Lo que más te bloquea: **{s['bloqueo_frecuente']}**." if s['bloqueo_frecuente'] else "🚧 No registraste bloqueos."),
+    ("lugar", ("lugar", "donde"), lambda s, _: f"📍 Donde más estudias: {s['lugar_frecuente'] or 'sin datos'}."),
+    ("semana", ("semana", "ultimos dias", "reciente"),
+     lambda s, _: f"🗓️ En los últimos 7 días registrados (hasta {s['ultima_fecha']}) estudiaste {s['horas_ultima_semana']}h."),
+]
+_GENERICAS = ("total", "cuant*", "hora", "sesion")
+RESUMEN = ("materias", "energia", "sueno", "actividad")
+
+def intenciones(consulta, stats):
+    """Nombres de las intenciones reconocidas en la consulta (nombrar una materia cuenta como 'materias')."""
+    consulta = _normalizar(consulta)
+    nombres = [n for n, claves, _ in _INTENCIONES if any(_menciona(consulta, c) for c in claves)]
+    if "materias" not in nombres and any(_menciona(consulta, _normalizar(m['materia'])) for m in stats.get('materias', [])):
+        nombres.insert(0, "materias")
+    if not nombres and any(_menciona(consulta, c) for c in _GENERICAS): nombres = ["total"]
+    return nombres
+
+def responder(consulta, stats):
+    """
+    Respuesta directa (sin segunda llamada al LLM) para las preguntas de estadísticas
+    habituales; si la consulta no encaja con ninguna intención se devuelve un resumen.
+    """
+    if not stats.get("sesiones"): return SIN_DATOS
+    nombres = intenciones(consulta, stats)
+    plantillas = {n: fn for n, _, fn in _INTENCIONES}
+    if nombres == ["total"]: return _total(stats, None)
+    if not nombres: return "\n".join([_total(stats, None)] + [plantillas[n](stats, '') for n in RESUMEN])
+    consulta = _normalizar(consulta)
+    return "\n".join(plantillas[n](stats, consulta) for n in nombres)
+
+
+class ReporteAnalitico:
+    """
+    Reporte materializado del historial. Se recalcula solo cuando cambia la firma del
+    archivo o el store avisa de una escritura (suscrito a HistorialStore); entre medias
+    las consultas de estadísticas se responden desde memoria. Como HistorialCache, recalcula
+    bajo `_carga` y no bajo `_lock`, que es el que toma invalidar() desde el store.
+    """
+
+    def __init__(self, cargador, firma):
+        self._cargador = cargador
+        self._firma = firma
+        self._lock = threading.Lock()
+        self._carga = threading.Lock()
+        self._version = 0
+        self._stats = None
+        self._firma_stats = None
+        self.hits = 0
+        self.recalculos = 0
+
+    def obtener(self):
+        firma = self._firma()
+        with self._lock:
+            if self._stats is not None and self._firma_stats == firma:
+                self.hits += 1
+                return self._stats
+        with self._carga:
+            with self._lock:
+                if self._stats is not None and self._firma_stats == firma:
+                    self.hits += 1
+                    return self._stats
+                self.recalculos += 1
+                version = self._version
+            stats = calcular(self._cargador())
+            with self._lock:
+                if self._version == version: self._stats, self._firma_stats = stats, firma
+            return stats
+
+    def invalidar(self, *_):
+        with self._lock:
+            self._stats = None
+            self._firma_stats = None
+            self._version += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {"hits": self.hits, "recalculos": self.recalculos, "vigente": self._stats is not None}
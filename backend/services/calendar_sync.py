@@ -0,0 +1,161 @@
+# calendar_sync.py - Sincronización idempotente del plan semanal con Google Calendar
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from backend.utils.lazy_import import ModuloPerezoso
+from backend.utils import metricas
+
+# Cliente de Google Calendar diferido hasta la primera sincronización
+credentials = ModuloPerezoso('google.oauth2.credentials')
+discovery = ModuloPerezoso('googleapiclient.discovery')
+http_errors = ModuloPerezoso('googleapiclient.errors')
+
+ZONA_HORARIA = 'America/Lima'
+ORIGEN = 'asistente_upn'
+# Cada plan (semanal, de exámenes, de crisis...) se sincroniza y se poda por separado. Los eventos
+# sin clave (sincronizados antes de existir) pertenecen al plan por defecto.
+PLAN_POR_DEFECTO = 'semanal'
+CLAVE_PLAN_VALIDA = re.compile(r'^[a-z0-9_-]{1,32}$')
+TAMANO_LOTE = 50
+
+# ID de colores de Google Calendar (1-11) según el tipo de bloque
+COLORES = {'Examen': '11', 'Crisis': '11', 'Trabajo': '8', 'Estudio': '9', 'Proyecto': '7'}
+
+_servicio_lock = threading.Lock()
+_servicio_cache = {"clave": None, "servicio": None}
+
+
+def obtener_servicio(token_file, scopes):
+    """Servicio 'calendar' v3 cacheado; se reconstruye solo si cambia token.json."""
+    st = os.stat(token_file)
+    clave = (token_file, st.st_mtime_ns, st.st_size)
+    with _servicio_lock:
+        if _servicio_cache["clave"] != clave:
+            creds = credentials.Credentials.from_authorized_user_file(token_file, scopes)
+            _servicio_cache.update(clave=clave, servicio=discovery.build('calendar', 'v3', credentials=creds, cache_discovery=False))
+        return _servicio_cache["servicio"]
+
+
+def id_evento(item, plan=PLAN_POR_DEFECTO):
+    """ID determinista (base32hex) a partir del plan, fecha, hora de inicio y actividad del bloque."""
+    base = f"{item['fecha']}|{item['hora_inicio']}|{item['actividad']}"
+    if plan != PLAN_POR_DEFECTO: base = f"{plan}|{base}"   # el plan por defecto conserva los IDs de siempre
+    return 'upn' + hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+
+def _fin_evento(item):
+    """'24:00' (o '00:00' tras el inicio) es la medianoche del día siguiente."""
+    horas, minutos = (int(x) for x in str(item['hora_fin']).split(':'))
+    if (horas, minutos) in ((0, 0), (24, 0)):
+        siguiente = datetime.strptime(item['fecha'], '%Y-%m-%d').date() + timedelta(days=1)
+        return f"{siguiente.isoformat()}T00:00:00"
+    return f"{item['fecha']}T{item['hora_fin']}:00"
+
+
+def construir_evento(item, plan=PLAN_POR_DEFECTO):
+    tipo = item.get('tipo', 'Estudio')
+    evento = {
+        'summary': f"📚 {item['actividad']}",
+        'description': f"Generado por Asistente UPN.\nTipo: {tipo}\nPrioridad: {item.get('prioridad','Normal')}",
+        'start': {'dateTime': f"{item['fecha']}T{item['hora_inicio']}:00", 'timeZone': ZONA_HORARIA},
+        'end': {'dateTime': _fin_evento(item), 'timeZone': ZONA_HORARIA},
+        'colorId': COLORES.get(tipo, '1'),  # 1 = Lavanda (default)
+        'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 15}]},
+    }
+    contenido = hashlib.sha1(json.dumps(evento, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    evento['id'] = id_evento(item, plan)
+    evento['extendedProperties'] = {'private': {'origen': ORIGEN, 'plan': plan, 'hash': contenido}}
+    return evento
+
+
+def _eventos_existentes(service, fechas, plan):
+    """Eventos creados por el asistente para `plan` en el rango de fechas: {id: hash}."""
+    zona = ZoneInfo(ZONA_HORARIA)
+    desde = datetime.strptime(min(fechas), '%Y-%m-%d').replace(tzinfo=zona)
+    hasta = datetime.strptime(max(fechas), '%Y-%m-%d').replace(tzinfo=zona) + timedelta(days=1)
+    existentes, token = {}, None
+    while True:
+        resp = service.events().list(
+            calendarId='primary', privateExtendedProperty=f'origen={ORIGEN}', singleEvents=True,
+            timeMin=desde.isoformat(), timeMax=hasta.isoformat(), maxResults=2500, pageToken=token
+        ).execute()
+        for ev in resp.get('items', []):
+            privadas = ev.get('extendedProperties', {}).get('private', {})
+            if privadas.get('plan', PLAN_POR_DEFECTO) == plan: existentes[ev['id']] = privadas.get('hash')
+        token = resp.get('nextPageToken')
+        if not token: return existentes
+
+
+def _ejecutar_en_lotes(service, operaciones):
+    """operaciones: [(clave, request)] -> {clave: excepción o None}, en batch de hasta TAMANO_LOTE."""
+    errores = {}
+    def callback(request_id, response, exception): errores[request_id] = exception
+    for i in range(0, len(operaciones), TAMANO_LOTE):
+        lote = service.new_batch_http_request(callback=callback)
+        for clave, req in operaciones[i:i + TAMANO_LOTE]: lote.add(req, request_id=clave)
+        with metricas.cronometro('calendar_lote'): lote.execute()
+    return errores
+
+
+def sincronizar_plan(service, plan, clave_plan=PLAN_POR_DEFECTO):
+    """
+    Sube el plan como diff contra lo ya sincronizado con la misma `clave_plan`: crea los
+    bloques nuevos, actualiza los modificados, elimina los de ese plan que ya no están
+    (dentro del rango de fechas del plan) y no toca los que no cambiaron ni los de otros planes.
+    Devuelve un reporte por bloque.
+    """
+    if not CLAVE_PLAN_VALIDA.match(clave_plan or ''): raise ValueError(f"Clave de plan inválida: {clave_plan!r}")
+    reporte, eventos = [], {}
+    for item in plan:
+        try:
+            ev = construir_evento(item, clave_plan)
+            eventos[ev['id']] = (item, ev)
+        except (KeyError, TypeError, ValueError) as e:
+            error = f"Falta campo {e}" if isinstance(e, KeyError) else f"Bloque inválido: {e}"
+            reporte.append({"actividad": item.get('actividad') if isinstance(item, dict) else None, "accion": "invalido", "ok": False, "error": error})
+    if not eventos: return {"resultados": reporte, "resumen": _resumen(reporte)}
+
+    existentes = _eventos_existentes(service, [item['fecha'] for item, _ in eventos.values()], clave_plan)
+    acciones, operaciones = {}, []
+    for eid, (item, ev) in eventos.items():
+        if eid not in existentes:
+            acciones[eid] = "creado"
+            operaciones.append((eid, service.events().insert(calendarId='primary', body=ev)))
+        elif existentes[eid] != ev['extendedProperties']['private']['hash']:
+            acciones[eid] = "actualizado"
+            operaciones.append((eid, service.events().update(calendarId='primary', eventId=eid, body=ev)))
+        else:
+            acciones[eid] = "sin_cambios"
+    for eid in existentes.keys() - eventos.keys():
+        acciones[eid] = "eliminado"
+        operaciones.append((eid, service.events().delete(calendarId='primary', eventId=eid)))
+
+    errores = _ejecutar_en_lotes(service, operaciones)
+    # Un ID borrado antes sigue reservado (409): se reactiva con update
+    conflictos = [eid for eid, e in errores.items() if isinstance(e, http_errors.HttpError) and e.resp.status == 409 and acciones[eid] == "creado"]
+    if conflictos:
+        errores.update(_ejecutar_en_lotes(service, [(eid, service.events().update(calendarId='primary', eventId=eid, body=eventos[eid][1])) for eid in conflictos]))
+
+    for eid, accion in acciones.items():
+        item = eventos[eid][0] if eid in eventos else {}
+        error = errores.get(eid)
+        if error is not None: logging.warning(f"Error sincronizando evento {eid}: {error}")
+        metricas.incrementar('calendar_operaciones_total', accion=accion, resultado='ok' if error is None else 'error')
+        reporte.append({"id": eid, "actividad": item.get('actividad'), "fecha": item.get('fecha'), "accion": accion,
+                        "ok": error is None, "error": str(error) if error is not None else None})
+    return {"resultados": reporte, "resumen": _resumen(reporte)}
+
+
+def _resumen(reporte):
+    resumen = {}
+    for r in reporte:
+        clave = r["accion"] if r["ok"] else "errores"
+        resumen[clave] = resumen.get(clave, 0) + 1
+    return resumen
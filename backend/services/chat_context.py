@@ -0,0 +1,130 @@
+# chat_context.py - Ventana de contexto acotada y resumen rodante para el chat
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from backend.utils.file_lock import bloqueo_archivo, escribir_atomico
+
+PRESUPUESTO_TOKENS = int(os.getenv('CHAT_PRESUPUESTO_TOKENS', 4000))
+MAX_LINEAS_RESUMEN = 30
+MAX_CHARS_LINEA = 120
+# Resumen generado por el LLM: mensajes (y caracteres por mensaje) que recibe por actualización
+MAX_MENSAJES_LLM = 60
+MAX_CHARS_MENSAJE_LLM = 600
+ESPERA_TRAS_ERROR_S = 60
+
+# Resúmenes LLM en curso (por ruta) y pausa tras un fallo: compartidos por las instancias del proceso
+_lock_llm = threading.Lock()
+_llm_en_curso = set()
+_llm_pausa_hasta = {}
+
+
+def estimar_tokens(texto):
+    """Aproximación barata (~4 caracteres por token) suficiente para acotar la ventana."""
+    return len(texto or '') // 4 + 1
+
+
+def texto_para_prompt(m):
+    """Texto del mensaje sin las cargas pesadas de herramientas (horario/hitos) que no aportan al prompt."""
+    texto = m.get('text') or ''
+    if m.get('horario'):
+        texto += f" [horario generado: {len(m['horario'].get('planSemanal', []))} bloques]"
+    if m.get('hitos'):
+        texto += f" [{len(m['hitos'])} hitos propuestos]"
+    return texto
+
+
+def _linea_resumen(m, max_chars=MAX_CHARS_LINEA):
+    texto = re.sub(r'\s+', ' ', texto_para_prompt(m)).strip()
+    if len(texto) > max_chars: texto = texto[:max_chars - 1] + '…'
+    return f"{'Asistente' if m.get('role') == 'assistant' else 'Usuario'}: {texto}"
+
+
+def _firma_mensaje(m):
+    return hashlib.sha1(json.dumps(m, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def _cubre(parcial, antiguos):
+    """¿El resumen `parcial` ({"n", "firma", ...}) corresponde a un prefijo de `antiguos`?"""
+    n = parcial.get("n", 0) if parcial else 0
+    return bool(parcial) and n <= len(antiguos) and (n == 0 or _firma_mensaje(antiguos[n - 1]) == parcial.get("firma"))
+
+
+class ResumenRodante:
+    """
+    Resumen de los turnos que salen de la ventana. Con `resumir` (previo, transcripción -> texto,
+    p. ej. una llamada al LLM) se genera en un hilo aparte, fuera de la petición: el prompt usa
+    el último resumen generado más líneas extractivas de lo que aún no cubre. Sin él, o mientras
+    no hay ninguno válido, queda el resumen extractivo, que se extiende de forma incremental y se
+    recalcula si el historial ya no coincide con lo resumido (p. ej. tras un reset).
+    """
+
+    def __init__(self, ruta, resumir=None):
+        self.ruta = ruta
+        self.resumir = resumir
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError):
+            return {"n": 0, "firma": None, "lineas": []}
+
+    def actualizar(self, antiguos):
+        with bloqueo_archivo(self.ruta):
+            estado = self._cargar()
+            if not _cubre(estado, antiguos): estado.update(n=0, lineas=[])
+            if estado["n"] < len(antiguos):
+                estado.update(n=len(antiguos), firma=_firma_mensaje(antiguos[-1]),
+                              lineas=(estado["lineas"] + [_linea_resumen(m) for m in antiguos[estado["n"]:]])[-MAX_LINEAS_RESUMEN:])
+                escribir_atomico(self.ruta, json.dumps(estado, ensure_ascii=False))
+        llm = estado.get("llm") if _cubre(estado.get("llm"), antiguos) else None
+        if self.resumir and (llm is None or llm["n"] < len(antiguos)): self._programar(list(antiguos), llm)
+        if llm is None: return estado["lineas"]
+        return [llm["texto"]] + [_linea_resumen(m) for m in antiguos[llm["n"]:]][-MAX_LINEAS_RESUMEN:]
+
+    # --- RESUMEN LLM EN SEGUNDO PLANO ---
+    def _programar(self, antiguos, previo):
+        with _lock_llm:
+            if self.ruta in _llm_en_curso or time.monotonic() < _llm_pausa_hasta.get(self.ruta, 0): return
+            _llm_en_curso.add(self.ruta)
+        threading.Thread(target=self._generar, args=(antiguos, previo), name='resumen-chat', daemon=True).start()
+
+    def _generar(self, antiguos, previo):
+        try:
+            nuevos = antiguos[previo["n"] if previo else 0:][-MAX_MENSAJES_LLM:]
+            texto = (self.resumir(previo["texto"] if previo else '', "\n".join(_linea_resumen(m, MAX_CHARS_MENSAJE_LLM) for m in nuevos)) or '').strip()
+            if not texto: raise ValueError("resumen vacío")
+            with bloqueo_archivo(self.ruta):
+                estado = self._cargar()
+                estado["llm"] = {"n": len(antiguos), "firma": _firma_mensaje(antiguos[-1]), "texto": texto}
+                escribir_atomico(self.ruta, json.dumps(estado, ensure_ascii=False))
+        except Exception as e:
+            logging.warning(f"Resumen del chat con LLM no disponible (se usa el extractivo): {type(e).__name__}: {e}")
+            with _lock_llm: _llm_pausa_hasta[self.ruta] = time.monotonic() + ESPERA_TRAS_ERROR_S
+        finally:
+            with _lock_llm: _llm_en_curso.discard(self.ruta)
+
+
+def construir_contexto(history, resumen, presupuesto=PRESUPUESTO_TOKENS):
+    """
+    Convierte el historial en `contents` para Gemini: los turnos más recientes que
+    caben en el presupuesto de tokens (siempre al menos el último) y, si quedan
+    turnos fuera, un mensaje inicial con su resumen rodante.
+    """
+    usados, inicio = 0, len(history)
+    for i in range(len(history) - 1, -1, -1):
+        costo = estimar_tokens(texto_para_prompt(history[i]))
+        if usados + costo > presupuesto and i < len(history) - 1: break
+        usados += costo
+        inicio = i
+    contents = [{"role": "model" if m['role'] == "assistant" else "user", "parts": [{"text": texto_para_prompt(m)}]} for m in history[inicio:]]
+    if inicio > 0:
+        lineas = resumen.actualizar(history[:inicio])
+        texto = "Resumen de la conversación anterior:\n" + "\n".join(lineas)
+        contents.insert(0, {"role": "user", "parts": [{"text": texto}]})
+    return contents
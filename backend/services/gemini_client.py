@@ -0,0 +1,71 @@
+# gemini_client.py - Cliente Gemini compartido por todo el proceso
+
+import threading
+import time
+
+from backend.utils.lazy_import import ModuloPerezoso
+
+# httpx / google.genai se cargan al crear el primer cliente
+httpx = ModuloPerezoso('httpx')
+genai = ModuloPerezoso('google.genai')
+types = ModuloPerezoso('google.genai.types')
+
+_lock = threading.Lock()
+_client = None
+_streams_vistos = {}
+_metricas = {
+    "clientes_creados": 0, "reutilizaciones": 0, "llamadas": 0, "setup_ms_total": 0.0,
+    "conexiones_nuevas": 0, "conexiones_reutilizadas": 0
+}
+
+
+def _registrar_conexion(response):
+    """Hook de httpx: una respuesta sobre un stream de red ya visto es una conexión keep-alive reutilizada."""
+    stream = response.extensions.get('network_stream')
+    if stream is None: return
+    with _lock:
+        if id(stream) in _streams_vistos:
+            _metricas["conexiones_reutilizadas"] += 1
+        else:
+            if len(_streams_vistos) > 1000: _streams_vistos.clear()
+            _streams_vistos[id(stream)] = True
+            _metricas["conexiones_nuevas"] += 1
+
+
+def _crear_cliente():
+    http = httpx.Client(
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120),
+        event_hooks={'response': [_registrar_conexion]}
+    )
+    return genai.Client(http_options=types.HttpOptions(httpx_client=http))
+
+
+def get_client():
+    """Cliente único (thread-safe) que mantiene vivo el pool de conexiones HTTP entre peticiones."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = _crear_cliente()
+            _metricas["clientes_creados"] += 1
+        else:
+            _metricas["reutilizaciones"] += 1
+        return _client
+
+
+def reset_client():
+    global _client
+    with _lock: _client = None
+
+
+def registrar_setup(inicio):
+    """Acumula el tiempo de preparación (cliente + config) de una llamada, medido desde `inicio` (perf_counter)."""
+    with _lock:
+        _metricas["llamadas"] += 1
+        _metricas["setup_ms_total"] += (time.perf_counter() - inicio) * 1000
+
+
+def estadisticas():
+    with _lock:
+        llamadas = _metricas["llamadas"]
+        return dict(_metricas, setup_ms_total=round(_metricas["setup_ms_total"], 3),
+                    setup_ms_promedio=round(_metricas["setup_ms_total"] / llamadas, 3) if llamadas else 0.0)
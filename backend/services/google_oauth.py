@@ -0,0 +1,93 @@
+# google_oauth.py - Flujo OAuth de Google Calendar sin bloquear el worker
+#
+# InstalledAppFlow.run_local_server() deja la petición /api/google/connect esperando (y abre un
+# servidor propio) hasta que el usuario acepta en el navegador: con varios workers eso ocupa un
+# worker por usuario y el callback puede caer en otro proceso. Aquí el flujo se parte en dos
+# peticiones: iniciar() devuelve la URL de autorización y guarda state + code_verifier en disco
+# (compartido entre workers); completar() canjea el código en /api/google/callback.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from backend.utils.config_utils import ruta_datos
+from backend.utils.file_lock import bloqueo_archivo, escribir_atomico
+
+PENDIENTES_FILE = ruta_datos('google_oauth_pendientes.json', 'GOOGLE_OAUTH_PENDIENTES_ARCHIVO')
+TTL_PENDIENTE_S = 600
+_lock_transporte = threading.Lock()
+
+
+class ErrorOAuth(ValueError):
+    pass
+
+
+def _leer_pendientes():
+    try:
+        with open(PENDIENTES_FILE, encoding='utf-8') as f: pendientes = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    ahora = time.time()
+    return {s: p for s, p in pendientes.items() if ahora - p.get('creado', 0) < TTL_PENDIENTE_S}
+
+
+def _http_permitido(redirect_uri):
+    """Un redirect http:// solo es aceptable en loopback (desarrollo) o si el TLS termina en el proxy (PROXY_SALTOS)."""
+    if not redirect_uri.startswith('http://'): return False
+    loopback = redirect_uri.startswith('http://localhost') or redirect_uri.startswith('http://127.0.0.1')
+    return loopback or int(os.getenv('PROXY_SALTOS', 0)) > 0
+
+
+@contextmanager
+def _transporte_http(permitir):
+    """
+    oauthlib solo admite http:// vía la variable OAUTHLIB_INSECURE_TRANSPORT; se activa durante
+    el canje y se restaura después, en vez de dejarla puesta para todo el proceso.
+    """
+    if not permitir:
+        yield
+        return
+    with _lock_transporte:
+        previo = os.environ.get('OAUTHLIB_INSECURE_TRANSPORT')
+        os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
+        try:
+            yield
+        finally:
+            if previo is None: os.environ.pop('OAUTHLIB_INSECURE_TRANSPORT', None)
+            else: os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = previo
+
+
+def _flow(credenciales, scopes, redirect_uri, **kw):
+    from google_auth_oauthlib.flow import Flow
+    return Flow.from_client_secrets_file(credenciales, scopes, redirect_uri=redirect_uri, **kw)
+
+
+def iniciar(credenciales, scopes, redirect_uri):
+    """URL de autorización de Google; el state pendiente caduca a los TTL_PENDIENTE_S."""
+    flow = _flow(credenciales, scopes, redirect_uri)
+    url, state = flow.authorization_url(access_type='offline', prompt='consent', include_granted_scopes='true')
+    with bloqueo_archivo(PENDIENTES_FILE):
+        pendientes = _leer_pendientes()
+        pendientes[state] = {'code_verifier': flow.code_verifier, 'redirect_uri': redirect_uri, 'creado': time.time()}
+        escribir_atomico(PENDIENTES_FILE, json.dumps(pendientes))
+    return url
+
+
+def completar(credenciales, scopes, token_file, parametros, state):
+    """
+    Canjea el código del callback (`parametros`: su query string) y guarda token.json de forma
+    atómica. La URL de respuesta se arma sobre el redirect_uri guardado y no con request.url:
+    detrás de un proxy que termina TLS esa es http:// y oauthlib la rechaza (InsecureTransportError).
+    """
+    with bloqueo_archivo(PENDIENTES_FILE):
+        pendientes = _leer_pendientes()
+        pendiente = pendientes.pop(state or '', None)
+        escribir_atomico(PENDIENTES_FILE, json.dumps(pendientes))
+    if pendiente is None: raise ErrorOAuth("Autorización desconocida o caducada; vuelve a conectar")
+    flow = _flow(credenciales, scopes, pendiente['redirect_uri'], state=state, code_verifier=pendiente['code_verifier'])
+    with _transporte_http(_http_permitido(pendiente['redirect_uri'])):
+        flow.fetch_token(authorization_response=f"{pendiente['redirect_uri']}?{urlencode(parametros)}")
+    escribir_atomico(token_file, flow.credentials.to_json())
@@ -0,0 +1,234 @@
+# historial_io.py - Importación masiva (CSV/JSONL en streaming) y exportación del historial
+
+import io
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from backend.utils import metricas
+from backend.utils.lazy_import import ModuloPerezoso
+from backend.models.ml_model import COLUMNAS, historial_store
+
+np = ModuloPerezoso('numpy')
+pd = ModuloPerezoso('pandas')
+
+FILAS_POR_LOTE = int(os.getenv('IMPORTACION_FILAS_LOTE', 20_000))
+MAX_ERRORES_REPORTADOS = 50
+FORMATOS = ('csv', 'jsonl')
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+DIFICULTADES = {'baja': 1, 'media': 2, 'alta': 3}
+OBJETIVOS = {'sí': 'sí', 'si': 'sí', 'yes': 'sí', 'true': 'sí', '1': 'sí', 'no': 'no', 'false': 'no', '0': 'no', 'parcial': 'parcial'}
+# Mismos valores por defecto que /api/registrar_historial
+DEFECTOS = {'Dificultad_Cat': 'media', 'Nivel_Energia': 3, 'Cumplio_Objetivo': 'sí', 'Factor_Bloqueo': 'Ninguno',
+            'Calificacion': 0, 'Horas_Sueno': 7, 'Lugar_Estudio': 'Casa', 'Actividad_Fisica': 'Ninguna', 'Tipo_Sesion': 'Manual'}
+# Rangos válidos de las columnas numéricas (inclusive)
+RANGOS = {'Horas_Estudio_Real': (0, 24), 'Nivel_Energia': (1, 5), 'Calificacion': (0, 20), 'Horas_Sueno': (0, 24)}
+ENTEROS = ('Nivel_Energia',)
+# Nombres aceptados en la cabecera: las columnas del CSV y los campos de la API (sin distinguir mayúsculas)
+ALIAS = {c.lower(): c for c in COLUMNAS}
+ALIAS.update({'horas_reales': 'Horas_Estudio_Real', 'horas': 'Horas_Estudio_Real', 'dificultad': 'Dificultad_Cat',
+              'nivel_energia': 'Nivel_Energia', 'energia': 'Nivel_Energia', 'cumplio_objetivo': 'Cumplio_Objetivo',
+              'factor_bloqueo': 'Factor_Bloqueo', 'calificacion': 'Calificacion', 'horas_sueno': 'Horas_Sueno',
+              'lugar_estudio': 'Lugar_Estudio', 'actividad_fisica': 'Actividad_Fisica', 'dia_semana': 'Dia_Semana',
+              'tipo_sesion': 'Tipo_Sesion'})
+OBLIGATORIAS = ('Materia', 'Horas_Estudio_Real')
+# Primer campo de la fila que reemplaza a una línea con más columnas que la cabecera
+MARCA_MALFORMADA = '\x00campos:'
+
+
+class ErrorImportacion(ValueError):
+    """El archivo no se puede importar (formato, cabecera); se responde 400."""
+
+
+def detectar_formato(formato=None, nombre_archivo=None, tipo_contenido=None):
+    if formato:
+        if formato not in FORMATOS: raise ErrorImportacion(f"Formato no soportado: {formato} (usa csv o jsonl)")
+        return formato
+    nombre, tipo = (nombre_archivo or '').lower(), (tipo_contenido or '').lower()
+    if nombre.endswith(('.jsonl', '.ndjson', '.json')) or 'json' in tipo: return 'jsonl'
+    return 'csv'
+
+
+# --- PARSEO EN STREAMING ---
+def _marcar_malformada(campos):
+    """
+    on_bad_lines: en vez de descartar la línea se deja una fila marcada en su lugar, así cuenta
+    como rechazada (y en modo estricto) y las filas siguientes conservan su número de línea.
+    """
+    return [f"{MARCA_MALFORMADA}{len(campos)}"]
+
+def _lotes(stream, formato, separador=','):
+    """DataFrames de hasta FILAS_POR_LOTE filas, leídos del stream sin cargar el archivo entero."""
+    try:
+        if formato == 'jsonl':
+            yield from pd.read_json(stream, lines=True, chunksize=FILAS_POR_LOTE, dtype=False, convert_dates=False)
+        else:
+            # on_bad_lines invocable requiere el motor python (más lento que el de C, pero exacto)
+            yield from pd.read_csv(stream, chunksize=FILAS_POR_LOTE, dtype=str, sep=separador, encoding='utf-8-sig',
+                                   skipinitialspace=True, engine='python', on_bad_lines=_marcar_malformada)
+    except (ValueError, UnicodeDecodeError) as e:
+        if isinstance(e, pd.errors.EmptyDataError): return
+        raise ErrorImportacion(f"No se pudo leer el archivo {formato}: {e}") from e
+
+def _texto(serie, transformar=None):
+    """strip (y transformar) sobre los valores distintos, no fila a fila: las columnas de texto tienen pocos."""
+    codigos, unicos = pd.factorize(serie)
+    limpios = [str(v).strip() for v in unicos]
+    if transformar: limpios = [transformar(v) for v in limpios]
+    limpios = np.array(limpios + [None], dtype=object)   # el código -1 (nulo) cae en el último: None
+    return pd.Series(limpios[codigos], index=serie.index, dtype=object)
+
+def _combinar(series):
+    resultado = series[0]
+    for serie in series[1:]: resultado = resultado.combine_first(serie)
+    return resultado
+
+def validar_lote(df, hoy=None):
+    """
+    Normaliza un lote al esquema COLUMNAS. Devuelve (df_validas, [(posición, motivo)], columnas_ignoradas).
+    Se aplican los mismos valores por defecto que en el registro manual; Dificultad_Num y
+    Dia_Semana se derivan de Dificultad_Cat y Fecha si no vienen.
+    """
+    campos_cabecera, primera = len(df.columns), df.iloc[:, 0] if len(df.columns) else pd.Series([], dtype=object)
+    malformadas = primera.notna() & primera.astype(str).str.startswith(MARCA_MALFORMADA)
+    renombres = {c: ALIAS[str(c).strip().lower()] for c in df.columns if str(c).strip().lower() in ALIAS}
+    ignoradas = [str(c) for c in df.columns if c not in renombres]
+    # Varios alias de la misma columna (p. ej. JSONL con 'materia' y 'Materia'): gana el primero no vacío
+    fuentes = {}
+    for original, destino in renombres.items(): fuentes.setdefault(destino, []).append(df[original])
+    df = pd.DataFrame({destino: _combinar(series) for destino, series in fuentes.items()}, index=df.index)
+    faltan = [c for c in OBLIGATORIAS if c not in df.columns]
+    if faltan: raise ErrorImportacion(f"Faltan columnas obligatorias: {', '.join(faltan)}")
+
+    n = len(df)
+    columna = lambda c: df[c] if c in df.columns else pd.Series([pd.NA] * n, index=df.index, dtype='object')
+    salida, motivos = pd.DataFrame(index=df.index), pd.Series('', index=df.index, dtype=object)
+    def invalidar(mascara, motivo):
+        mascara = mascara.fillna(False).astype(bool) & (motivos == '')
+        motivos[mascara] = motivo
+
+    for campos in primera[malformadas].unique():
+        invalidar(primera == campos, f"La línea tiene {campos[len(MARCA_MALFORMADA):]} campos y la cabecera {campos_cabecera}")
+    materia = _texto(columna('Materia'), str.title)
+    invalidar(materia.isna() | (materia == ''), "Materia vacía")
+    salida['Materia'] = materia
+
+    for col, (minimo, maximo) in RANGOS.items():
+        valores = pd.to_numeric(columna(col), errors='coerce')
+        crudos = _texto(columna(col))
+        vacios = crudos.isna() | (crudos == '')
+        if col in DEFECTOS: valores = valores.mask(vacios, DEFECTOS[col])
+        invalidar(valores.isna(), f"{col} no numérico")
+        invalidar((valores < minimo) | (valores > maximo), f"{col} fuera de rango [{minimo}, {maximo}]")
+        if col in ENTEROS:
+            invalidar(valores % 1 != 0, f"{col} debe ser entero")
+            valores = valores.where(valores % 1 == 0).astype('Int64')
+        salida[col] = valores
+
+    dificultad = _texto(columna('Dificultad_Cat'), str.lower)
+    numerica = pd.to_numeric(columna('Dificultad_Num'), errors='coerce')
+    por_numero = numerica.map({v: k for k, v in DIFICULTADES.items()})
+    dificultad = dificultad.where(dificultad.notna() & (dificultad != ''), por_numero).fillna(DEFECTOS['Dificultad_Cat'])
+    invalidar(~dificultad.isin(list(DIFICULTADES)), "Dificultad_Cat debe ser baja, media o alta")
+    salida['Dificultad_Cat'] = dificultad
+    salida['Dificultad_Num'] = dificultad.map(DIFICULTADES)
+
+    objetivo = _texto(columna('Cumplio_Objetivo'), str.lower)
+    objetivo = objetivo.where(objetivo.notna() & (objetivo != ''), DEFECTOS['Cumplio_Objetivo'])
+    invalidar(~objetivo.isin(list(OBJETIVOS)), "Cumplio_Objetivo debe ser sí, no o parcial")
+    salida['Cumplio_Objetivo'] = objetivo.map(OBJETIVOS)
+
+    crudas = _texto(columna('Fecha'))
+    fechas = pd.to_datetime(crudas, format='%Y-%m-%d', errors='coerce')
+    otras = fechas.isna() & crudas.notna() & (crudas != '')
+    if otras.any(): fechas[otras] = pd.to_datetime(crudas[otras], format='mixed', dayfirst=True, errors='coerce')
+    sin_fecha = crudas.isna() | (crudas == '')
+    fechas = fechas.mask(sin_fecha, pd.Timestamp(hoy or datetime.now().date()))
+    invalidar(fechas.isna(), "Fecha inválida")
+    salida['Fecha'] = fechas.dt.strftime('%Y-%m-%d')
+    dia = _texto(columna('Dia_Semana'), str.capitalize)
+    salida['Dia_Semana'] = dia.where(dia.notna() & (dia != ''), fechas.dt.dayofweek.map(dict(enumerate(DIAS_SEMANA))))
+
+    for col in ('Factor_Bloqueo', 'Lugar_Estudio', 'Actividad_Fisica', 'Tipo_Sesion'):
+        valores = _texto(columna(col))
+        salida[col] = valores.where(valores.notna() & (valores != ''), DEFECTOS[col])
+
+    validas = motivos == ''
+    errores = [(int(pos), motivos.iat[pos]) for pos in (~validas.to_numpy()).nonzero()[0]]
+    return salida.loc[validas, COLUMNAS], errores, ignoradas
+
+
+# --- IMPORTACIÓN ---
+def importar(stream, formato='csv', estricto=False, separador=','):
+    """
+    Valida el archivo por lotes y vuelca las filas válidas a un CSV temporal; al final hace
+    un único append al historial (un solo aviso a los listeners → un solo reentrenamiento).
+    Con estricto=True, si alguna fila es inválida no se importa nada.
+    """
+    inicio, vistas, importadas, errores, n_errores, ignoradas = time.perf_counter(), 0, 0, [], 0, set()
+    desplazamiento = 2 if formato == 'csv' else 1   # número de línea = fila + cabecera (CSV)
+    with metricas.cronometro('historial_importacion', formato=formato):
+        tmp = tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False)
+        try:
+            with tmp:
+                for lote in _lotes(stream, formato, separador):
+                    validas, errores_lote, ignoradas_lote = validar_lote(lote)
+                    ignoradas.update(ignoradas_lote)
+                    n_errores += len(errores_lote)
+                    errores.extend({"linea": vistas + pos + desplazamiento, "error": motivo}
+                                   for pos, motivo in errores_lote[:MAX_ERRORES_REPORTADOS - len(errores)])
+                    validas.to_csv(tmp, header=False, index=False, lineterminator='\n')
+                    vistas += len(lote)
+                    importadas += len(validas)
+            if estricto and n_errores: importadas = 0
+            else: historial_store.agregar_csv(tmp.name, importadas)
+        finally:
+            os.remove(tmp.name)
+    metricas.incrementar('historial_filas_importadas_total', importadas, formato=formato, resultado='importada')
+    if n_errores: metricas.incrementar('historial_filas_importadas_total', n_errores, formato=formato, resultado='rechazada')
+    return {"importadas": importadas, "rechazadas": n_errores, "leidas": vistas, "errores": errores,
+            "columnas_ignoradas": sorted(ignoradas), "estricto": estricto, "segundos": round(time.perf_counter() - inicio, 3)}
+
+
+# --- EXPORTACIÓN ---
+class _FlujoBloques(io.RawIOBase):
+    """Expone un generador de bloques de bytes como archivo de solo lectura (para pd.read_csv)."""
+
+    def __init__(self, bloques):
+        self._bloques, self._pendiente = iter(bloques), b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._pendiente:
+            self._pendiente = next(self._bloques, None)
+            if self._pendiente is None:
+                self._pendiente = b''
+                return 0
+        n = min(len(destino), len(self._pendiente))
+        destino[:n], self._pendiente = self._pendiente[:n], self._pendiente[n:]
+        return n
+
+def exportar(formato='csv', tamano_bloque=1 << 20):
+    """
+    Generador de bytes: el CSV tal cual, o JSONL convertido por lotes de FILAS_POR_LOTE filas
+    (memoria acotada). El CSV lo trocea pd.read_csv y no un corte por saltos de línea, que
+    partiría los campos entrecomillados con saltos de línea dentro.
+    """
+    metricas.incrementar('historial_exportaciones_total', formato=formato)
+    if formato == 'csv':
+        yield from historial_store.leer_bloques(tamano_bloque)
+        return
+    flujo = io.BufferedReader(_FlujoBloques(historial_store.leer_bloques(tamano_bloque)), tamano_bloque)
+    try:
+        lotes = pd.read_csv(flujo, chunksize=FILAS_POR_LOTE, dtype={c: str for c in ('Materia', 'Fecha', 'Dia_Semana')})
+    except pd.errors.EmptyDataError:
+        return
+    with lotes:
+        for df in lotes:
+            if df.empty: continue
+            texto = df.to_json(orient='records', lines=True, force_ascii=False)
+            yield (texto if texto.endswith('\n') else texto + '\n').encode('utf-8')
@@ -0,0 +1,211 @@
+# job_queue.py - Cola de trabajos para los endpoints que llaman a Gemini
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from backend.utils.config_utils import ruta_datos
+from backend.utils.file_lock import escribir_atomico
+
+CODIGOS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+
+def es_transitorio(error):
+    """Errores que vale la pena reintentar: rate limit, 5xx y fallos de red/timeouts."""
+    # Si httpx / google.genai no se han importado, el error no puede venir de ellos: no se fuerza su carga
+    genai_errors, httpx = sys.modules.get('google.genai.errors'), sys.modules.get('httpx')
+    if genai_errors is not None and isinstance(error, genai_errors.APIError): return error.code in CODIGOS_TRANSITORIOS
+    if httpx is not None and isinstance(error, httpx.TransportError): return True
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class AlmacenJobs:
+    """
+    Estado de los jobs en disco (un JSON por job) para que cualquier worker del servidor
+    responda GET /api/jobs/<id>, no solo el proceso que lo ejecuta. Los terminados se
+    borran pasadas `ttl_s`.
+    """
+
+    ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, directorio, ttl_s=3600):
+        self.directorio = directorio
+        self.ttl_s = ttl_s
+        self._escrituras = 0
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, job_id):
+        return os.path.join(self.directorio, f"{job_id}.json")
+
+    def guardar(self, job):
+        try:
+            escribir_atomico(self._ruta(job["id"]), json.dumps(job, ensure_ascii=False, default=str))
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"No se pudo guardar el job {job['id']}: {e}")
+        self._escrituras += 1
+        if self._escrituras % 100 == 0: self.limpiar()
+
+    def cargar(self, job_id):
+        if not self.ID_VALIDO.match(job_id or ''): return None
+        try:
+            with open(self._ruta(job_id), encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def limpiar(self):
+        limite = time.time() - self.ttl_s
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if os.path.getmtime(ruta) < limite: os.remove(ruta)
+            except OSError:
+                pass
+
+
+class ColaTrabajos:
+    """
+    Pool acotado de workers. `enviar` devuelve un job id de inmediato; cada job se
+    ejecuta con timeout total, reintentos con backoff exponencial (+ jitter) para
+    errores transitorios, y queda consultable por id hasta que se recicla.
+
+    `fn` y `respaldo` deben ser puros (solo calculan): un intento que vence el timeout
+    sigue corriendo en segundo plano. Las escrituras van en `al_completar(resultado)`, que
+    se ejecuta una sola vez, aquí, y solo con el resultado que el job llega a devolver.
+    """
+
+    def __init__(self, workers=4, timeout_s=120, reintentos=3, backoff_s=1.0, max_guardados=500, almacen=None):
+        self.workers = workers
+        self.almacen = almacen
+        self.timeout_s = timeout_s
+        self.reintentos = reintentos
+        self.backoff_s = backoff_s
+        self.max_guardados = max_guardados
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='job')
+        # Los intentos corren aparte para poder abandonarlos al vencer el timeout
+        self._intentos = ThreadPoolExecutor(workers * 2, thread_name_prefix='job-intento')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._eventos = {}
+        self._metricas = {"enviados": 0, "completados": 0, "fallidos": 0, "expirados": 0, "reintentos": 0,
+                          "espera_total_s": 0.0, "ejecucion_total_s": 0.0}
+
+    def enviar(self, tipo, fn, respaldo=None, al_completar=None):
+        """
+        `respaldo()` (opcional) se usa como resultado si el job falla o expira tras los reintentos;
+        `al_completar(resultado)` (opcional) aplica sus efectos y devuelve el resultado final.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"id": job_id, "tipo": tipo, "estado": "en_cola", "intentos": 0, "creado": time.time(),
+                                  "iniciado": None, "terminado": None, "resultado": None, "error": None, "respaldo": False}
+            self._eventos[job_id] = threading.Event()
+            self._metricas["enviados"] += 1
+            self._reciclar()
+        self._compartir(job_id)
+        self._pool.submit(self._ejecutar, job_id, fn, respaldo, al_completar)
+        return job_id
+
+    def estado(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job: return dict(job)
+        # Job de otro worker (o ya reciclado aquí)
+        return self.almacen.cargar(job_id) if self.almacen else None
+
+    def esperar(self, job_id, timeout=None):
+        evento = self._eventos.get(job_id)
+        if evento is not None: evento.wait(timeout)
+        return self.estado(job_id)
+
+    def _actualizar(self, job_id, **campos):
+        with self._lock: self._jobs[job_id].update(campos)
+        self._compartir(job_id)
+
+    def _compartir(self, job_id):
+        if self.almacen is None: return
+        with self._lock: job = dict(self._jobs[job_id])
+        self.almacen.guardar(job)
+
+    def _ejecutar(self, job_id, fn, respaldo=None, al_completar=None):
+        inicio = time.time()
+        self._actualizar(job_id, estado="ejecutando", iniciado=inicio)
+        limite = time.monotonic() + self.timeout_s
+        estado, resultado, error = "fallido", None, None
+        for intento in range(1, self.reintentos + 2):
+            self._actualizar(job_id, intentos=intento)
+            restante = limite - time.monotonic()
+            try:
+                resultado = self._intentos.submit(fn).result(timeout=max(restante, 0))
+                estado, error = "completado", None
+                break
+            except FuturesTimeout:
+                estado, error = "expirado", f"Tiempo límite de {self.timeout_s}s excedido"
+                break
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                espera = self.backoff_s * (2 ** (intento - 1)) * (1 + random.random() * 0.25)
+                if not es_transitorio(e) or intento > self.reintentos or time.monotonic() + espera >= limite:
+                    if not es_transitorio(e): logging.exception(f"Job {job_id} falló")
+                    break
+                with self._lock: self._metricas["reintentos"] += 1
+                time.sleep(espera)
+
+        uso_respaldo = False
+        if estado != "completado" and respaldo is not None:
+            try:
+                resultado, uso_respaldo = respaldo(), True
+            except Exception:
+                logging.exception(f"Respaldo del job {job_id} falló")
+        if al_completar is not None and (estado == "completado" or uso_respaldo):
+            # En este hilo y tras result(): un intento abandonado por timeout nunca llega aquí
+            try:
+                resultado = al_completar(resultado)
+            except Exception as e:
+                logging.exception(f"No se pudo guardar el resultado del job {job_id}")
+                estado, resultado, error, uso_respaldo = "fallido", None, str(e) or type(e).__name__, False
+        fin = time.time()
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(estado=estado, resultado=resultado, error=error, terminado=fin, respaldo=uso_respaldo)
+            self._metricas[{"completado": "completados", "fallido": "fallidos", "expirado": "expirados"}[estado]] += 1
+            self._metricas["espera_total_s"] += inicio - job["creado"]
+            self._metricas["ejecucion_total_s"] += fin - inicio
+            evento = self._eventos.pop(job_id)
+        self._compartir(job_id)
+        evento.set()
+
+    def _reciclar(self):
+        """Descarta los jobs terminados más antiguos por encima de max_guardados."""
+        exceso = len(self._jobs) - self.max_guardados
+        for job_id in [j for j, job in self._jobs.items() if job["terminado"] is not None][:max(exceso, 0)]:
+            del self._jobs[job_id]
+
+    def metricas(self):
+        with self._lock:
+            m = dict(self._metricas)
+            terminados = m["completados"] + m["fallidos"] + m["expirados"]
+            estados = [job["estado"] for job in self._jobs.values()]
+        return {
+            "workers": self.workers, "en_cola": estados.count("en_cola"), "ejecutando": estados.count("ejecutando"),
+            "enviados": m["enviados"], "completados": m["completados"], "fallidos": m["fallidos"],
+            "expirados": m["expirados"], "reintentos": m["reintentos"],
+            "espera_media_s": round(m["espera_total_s"] / terminados, 3) if terminados else 0.0,
+            "ejecucion_media_s": round(m["ejecucion_total_s"] / terminados, 3) if terminados else 0.0
+        }
+
+
+cola_trabajos = ColaTrabajos(
+    workers=int(os.getenv('JOBS_WORKERS', 4)),
+    timeout_s=float(os.getenv('JOBS_TIMEOUT_S', 120)),
+    reintentos=int(os.getenv('JOBS_REINTENTOS', 3)),
+    # JOBS_COMPARTIDOS=1 (lo activa gunicorn.conf.py): estado de los jobs visible desde todos los workers
+    almacen=AlmacenJobs(ruta_datos('jobs', 'JOBS_DIR')) if os.getenv('JOBS_COMPARTIDOS', '0') == '1' else None
+)
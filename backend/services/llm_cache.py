@@ -0,0 +1,132 @@
+# llm_cache.py - Caché de respuestas de Gemini con TTL/LRU y deduplicación en vuelo
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from backend.utils.file_lock import escribir_atomico
+
+
+def normalizar_prompt(texto):
+    return re.sub(r'\s+', ' ', texto or '').strip()
+
+
+class _Vuelo:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.error = None
+
+
+class CacheRespuestas:
+    """
+    Caché direccionada por contenido: la clave es un sha256 del prompt normalizado,
+    la instrucción de sistema, las herramientas y el modo. Expulsa por LRU y TTL, y
+    opcionalmente persiste en un JSON. Las peticiones idénticas concurrentes
+    comparten una única llamada en vuelo (single-flight).
+    """
+
+    def __init__(self, max_entradas=256, ttl_s=6 * 3600, ruta_disco=None):
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self.ruta_disco = ruta_disco
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave -> (expira_epoch, valor)
+        self._en_vuelo = {}
+        self.hits = 0
+        self.misses = 0
+        self.compartidas = 0
+        self.expulsiones = 0
+        self.expiraciones = 0
+        self._cargar_disco()
+
+    @staticmethod
+    def clave(**partes):
+        datos = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+    def obtener_o_calcular(self, clave, calcular, cachear=None):
+        """
+        Devuelve la respuesta cacheada o ejecuta `calcular()`. Las excepciones no se
+        cachean, ni los valores para los que `cachear(valor)` devuelva False.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if entrada[0] > time.time():
+                    self._entradas.move_to_end(clave)
+                    self.hits += 1
+                    return copy.deepcopy(entrada[1])
+                del self._entradas[clave]
+                self.expiraciones += 1
+            vuelo = self._en_vuelo.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_vuelo[clave] = _Vuelo()
+                self.misses += 1
+            else:
+                self.compartidas += 1
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None: raise vuelo.error
+            return copy.deepcopy(vuelo.valor)
+
+        try:
+            vuelo.valor = calcular()
+        except Exception as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+                if vuelo.error is None and (cachear is None or cachear(vuelo.valor)):
+                    self._guardar(clave, vuelo.valor)
+            vuelo.evento.set()
+        return copy.deepcopy(vuelo.valor)
+
+    def _guardar(self, clave, valor):
+        self._entradas[clave] = (time.time() + self.ttl_s, copy.deepcopy(valor))
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.expulsiones += 1
+        self._persistir()
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._persistir()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._entradas), "hits": self.hits, "misses": self.misses,
+                "compartidas_en_vuelo": self.compartidas, "expulsiones": self.expulsiones,
+                "expiraciones": self.expiraciones, "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+    # --- PERSISTENCIA OPCIONAL ---
+    def _persistir(self):
+        if not self.ruta_disco: return
+        try:
+            escribir_atomico(self.ruta_disco, json.dumps([[k, exp, v] for k, (exp, v) in self._entradas.items()], ensure_ascii=False))
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"No se pudo persistir la caché LLM: {e}")
+
+    def _cargar_disco(self):
+        if not self.ruta_disco or not os.path.exists(self.ruta_disco): return
+        try:
+            with open(self.ruta_disco, encoding='utf-8') as f:
+                ahora = time.time()
+                for k, exp, v in json.load(f):
+                    if exp > ahora: self._entradas[k] = (exp, v)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Caché LLM en disco ignorada: {e}")
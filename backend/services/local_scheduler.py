@@ -0,0 +1,184 @@
+# local_scheduler.py - Planificador local (sin LLM) que genera el mismo esquema PlanSemanal
+
+import math
+import os
+import re
+from datetime import datetime, timedelta
+
+from backend.models.ml_model import predict_study_hours_batch
+
+DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+SLOT_MIN = 30
+SLOTS_DIA = 24 * 60 // SLOT_MIN
+DIFICULTADES = {'baja': 1, 'facil': 1, 'fácil': 1, 'media': 2, 'alta': 3, 'dificil': 3, 'difícil': 3}
+HORIZONTE_MAX_DIAS = int(os.getenv('PLAN_HORIZONTE_MAX_DIAS', 180))   # una grilla por día hasta el último examen
+
+
+def a_minutos(hora):
+    """'15:00', '3:00 pm', '08:00 am' -> minutos desde medianoche; None si no se entiende."""
+    m = re.match(r'^\s*(\d{1,2}):(\d{2})\s*([aApP]\.?\s*[mM]\.?)?\s*$', str(hora or ''))
+    if not m: return None
+    h, minutos, sufijo = int(m.group(1)), int(m.group(2)), (m.group(3) or '').lower().replace('.', '').replace(' ', '')
+    if sufijo == 'pm' and h < 12: h += 12
+    if sufijo == 'am' and h == 12: h = 0
+    return h * 60 + minutos
+
+def _minutos_o(hora, defecto):
+    """a_minutos con valor por defecto solo si no se entiende ('00:00' es medianoche, no 'falta')."""
+    minutos = a_minutos(hora)
+    return defecto if minutos is None else minutos
+
+def a_hora(minutos):
+    """Minutos -> 'HH:MM'; el fin del día es '24:00' (no '23:59', que deja fuera el último minuto)."""
+    minutos = min(minutos, 24 * 60)
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+def _mascara(inicio_min, fin_min):
+    """Bits de los slots que cubre [inicio, fin) en un día."""
+    a, b = inicio_min // SLOT_MIN, math.ceil(fin_min / SLOT_MIN)
+    return ((1 << max(b - a, 0)) - 1) << a
+
+def _numero(valor):
+    """float finito de un número o de un texto numérico; None si no lo es (un bool no cuenta)."""
+    if isinstance(valor, bool) or not isinstance(valor, (int, float, str)): return None
+    try: v = float(valor)
+    except ValueError: return None
+    return v if math.isfinite(v) else None
+
+def _dificultad_num(valor):
+    """1-3 a partir de un número o de 'baja'/'media'/'alta' (y sinónimos); sin valor, 2; None si no se entiende."""
+    if valor is None or valor == '': return 2
+    n = _numero(valor)
+    if n is not None: return int(n) if 1 <= n <= 3 else None
+    return DIFICULTADES.get(valor.strip().lower()) if isinstance(valor, str) else None
+
+def _calificacion(valor):
+    return 20.0 if valor is None or valor == '' else _numero(valor)
+
+
+def validar_examenes(examenes, hoy=None):
+    """
+    ValueError si `examenes` no es una lista de {materia, fecha 'YYYY-MM-DD'} con dificultad
+    (1-3 o baja/media/alta) y calificacion_deseada (0-20) válidas, o si algún examen cae a más
+    de HORIZONTE_MAX_DIAS. Los exámenes sin fecha se ignoran al planificar.
+    """
+    if not isinstance(examenes, list): raise ValueError("examenes debe ser una lista")
+    limite = (hoy or datetime.now().date()) + timedelta(days=HORIZONTE_MAX_DIAS)
+    for i, e in enumerate(examenes):
+        if not isinstance(e, dict) or not e.get('materia'): raise ValueError(f"examenes[{i}]: falta materia")
+        if _dificultad_num(e.get('dificultad')) is None:
+            raise ValueError(f"examenes[{i}]: dificultad inválida {e['dificultad']!r} (1-3 o baja/media/alta)")
+        calificacion = _calificacion(e.get('calificacion_deseada'))
+        if calificacion is None or not 0 <= calificacion <= 20:
+            raise ValueError(f"examenes[{i}]: calificacion_deseada inválida {e['calificacion_deseada']!r} (0-20)")
+        if not e.get('fecha'): continue
+        try: fecha = datetime.strptime(str(e['fecha']), '%Y-%m-%d').date()
+        except ValueError: raise ValueError(f"examenes[{i}]: fecha inválida {e['fecha']!r} (se espera YYYY-MM-DD)") from None
+        if fecha > limite: raise ValueError(f"examenes[{i}]: la fecha {e['fecha']} supera el horizonte de {HORIZONTE_MAX_DIAS} días")
+    return examenes
+
+
+class GrillaSemana:
+    """Una máscara de bits por día (slots de 30 min): ocupar y buscar huecos es O(slots)."""
+
+    def __init__(self, fechas):
+        self.ocupado = {f: 0 for f in fechas}
+
+    def ocupar(self, fecha, inicio_min, fin_min):
+        self.ocupado[fecha] |= _mascara(inicio_min, fin_min)
+
+    def buscar_hueco(self, fecha, largo_slots, desde_min, hasta_min):
+        """Primer inicio (en minutos) con `largo_slots` libres dentro de [desde, hasta)."""
+        bloque = (1 << largo_slots) - 1
+        ocupado = self.ocupado[fecha]
+        for s in range(desde_min // SLOT_MIN, hasta_min // SLOT_MIN - largo_slots + 1):
+            if not ocupado & (bloque << s): return s * SLOT_MIN
+        return None
+
+
+def planificar(profile, examenes, hoy=None, dias=7, crisis=False):
+    """
+    Asigna horas de estudio por examen (estimadas con predict_study_hours) en los
+    días previos a cada examen, respetando trabajo, sueño y los bloques ya puestos.
+    Los exámenes se fijan primero y el trabajo ocupa el resto de su franja.
+    Primero el examen más cercano; sesiones de hasta 2h, una por materia y día en
+    cada pasada. Devuelve (planSemanal, sin_asignar).
+    """
+    profile = profile or {}
+    hoy = hoy or datetime.now().date()
+    validar_examenes(examenes, hoy)
+    examenes = sorted([e for e in examenes if e.get('fecha')], key=lambda e: e['fecha'])
+    ultimo = max([datetime.strptime(e['fecha'], '%Y-%m-%d').date() for e in examenes], default=hoy)
+    fechas = [hoy + timedelta(days=i) for i in range(min(max(dias, (ultimo - hoy).days + 1), HORIZONTE_MAX_DIAS + 1))]
+    grilla = GrillaSemana(fechas)
+    plan = []
+
+    def agregar(fecha, inicio, fin, actividad, tipo, prioridad):
+        grilla.ocupar(fecha, inicio, fin)
+        plan.append({"dia": DIAS[fecha.weekday()], "fecha": fecha.isoformat(), "hora_inicio": a_hora(inicio),
+                     "hora_fin": a_hora(fin), "actividad": actividad, "tipo": tipo, "prioridad": prioridad})
+
+    def agregar_en_libre(fecha, inicio, fin, actividad, tipo, prioridad):
+        """Agrega solo los tramos libres de [inicio, fin) (p. ej. trabajo recortado alrededor de un examen)."""
+        tramo = None
+        for s in range(inicio // SLOT_MIN, math.ceil(fin / SLOT_MIN)):
+            libre = not grilla.ocupado[fecha] & (1 << s)
+            if libre and tramo is None: tramo = max(s * SLOT_MIN, inicio)
+            if not libre and tramo is not None:
+                agregar(fecha, tramo, s * SLOT_MIN, actividad, tipo, prioridad); tramo = None
+        if tramo is not None: agregar(fecha, tramo, fin, actividad, tipo, prioridad)
+
+    horas = predict_study_hours_batch([{'Dificultad_Num': _dificultad_num(e.get('dificultad')), 'Calificacion': _calificacion(e.get('calificacion_deseada')),
+                                        'Materia': str(e['materia']).strip().title()} for e in examenes])
+    for e in examenes:
+        f = datetime.strptime(e['fecha'], '%Y-%m-%d').date()
+        inicio = _minutos_o(e.get('hora'), 8 * 60)
+        if f in grilla.ocupado: agregar(f, inicio, inicio + 120, f"Examen: {e['materia']}", "Examen", "Alta")
+
+    estudio_desde = _minutos_o(profile.get('hora_despertar'), 7 * 60)
+    estudio_hasta = _minutos_o(profile.get('hora_dormir'), 23 * 60)
+    if estudio_hasta <= estudio_desde: estudio_hasta = 24 * 60  # dormir a las 00:00 (o pasada la medianoche)
+    trabajo = (a_minutos(profile.get('horario_trabajo_inicio')), a_minutos(profile.get('horario_trabajo_fin')))
+    dias_trabajo = set(profile.get('dias_trabajo') or DIAS[:5])
+    for f in fechas:
+        if profile.get('trabaja') and None not in trabajo and DIAS[f.weekday()] in dias_trabajo:
+            inicio, fin = trabajo
+            if fin <= inicio: fin = 24 * 60
+            agregar_en_libre(f, inicio, fin, "Trabajo", "Trabajo", "Alta")
+
+    tope_dia = (10 if crisis else 6) * 60 // SLOT_MIN
+    sesion_max = 4  # slots de 30 min = 2h
+    estudio = {f: 0 for f in fechas}  # slots de estudio por día (trabajo y exámenes no cuentan para el tope)
+    sin_asignar = []
+    for e, h in zip(examenes, horas):
+        if crisis: h *= 1.5
+        f_examen = datetime.strptime(e['fecha'], '%Y-%m-%d').date()
+        restantes = math.ceil(h * 60 / SLOT_MIN)
+        candidatos = [f for f in fechas if f < f_examen][::-1]  # más cerca del examen primero
+        for _ in range(3):
+            for f in candidatos:
+                if restantes <= 0: break
+                largo = min(sesion_max, restantes, tope_dia - estudio[f])
+                if largo <= 0: continue
+                inicio = grilla.buscar_hueco(f, largo, estudio_desde, estudio_hasta)
+                if inicio is None: continue
+                agregar(f, inicio, inicio + largo * SLOT_MIN, f"Estudio: {e['materia']}", "Crisis" if crisis else "Estudio", "Alta" if (f_examen - f).days <= 2 else "Media")
+                estudio[f] += largo
+                restantes -= largo
+        if restantes > 0: sin_asignar.append({"materia": e['materia'], "fecha": e['fecha'], "horas": restantes * SLOT_MIN / 60})
+
+    if not examenes:
+        for f in fechas:
+            inicio = grilla.buscar_hueco(f, 4, estudio_desde, estudio_hasta)
+            if inicio is not None: agregar(f, inicio, inicio + 120, "Estudio autónomo / repaso", "Estudio", "Media")
+
+    plan.sort(key=lambda i: (i['fecha'], i['hora_inicio']))
+    return plan, sin_asignar
+
+
+def generate_local_schedule(profile, examenes=None, dias=7, crisis=False):
+    """Misma forma de respuesta que call_gemini_generic, generada localmente en milisegundos."""
+    plan, sin_asignar = planificar(profile, examenes or [], dias=dias, crisis=crisis)
+    texto = "Plan generado localmente."
+    if sin_asignar: texto += f" No cupieron {sum(s['horas'] for s in sin_asignar):.1f}h de estudio."
+    return {"role": "assistant", "text": texto, "horario": {"planSemanal": plan, "sin_asignar": sin_asignar}}
@@ -0,0 +1,126 @@
+# plan_validator.py - Validación y reparación de planSemanal generados por el LLM
+
+import bisect
+import os
+from datetime import datetime, timedelta
+
+from backend.services.local_scheduler import DIAS, a_hora, a_minutos
+
+TIPOS_FIJOS = {'Trabajo', 'Examen', 'Sueño'}
+FIN_DIA = 24 * 60
+AUTO_REPARAR = os.getenv('PLAN_AUTO_REPARAR', '1') == '1'
+
+
+class _IndiceDia:
+    """Intervalos ocupados de un día, ordenados por inicio (búsqueda con bisect)."""
+
+    def __init__(self):
+        self.inicios = []
+        self.intervalos = []
+        self.disjuntos = True
+
+    def agregar(self, inicio, fin):
+        if self.choca(inicio, fin): self.disjuntos = False
+        i = bisect.bisect_left(self.inicios, inicio)
+        self.inicios.insert(i, inicio)
+        self.intervalos.insert(i, (inicio, fin))
+
+    def choca(self, inicio, fin):
+        # Solo pueden chocar los que empiezan antes de `fin`; si los intervalos son
+        # disjuntos basta con mirar el inmediatamente anterior.
+        i = bisect.bisect_left(self.inicios, fin)
+        for j in range(i - 1, -1, -1):
+            if self.intervalos[j][1] > inicio: return True
+            if self.disjuntos: return False
+        return False
+
+    def hueco_desde(self, inicio, duracion, limite=FIN_DIA):
+        """Primer inicio >= `inicio` con `duracion` minutos libres antes de `limite`."""
+        candidato = inicio
+        for a, b in self.intervalos:
+            if b <= candidato: continue
+            if a >= candidato + duracion: break
+            candidato = max(candidato, b)
+        return candidato if candidato + duracion <= limite else None
+
+
+def _partir_medianoche(item, inicio, fin):
+    """Bloque que cruza la medianoche -> dos bloques (hasta 24:00 y desde 00:00 del día siguiente)."""
+    primero = dict(item, hora_fin=a_hora(FIN_DIA))
+    if fin <= 0: return [(primero, inicio, FIN_DIA)]   # nunca un segundo tramo vacío
+    siguiente = datetime.strptime(item['fecha'], '%Y-%m-%d').date() + timedelta(days=1)
+    segundo = dict(item, fecha=siguiente.isoformat(), dia=DIAS[siguiente.weekday()], hora_inicio="00:00")
+    return [(primero, inicio, FIN_DIA), (segundo, 0, fin)]
+
+
+def validar_plan(horario, profile=None, reparar=None):
+    """
+    Detecta solapamientos, bloques que cruzan la medianoche y estudio dentro del
+    horario laboral. Con `reparar`, parte los bloques nocturnos y desplaza los
+    bloques movibles al siguiente hueco libre del día; lo que no cabe queda marcado.
+    Usa un índice ordenado de intervalos por día: O(n log n) por plan.
+    Devuelve una copia del horario con `planSemanal` corregido y `conflictos`.
+    """
+    reparar = AUTO_REPARAR if reparar is None else reparar
+    profile = profile or {}
+    stats = {"total": 0, "invalidos": 0, "cruzan_medianoche": 0, "solapamientos": 0,
+             "en_horario_trabajo": 0, "reubicados": 0, "sin_resolver": 0}
+
+    bloques = []
+    for item in horario.get('planSemanal', []) or []:
+        item = dict(item)
+        item.pop('conflicto', None)
+        inicio, fin = a_minutos(item.get('hora_inicio')), a_minutos(item.get('hora_fin'))
+        try: datetime.strptime(item.get('fecha', ''), '%Y-%m-%d')
+        except (TypeError, ValueError): inicio = None
+        if fin == 0 and inicio:   # termina a las 00:00 = fin del día, no cruza la medianoche
+            fin = FIN_DIA
+            item['hora_fin'] = a_hora(FIN_DIA)
+        if inicio is None or fin is None or fin == inicio:  # sin hora o de duración cero
+            stats["invalidos"] += 1
+            bloques.append((dict(item, conflicto="invalido"), None, None))
+        elif fin < inicio:
+            stats["cruzan_medianoche"] += 1
+            if reparar: bloques.extend(_partir_medianoche(item, inicio, fin))
+            else: bloques.append((dict(item, conflicto="cruza_medianoche"), inicio, fin))
+        else:
+            bloques.append((item, inicio, fin))
+    stats["total"] = len(bloques)
+
+    trabajo = (a_minutos(profile.get('horario_trabajo_inicio')), a_minutos(profile.get('horario_trabajo_fin')))
+    dias_trabajo = set(profile.get('dias_trabajo') or DIAS[:5])
+    hay_trabajo = bool(profile.get('trabaja')) and None not in trabajo and trabajo[0] < trabajo[1]
+    # Si el plan ya trae bloques de Trabajo ese día, esos representan la jornada
+    fechas_con_trabajo = {b[0]['fecha'] for b in bloques if b[1] is not None and b[0].get('tipo') == 'Trabajo'}
+
+    def es_dia_laboral(fecha):
+        return hay_trabajo and DIAS[datetime.strptime(fecha, '%Y-%m-%d').weekday()] in dias_trabajo
+
+    indices = {}
+    resultado = [b[0] for b in bloques if b[1] is None]
+    validos = [b for b in bloques if b[1] is not None]
+    # Primero los fijos (trabajo, exámenes, sueño), luego el resto en orden de inicio
+    validos.sort(key=lambda b: (b[0].get('tipo') not in TIPOS_FIJOS, b[0]['fecha'], b[1]))
+    for item, inicio, fin in validos:
+        fecha = item['fecha']
+        indice = indices.get(fecha)
+        if indice is None:
+            indice = indices[fecha] = _IndiceDia()
+            if es_dia_laboral(fecha) and fecha not in fechas_con_trabajo: indice.agregar(*trabajo)
+        if indice.choca(inicio, fin):
+            en_trabajo = item.get('tipo') != 'Trabajo' and es_dia_laboral(fecha) and inicio < trabajo[1] and fin > trabajo[0]
+            stats["en_horario_trabajo" if en_trabajo else "solapamientos"] += 1
+            nuevo = indice.hueco_desde(inicio, fin - inicio) if reparar and item.get('tipo') not in TIPOS_FIJOS else None
+            if nuevo is not None:
+                stats["reubicados"] += 1
+                inicio, fin = nuevo, nuevo + (fin - inicio)
+                item = dict(item, hora_inicio=a_hora(inicio), hora_fin=a_hora(fin))
+            else:
+                stats["sin_resolver"] += 1
+                item = dict(item, conflicto="horario_trabajo" if en_trabajo else "solapamiento")
+        indice.agregar(inicio, fin)
+        resultado.append(item)
+
+    # Por minutos (no por texto: '9:00' < '10:00'); fecha/hora nulas o ilegibles van primero
+    resultado.sort(key=lambda i: (i.get('fecha') or '', -1 if (m := a_minutos(i.get('hora_inicio'))) is None else m))
+    return dict(horario, planSemanal=resultado, conflictos=stats)
@@ -0,0 +1,186 @@
+# project_repository.py - Repositorio en memoria de proyectos/hitos con escritura diferida
+
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from backend.utils.file_lock import bloqueo_archivo, escribir_atomico
+
+
+def nuevo_id():
+    """Conserva el prefijo de fecha (ordenable) y agrega un sufijo aleatorio para no colisionar."""
+    return f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class RepositorioProyectos:
+    """
+    Mapa id -> proyecto en memoria con contadores de hitos completados, de modo que
+    buscar, alternar un hito o borrar un proyecto es O(1). Los cambios se
+    escriben a user_projects.json en segundo plano (write-behind) tras
+    `retardo_escritura` segundos, agrupando ráfagas de actualizaciones.
+    Con varios workers usar retardo_escritura=0: cada cambio recarga, aplica y
+    escribe bajo el lock del archivo, así ningún proceso pisa los cambios de otro.
+    """
+
+    def __init__(self, ruta, retardo_escritura=0.5):
+        self.ruta = ruta
+        self.retardo_escritura = retardo_escritura
+        self.version = 0
+        self._lock = threading.RLock()
+        self._proyectos = None
+        self._completados = {}
+        self._indices_hitos = {}
+        self._firma = None
+        self._sucio = False
+        self._timer = None
+        atexit.register(self.flush)
+
+    # --- CARGA ---
+    def _firma_archivo(self):
+        # El inodo cambia con cada os.replace: distingue escrituras de otro proceso aunque coincidan mtime y tamaño
+        try:
+            st = os.stat(self.ruta)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _asegurar_cargado(self):
+        """Carga perezosa; recarga si el archivo cambió por fuera y no hay cambios pendientes."""
+        firma = self._firma_archivo()
+        if self._proyectos is not None and (self._sucio or firma == self._firma): return
+        proyectos = []
+        if firma is not None:
+            try:
+                with open(self.ruta, encoding='utf-8') as f: proyectos = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"No se pudo leer {self.ruta}: {e}")
+        self._proyectos = OrderedDict()
+        self._completados.clear()
+        self._indices_hitos.clear()
+        for p in proyectos: self._indexar(p)
+        self._firma = firma
+        self.version += 1
+
+    def _indexar(self, p):
+        p.setdefault('hitos', [])
+        for h in p['hitos']:
+            h.setdefault('id', uuid.uuid4().hex[:8])
+            h.setdefault('completado', False)
+        self._proyectos[p['id']] = p
+        self._completados[p['id']] = sum(1 for h in p['hitos'] if h.get('completado'))
+        self._indices_hitos[p['id']] = {h['id']: i for i, h in enumerate(p['hitos'])}
+        self._recalcular_progreso(p['id'])
+
+    def _recalcular_progreso(self, pid):
+        p = self._proyectos[pid]
+        total = len(p['hitos'])
+        p['progreso'] = int((self._completados[pid] / total) * 100) if total > 0 else 0
+
+    # --- CONSULTAS ---
+    def listar(self):
+        with self._lock:
+            self._asegurar_cargado()
+            return list(self._proyectos.values())
+
+    def version_actual(self):
+        """Versión del contenido (cambia con cada modificación o recarga externa)."""
+        with self._lock:
+            self._asegurar_cargado()
+            return self.version
+
+    def obtener(self, pid):
+        with self._lock:
+            self._asegurar_cargado()
+            return self._proyectos.get(pid)
+
+    # --- CAMBIOS ---
+    def agregar(self, proyecto):
+        with self._transaccion():
+            proyecto['id'] = proyecto.get('id') or nuevo_id()
+            while proyecto['id'] in self._proyectos: proyecto['id'] = nuevo_id()
+            self._indexar(proyecto)
+            self._cambio()
+            return proyecto
+
+    def reemplazar_todos(self, proyectos):
+        with self._transaccion():
+            self._proyectos = OrderedDict()
+            self._completados.clear()
+            self._indices_hitos.clear()
+            for p in proyectos:
+                p['id'] = p.get('id') or nuevo_id()
+                self._indexar(p)
+            self._cambio()
+
+    def eliminar(self, pid):
+        with self._transaccion():
+            if self._proyectos.pop(pid, None) is None: return False
+            self._completados.pop(pid, None)
+            self._indices_hitos.pop(pid, None)
+            self._cambio()
+            return True
+
+    def reemplazar_hitos(self, pid, hitos):
+        with self._transaccion():
+            p = self._proyectos.get(pid)
+            if p is None: return None
+            p['hitos'] = hitos
+            self._indexar(p)
+            self._cambio()
+            return p
+
+    def marcar_hito(self, pid, indice=None, hito_id=None, completado=None):
+        """Cambia un solo hito (por índice o id); sin `completado` lo alterna. O(1)."""
+        with self._transaccion():
+            p = self._proyectos.get(pid)
+            if p is None: return None
+            if hito_id is not None: indice = self._indices_hitos[pid].get(hito_id)
+            if indice is None or not (0 <= indice < len(p['hitos'])): return None
+            hito = p['hitos'][indice]
+            nuevo = (not hito.get('completado')) if completado is None else bool(completado)
+            if nuevo != bool(hito.get('completado')):
+                self._completados[pid] += 1 if nuevo else -1
+                hito['completado'] = nuevo
+                self._recalcular_progreso(pid)
+                self._cambio()
+            return p
+
+    def reiniciar(self):
+        """Olvida el estado y las escrituras pendientes (tras borrar el archivo)."""
+        with self._lock:
+            if self._timer: self._timer.cancel()
+            self._timer = None
+            self._sucio = False
+            self._proyectos = None
+            self.version += 1
+
+    # --- PERSISTENCIA DIFERIDA ---
+    @contextmanager
+    def _transaccion(self):
+        """Cambio bajo el lock del archivo; sin write-behind se escribe antes de soltarlo."""
+        with self._lock, bloqueo_archivo(self.ruta):
+            self._asegurar_cargado()
+            yield
+            if self.retardo_escritura <= 0: self.flush()
+
+    def _cambio(self):
+        self.version += 1
+        self._sucio = True
+        if self._timer is None and self.retardo_escritura > 0:
+            self._timer = threading.Timer(self.retardo_escritura, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            if not self._sucio: return
+            escribir_atomico(self.ruta, json.dumps(list(self._proyectos.values()), indent=4))
+            self._firma = self._firma_archivo()
+            self._sucio = False
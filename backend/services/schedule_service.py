@@ -2,55 +2,146 @@ import os
 import json
 import logging
 import locale
+import functools
+import threading
+import time
 from datetime import datetime
-import google.genai as genai
-from google.genai import types
-from backend.models.ml_model import generar_reporte_analitico, DATA_FILE, MODEL_FILE
+from backend.utils.lazy_import import ModuloPerezoso
+from backend.utils import metricas
+from backend.utils.config_utils import ruta_datos
+from backend.utils.file_lock import bloqueo_archivo, escribir_atomico
+from backend.models.ml_model import obtener_reporte_analitico, historial_snapshot, DATA_FILE, MODEL_FILE
+from backend.models.reporte_analitico import responder, texto_reporte
+from backend.services.llm_cache import CacheRespuestas, normalizar_prompt
+from backend.services.gemini_client import get_client, registrar_setup
+from backend.services.chat_context import ResumenRodante, construir_contexto
+from backend.services.project_repository import RepositorioProyectos
+from backend.services.plan_validator import validar_plan
+
+types = ModuloPerezoso('google.genai.types')
 
 try: locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
 except: pass
 
-PROFILE_FILE = 'user_profile.json'
-CHAT_FILE = 'chat_history.json'
-PROJECTS_FILE = 'user_projects.json'
+PROFILE_FILE = ruta_datos('user_profile.json')
+CHAT_FILE = ruta_datos('chat_history.jsonl')
+CHAT_FILE_LEGADO = ruta_datos('chat_history.json')
+CHAT_SUMMARY_FILE = ruta_datos('chat_summary.json')
+PROJECTS_FILE = ruta_datos('user_projects.json')
+MODELO_GEMINI = 'gemini-2.5-flash'
+# ConsultarEstadisticas se responde con plantillas sobre el reporte materializado; '1' = Gemini redacta la respuesta
+ESTADISTICAS_LLM = os.getenv('ESTADISTICAS_LLM', '0') == '1'
+# Resumen rodante del chat redactado por Gemini en segundo plano; '0' = solo el extractivo
+CHAT_RESUMEN_LLM = os.getenv('CHAT_RESUMEN_LLM', '1') == '1'
 
-# --- TOOLS ---
-PLAN_SEMANAL_TOOL = types.FunctionDeclaration(
-    name="PlanSemanal", description="Genera horario semanal.",
-    parameters={"type": "object", "properties": {"planSemanal": {"type": "array", "items": {"type": "object", "properties": {"dia": {"type": "string"}, "fecha": {"type": "string"}, "hora_inicio": {"type": "string"}, "hora_fin": {"type": "string"}, "actividad": {"type": "string"}, "tipo": {"type": "string", "enum": ["Estudio", "Trabajo", "Sueño", "Ocio", "Deporte", "Doméstico", "Examen", "Crisis", "Proyecto"]}, "prioridad": {"type": "string"}}}}}, "required": ["planSemanal"]}
-)
-CONSULTAR_ESTADISTICAS_TOOL = types.FunctionDeclaration(
-    name="ConsultarEstadisticas", description="Consulta estadísticas.",
-    parameters={"type": "object", "properties": {"consulta": {"type": "string"}}, "required": ["consulta"]}
+# Caché de respuestas para los generadores de horarios/hitos (TTL/LRU, opcional en disco)
+respuestas_cache = CacheRespuestas(
+    max_entradas=int(os.getenv('LLM_CACHE_MAX', 256)),
+    ttl_s=float(os.getenv('LLM_CACHE_TTL_S', 6 * 3600)),
+    ruta_disco=ruta_datos('llm_cache.json', 'LLM_CACHE_ARCHIVO') if os.getenv('LLM_CACHE_ARCHIVO') else None
 )
-PLANIFICADOR_PROYECTOS_TOOL = types.FunctionDeclaration(
-    name="PlanificadorProyectos", description="Desglosa proyectos complejos en hitos.",
-    parameters={"type": "object", "properties": {"hitos": {"type": "array", "items": {"type": "object", "properties": {"titulo": {"type": "string"}, "descripcion": {"type": "string"}, "fecha_limite": {"type": "string"}, "peso": {"type": "integer"}}}}}, "required": ["hitos"]}
-)
-GUARDAR_PROYECTO_TOOL = types.FunctionDeclaration(
-    name="GuardarProyecto", description="Guarda proyecto.",
-    parameters={"type": "object", "properties": {"nombre": {"type": "string"}, "descripcion": {"type": "string"}, "fecha_fin": {"type": "string"}, "hitos": {"type": "array", "items": {"type": "object", "properties": {"titulo": {"type": "string"}, "descripcion": {"type": "string"}, "fecha_limite": {"type": "string"}, "peso": {"type": "integer"}}}}}, "required": ["nombre", "fecha_fin", "hitos"]}
-)
-ALL_TOOLS = [PLAN_SEMANAL_TOOL, CONSULTAR_ESTADISTICAS_TOOL, PLANIFICADOR_PROYECTOS_TOOL, GUARDAR_PROYECTO_TOOL]
+
+# --- TOOLS ---
+# Esquemas de las herramientas; los FunctionDeclaration se construyen en el primer uso (google.genai es diferido)
+_ESQUEMAS_TOOLS = {
+    "PlanSemanal": ("Genera horario semanal.", {"type": "object", "properties": {"planSemanal": {"type": "array", "items": {"type": "object", "properties": {"dia": {"type": "string"}, "fecha": {"type": "string"}, "hora_inicio": {"type": "string"}, "hora_fin": {"type": "string"}, "actividad": {"type": "string"}, "tipo": {"type": "string", "enum": ["Estudio", "Trabajo", "Sueño", "Ocio", "Deporte", "Doméstico", "Examen", "Crisis", "Proyecto"]}, "prioridad": {"type": "string"}}}}}, "required": ["planSemanal"]}),
+    "ConsultarEstadisticas": ("Consulta estadísticas.", {"type": "object", "properties": {"consulta": {"type": "string"}}, "required": ["consulta"]}),
+    "PlanificadorProyectos": ("Desglosa proyectos complejos en hitos.", {"type": "object", "properties": {"hitos": {"type": "array", "items": {"type": "object", "properties": {"titulo": {"type": "string"}, "descripcion": {"type": "string"}, "fecha_limite": {"type": "string"}, "peso": {"type": "integer"}}}}}, "required": ["hitos"]}),
+    "GuardarProyecto": ("Guarda proyecto.", {"type": "object", "properties": {"nombre": {"type": "string"}, "descripcion": {"type": "string"}, "fecha_fin": {"type": "string"}, "hitos": {"type": "array", "items": {"type": "object", "properties": {"titulo": {"type": "string"}, "descripcion": {"type": "string"}, "fecha_limite": {"type": "string"}, "peso": {"type": "integer"}}}}}, "required": ["nombre", "fecha_fin", "hitos"]}),
+}
+_NOMBRES_TOOLS = {"PLAN_SEMANAL_TOOL": "PlanSemanal", "CONSULTAR_ESTADISTICAS_TOOL": "ConsultarEstadisticas",
+                  "PLANIFICADOR_PROYECTOS_TOOL": "PlanificadorProyectos", "GUARDAR_PROYECTO_TOOL": "GuardarProyecto"}
+
+@functools.lru_cache(maxsize=None)
+def herramienta(nombre):
+    descripcion, parametros = _ESQUEMAS_TOOLS[nombre]
+    return types.FunctionDeclaration(name=nombre, description=descripcion, parameters=parametros)
+
+def todas_las_herramientas():
+    return [herramienta(n) for n in _ESQUEMAS_TOOLS]
+
+def __getattr__(nombre):
+    # Compatibilidad: PLAN_SEMANAL_TOOL, ..., ALL_TOOLS siguen importables desde el módulo
+    if nombre in _NOMBRES_TOOLS: return herramienta(_NOMBRES_TOOLS[nombre])
+    if nombre == 'ALL_TOOLS': return todas_las_herramientas()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 # --- FILE MANAGERS ---
+def _firma_archivo(ruta):
+    try:
+        st = os.stat(ruta)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
 def save_json(file, data):
-    with open(file, 'w') as f: json.dump(data, f, indent=4)
+    escribir_atomico(file, json.dumps(data, indent=4))
 def load_json(file, default=None):
     return json.load(open(file)) if os.path.exists(file) else default
-def save_user_profile(data): save_json(PROFILE_FILE, data)
+def save_user_profile(data):
+    save_json(PROFILE_FILE, data)
+    invalidar_configs()
 def load_user_profile(): return load_json(PROFILE_FILE)
 def delete_user_profile(): 
-    files = [PROFILE_FILE, CHAT_FILE, PROJECTS_FILE, DATA_FILE, MODEL_FILE]
+    files = [PROFILE_FILE, CHAT_FILE, CHAT_FILE_LEGADO, CHAT_SUMMARY_FILE, PROJECTS_FILE, DATA_FILE, MODEL_FILE]
     for f in files:
         if os.path.exists(f): 
             try: os.remove(f)
             except: pass
+    historial_snapshot.eliminar()
+    proyectos_repo.reiniciar()
+    invalidar_configs()
     return True
-def load_chat_history(): return load_json(CHAT_FILE, [])
-def save_chat_history(h): save_json(CHAT_FILE, h)
-def load_projects(): return load_json(PROJECTS_FILE, [])
-def save_projects(p): save_json(PROJECTS_FILE, p)
+
+# Chat en JSONL append-only: cada turno escribe solo los mensajes nuevos
+_chat_conteo = {"firma": None, "n": 0}
+
+def _migrar_chat_legado():
+    if not os.path.exists(CHAT_FILE) and os.path.exists(CHAT_FILE_LEGADO):
+        with bloqueo_archivo(CHAT_FILE):
+            if os.path.exists(CHAT_FILE) or not os.path.exists(CHAT_FILE_LEGADO): return
+            save_chat_history(load_json(CHAT_FILE_LEGADO, []))
+            os.remove(CHAT_FILE_LEGADO)
+
+def _lineas_json(mensajes):
+    return ''.join(json.dumps(m, ensure_ascii=False) + '\n' for m in mensajes)
+
+def load_chat_history():
+    _migrar_chat_legado()
+    if not os.path.exists(CHAT_FILE): return []
+    with open(CHAT_FILE, encoding='utf-8') as f: return [json.loads(l) for l in f if l.strip()]
+
+def save_chat_history(h):
+    """Reescritura completa; solo para reiniciar la conversación."""
+    with bloqueo_archivo(CHAT_FILE):
+        escribir_atomico(CHAT_FILE, _lineas_json(h))
+        _chat_conteo.update(firma=_firma_archivo(CHAT_FILE), n=len(h))
+
+def append_chat_messages(mensajes):
+    with bloqueo_archivo(CHAT_FILE):
+        n = _mensajes_guardados()
+        with open(CHAT_FILE, 'a', encoding='utf-8') as f: f.write(_lineas_json(mensajes))
+        _chat_conteo.update(firma=_firma_archivo(CHAT_FILE), n=n + len(mensajes))
+
+def _mensajes_guardados():
+    _migrar_chat_legado()
+    firma = _firma_archivo(CHAT_FILE)
+    if firma is None: return 0
+    if _chat_conteo["firma"] != firma:
+        with open(CHAT_FILE, 'rb') as f: n = sum(bloque.count(b'\n') for bloque in iter(lambda: f.read(1 << 16), b''))
+        _chat_conteo.update(firma=firma, n=n)
+    return _chat_conteo["n"]
+
+def _persistir_turno(history, msg):
+    """Agrega la respuesta al historial y escribe solo lo que aún no está en disco."""
+    with bloqueo_archivo(CHAT_FILE):   # otro worker no puede escribir entre el conteo y el append
+        guardados = _mensajes_guardados()
+        history.append(msg)
+        if guardados <= len(history) - 1: append_chat_messages(history[guardados:])
+        else: save_chat_history(history)
+
+proyectos_repo = RepositorioProyectos(PROJECTS_FILE, retardo_escritura=float(os.getenv('PROYECTOS_RETARDO_ESCRITURA_S', 0.5)))
+def load_projects(): return proyectos_repo.listar()
+def save_projects(p): proyectos_repo.reemplazar_todos(p)
 
 # --- AI LOGIC ---
 def build_system_instruction(profile):
@@ -68,85 +159,229 @@ def build_system_instruction(profile):
             "3. Si pide un horario, usa 'PlanSemanal'.\n"
             "4. Sé conciso.")
 
-def generate_project_plan_ai(profile, project_info):
-    client = genai.Client()
+# --- CONFIGS CACHEADAS ---
+# GenerateContentConfig (tools + tool_config + system instruction) por perfil/proyectos/día;
+# se invalidan al guardar el perfil; la versión del repositorio cubre los cambios de proyectos.
+_configs_lock = threading.Lock()
+_configs = {}
+
+def invalidar_configs():
+    with _configs_lock: _configs.clear()
+
+def get_generation_config(profile, tools, mode, con_sistema=True):
+    clave = (
+        tuple(t.name for t in tools), mode, con_sistema, datetime.now().strftime('%Y-%m-%d'),
+        json.dumps(profile, sort_keys=True, default=str) if con_sistema else None,
+        proyectos_repo.version_actual() if con_sistema else None
+    )
+    with _configs_lock:
+        config = _configs.get(clave)
+    if config is None:
+        config = types.GenerateContentConfig(
+            tools=[types.Tool(function_declarations=tools)],
+            tool_config=types.ToolConfig(function_calling_config=types.FunctionCallingConfig(mode=mode)),
+            system_instruction=build_system_instruction(profile) if con_sistema else None
+        )
+        with _configs_lock: _configs[clave] = config
+    return config
+
+def _clave_llm(prompt, system_instruction, tools, mode):
+    return respuestas_cache.clave(
+        modelo=MODELO_GEMINI, prompt=normalizar_prompt(prompt), system=system_instruction,
+        tools=[t.model_dump(exclude_none=True) for t in tools], mode=mode
+    )
+
+# --- LLAMADAS INSTRUMENTADAS ---
+# Latencia por modelo/operación, herramienta elegida y tokens (usage_metadata) de cada llamada a Gemini
+def _registrar_respuesta(operacion, herramienta, uso):
+    metricas.incrementar('gemini_respuestas_total', modelo=MODELO_GEMINI, operacion=operacion, herramienta=herramienta or 'texto')
+    for tipo, campo in (('entrada', 'prompt_token_count'), ('salida', 'candidates_token_count')):
+        n = getattr(uso, campo, None)
+        if n: metricas.incrementar('gemini_tokens_total', n, modelo=MODELO_GEMINI, operacion=operacion, tipo=tipo)
+
+def _generar(client, contents, config, operacion):
+    with metricas.cronometro('gemini_llamada', modelo=MODELO_GEMINI, operacion=operacion):
+        resp = client.models.generate_content(model=MODELO_GEMINI, contents=contents, config=config)
+    _registrar_respuesta(operacion, resp.function_calls[0].name if resp.function_calls else None, getattr(resp, 'usage_metadata', None))
+    return resp
+
+def _generar_stream(client, contents, config, operacion):
+    inicio, herramienta, uso = time.perf_counter(), None, None
+    with metricas.cronometro('gemini_llamada', modelo=MODELO_GEMINI, operacion=operacion):
+        for i, chunk in enumerate(client.models.generate_content_stream(model=MODELO_GEMINI, contents=contents, config=config)):
+            if i == 0: metricas.observar('gemini_primer_fragmento_segundos', time.perf_counter() - inicio, modelo=MODELO_GEMINI, operacion=operacion)
+            if chunk.function_calls and herramienta is None: herramienta = chunk.function_calls[0].name
+            uso = getattr(chunk, 'usage_metadata', None) or uso
+            yield chunk
+    _registrar_respuesta(operacion, herramienta, uso)
+
+def _error_silenciado(origen, error):
+    """Errores que se devuelven como texto al usuario: se registran y cuentan en vez de perderse."""
+    logging.warning(f"{origen}: {type(error).__name__}: {error}")
+    metricas.incrementar('errores_silenciados_total', origen=origen, tipo=type(error).__name__)
+
+def generate_project_plan_ai(profile, project_info, raise_errors=False):
     prompt = f"PROJECT MANAGER: Desglosa '{project_info['nombre']}' (Fin: {project_info['fecha_fin']}) en hitos."
-    try:
-        resp = client.models.generate_content(model='gemini-2.5-flash', contents=[{"role":"user","parts":[{"text":prompt}]}], config=types.GenerateContentConfig(tools=[types.Tool(function_declarations=[PLANIFICADOR_PROYECTOS_TOOL])], tool_config=types.ToolConfig(function_calling_config=types.FunctionCallingConfig(mode='ANY'))))
-        if resp.function_calls: return resp.function_calls[0].args['hitos']
-    except: pass
-    return []
+    def generar():
+        inicio = time.perf_counter()
+        client = get_client()
+        config = get_generation_config(profile, [herramienta('PlanificadorProyectos')], 'ANY', con_sistema=False)
+        registrar_setup(inicio)
+        resp = _generar(client, [{"role":"user","parts":[{"text":prompt}]}], config, 'hitos_proyecto')
+        return list(resp.function_calls[0].args['hitos']) if resp.function_calls else []
+    try: return respuestas_cache.obtener_o_calcular(_clave_llm(prompt, None, [herramienta('PlanificadorProyectos')], 'ANY'), generar, cachear=bool)
+    except Exception as e:
+        if raise_errors: raise
+        _error_silenciado('generate_project_plan_ai', e)
+        return []
 
-def call_gemini_generic(prompt, profile, tools, mode='ANY'):
-    client = genai.Client()
-    try:
-        resp = client.models.generate_content(model='gemini-2.5-flash', contents=[{"role":"user","parts":[{"text":prompt}]}], config=types.GenerateContentConfig(tools=[types.Tool(function_declarations=tools)], tool_config=types.ToolConfig(function_calling_config=types.FunctionCallingConfig(mode=mode)), system_instruction=build_system_instruction(profile)))
+def call_gemini_generic(prompt, profile, tools, mode='ANY', raise_errors=False):
+    """Con raise_errors=True las excepciones se propagan (para reintentos en la cola de trabajos)."""
+    inicio = time.perf_counter()
+    def generar(config):
+        client = get_client()
+        registrar_setup(inicio)
+        resp = _generar(client, [{"role":"user","parts":[{"text":prompt}]}], config, 'horario')
         if resp.function_calls:
             args = resp.function_calls[0].args
             return {"role": "assistant", "text": "Plan generado.", "horario": dict(args)}
         return {"role": "assistant", "text": resp.text}
-    except Exception as e: return {"role": "assistant", "text": str(e)}
+    try:
+        config = get_generation_config(profile, tools, mode)
+        clave = _clave_llm(prompt, config.system_instruction, tools, mode)
+        resp = respuestas_cache.obtener_o_calcular(clave, lambda: generar(config), cachear=lambda r: 'horario' in r)
+        if 'horario' in resp: resp['horario'] = validar_plan(resp['horario'], profile)
+        return resp
+    except Exception as e:
+        if raise_errors: raise
+        _error_silenciado('call_gemini_generic', e)
+        return {"role": "assistant", "text": str(e)}
 
-def generate_initial_schedule(profile):
+def generate_initial_schedule(profile, raise_errors=False):
     today = datetime.now().strftime('%Y-%m-%d')
     prompt = f"Genera horario semanal optimizado. Hoy: {today}. "
     if profile.get('trabaja'): prompt += f"Bloquea TRABAJO de {profile.get('horario_trabajo_inicio')} a {profile.get('horario_trabajo_fin')}. "
-    return call_gemini_generic(prompt, profile, [PLAN_SEMANAL_TOOL])
+    return call_gemini_generic(prompt, profile, [herramienta('PlanSemanal')], raise_errors=raise_errors)
 
-def generate_exam_schedule(profile, exams):
+def generate_exam_schedule(profile, exams, raise_errors=False):
     prompt = "Genera plan de estudio para exámenes:\n" + "\n".join([f"- {e['materia']} ({e['fecha']})" for e in exams])
-    return call_gemini_generic(prompt, profile, [PLAN_SEMANAL_TOOL])
+    return call_gemini_generic(prompt, profile, [herramienta('PlanSemanal')], raise_errors=raise_errors)
+
+def generate_crisis_schedule(profile, exams, raise_errors=False): 
+    return call_gemini_generic("MODO CRISIS. Plan de supervivencia exámenes.", profile, [herramienta('PlanSemanal')], raise_errors=raise_errors)
 
-def generate_crisis_schedule(profile, exams): 
-    return call_gemini_generic("MODO CRISIS. Plan de supervivencia exámenes.", profile, [PLAN_SEMANAL_TOOL])
+def _resumir_chat(previo, transcripcion):
+    prompt = ("Resume en español, en menos de 150 palabras, esta conversación entre un estudiante y su asistente "
+              "de estudio. Conserva los datos concretos: materias, fechas, exámenes, horarios, proyectos y preferencias.\n"
+              + (f"Resumen previo:\n{previo}\n" if previo else "") + f"Mensajes nuevos:\n{transcripcion}")
+    return _generar(get_client(), [{"role":"user","parts":[{"text":prompt}]}], None, 'resumen_chat').text
 
-def process_chat(history):
+def _formatear_historial(history):
+    return construir_contexto(history, ResumenRodante(CHAT_SUMMARY_FILE, resumir=_resumir_chat if CHAT_RESUMEN_LLM else None))
+
+def _consulta_estadisticas(call, history):
+    ultimo = next((m.get('text', '') for m in reversed(history) if m.get('role') == 'user'), '')
+    return f"{(call.args or {}).get('consulta', '')} {ultimo}"
+
+def _prompt_estadisticas(consulta, stats):
+    return [{"role":"user","parts":[{"text":f"Datos:\n{texto_reporte(stats)}\nPregunta: {consulta}\nResponde."}]}]
+
+def _respuesta_estadisticas(call, history, reformular):
+    """(texto por plantilla, prompt para Gemini o None): sin segunda llamada salvo que se pida reformular."""
+    consulta, stats = _consulta_estadisticas(call, history), obtener_reporte_analitico()
+    reformular = ESTADISTICAS_LLM if reformular is None else reformular
+    metricas.incrementar('estadisticas_respuestas_total', modo='llm' if reformular else 'plantilla')
+    return responder(consulta, stats), (_prompt_estadisticas(consulta, stats) if reformular else None)
+
+def _preparar_chat(profile):
+    inicio = time.perf_counter()
+    client = get_client()
+    config = get_generation_config(profile, todas_las_herramientas(), 'AUTO')
+    registrar_setup(inicio)
+    return client, config
+
+def _ejecutar_herramienta(call, profile):
+    """Resuelve PlanSemanal / PlanificadorProyectos / GuardarProyecto; devuelve el mensaje del asistente o None."""
+    if call.name == "PlanSemanal":
+        return {"role":"assistant", "text":"📅 He creado tu horario:", "horario":validar_plan(dict(call.args), profile)}
+    if call.name == "PlanificadorProyectos":
+        # Enviamos 'hitos' como objeto, no solo texto
+        return {
+            "role": "assistant", 
+            "text": "📋 Aquí tienes una propuesta estructurada para tu proyecto. ¿Te gustaría guardarlo?", 
+            "hitos": list(call.args.get('hitos', []))
+        }
+    if call.name == "GuardarProyecto":
+        data = dict(call.args)
+        nuevo = {
+            "nombre": data.get('nombre', 'Proyecto IA'),
+            "descripcion": data.get('descripcion', ''),
+            "fecha_fin": data.get('fecha_fin', ''),
+            "progreso": 0,
+            "hitos": list(data.get('hitos', []))
+        }
+        for h in nuevo['hitos']: h['completado'] = False
+        proyectos_repo.agregar(nuevo)
+        return {"role":"assistant", "text":f"✅ Proyecto **{nuevo['nombre']}** guardado en tu gestor."}
+    return None
+
+def process_chat(history, reformular_estadisticas=None):
     profile = load_user_profile()
-    formatted = [{"role": "model" if m['role']=="assistant" else "user", "parts": [{"text": m['text']}]} for m in history]
-    client = genai.Client()
     try:
-        resp = client.models.generate_content(
-            model='gemini-2.5-flash', contents=formatted, 
-            config=types.GenerateContentConfig(tools=[types.Tool(function_declarations=ALL_TOOLS)], tool_config=types.ToolConfig(function_calling_config=types.FunctionCallingConfig(mode='AUTO')), system_instruction=build_system_instruction(profile))
-        )
-        ai_text = resp.text or "Entendido."
-        
+        client, config = _preparar_chat(profile)
+        resp = _generar(client, _formatear_historial(history), config, 'chat')
+        msg = None
         if resp.function_calls:
             call = resp.function_calls[0]
             if call.name == "ConsultarEstadisticas":
-                rep = generar_reporte_analitico()
-                resp2 = client.models.generate_content(model='gemini-2.5-flash', contents=[{"role":"user","parts":[{"text":f"Datos:\n{rep}\nResponde."}]}])
-                ai_text = resp2.text
-            elif call.name == "PlanSemanal":
-                plan = dict(call.args)
-                msg = {"role":"assistant", "text":"📅 He creado tu horario:", "horario":plan}
-                history.append(msg); save_chat_history(history)
-                return msg
-            elif call.name == "PlanificadorProyectos":
-                hitos = list(call.args.get('hitos', []))
-                # AQUÍ EL CAMBIO: Enviamos 'hitos' como objeto, no solo texto
-                msg = {
-                    "role": "assistant", 
-                    "text": "📋 Aquí tienes una propuesta estructurada para tu proyecto. ¿Te gustaría guardarlo?", 
-                    "hitos": hitos
-                }
-                history.append(msg); save_chat_history(history)
-                return msg
-            elif call.name == "GuardarProyecto":
-                data = dict(call.args)
-                nuevo = {
-                    "id": datetime.now().strftime("%Y%m%d%H%M%S"),
-                    "nombre": data.get('nombre', 'Proyecto IA'),
-                    "descripcion": data.get('descripcion', ''),
-                    "fecha_fin": data.get('fecha_fin', ''),
-                    "progreso": 0,
-                    "hitos": list(data.get('hitos', []))
-                }
-                for h in nuevo['hitos']: h['completado'] = False
-                p = load_projects(); p.append(nuevo); save_projects(p)
-                ai_text = f"✅ Proyecto **{nuevo['nombre']}** guardado en tu gestor."
-
-        history.append({"role":"assistant", "text":ai_text})
-        save_chat_history(history)
-        return {"role":"assistant", "text":ai_text}
-    except Exception as e: return {"role":"assistant", "text":str(e)}
\ No newline at end of file
+                texto, prompt = _respuesta_estadisticas(call, history, reformular_estadisticas)
+                if prompt: texto = _generar(client, prompt, None, 'estadisticas').text or texto
+                msg = {"role":"assistant", "text":texto}
+            else:
+                msg = _ejecutar_herramienta(call, profile)
+        msg = msg or {"role":"assistant", "text":resp.text or "Entendido."}
+        _persistir_turno(history, msg)
+        return msg
+    except Exception as e:
+        _error_silenciado('process_chat', e)
+        return {"role":"assistant", "text":str(e)}
+
+def process_chat_stream(history, reformular_estadisticas=None):
+    """
+    Variante en streaming de process_chat: genera eventos {"evento": ...} a medida que
+    llegan los tokens ('token'), los resultados de herramientas ('horario', 'hitos'),
+    y al final 'fin' con el mensaje completo, que se persiste en el historial.
+    """
+    profile = load_user_profile()
+    try:
+        client, config = _preparar_chat(profile)
+        partes, call = [], None
+        for chunk in _generar_stream(client, _formatear_historial(history), config, 'chat'):
+            if chunk.function_calls:
+                call = call or chunk.function_calls[0]
+            elif chunk.text:
+                partes.append(chunk.text)
+                yield {"evento": "token", "texto": chunk.text}
+
+        msg = None
+        if call is not None and call.name == "ConsultarEstadisticas":
+            texto, prompt = _respuesta_estadisticas(call, history, reformular_estadisticas)
+            partes = []
+            if prompt:
+                for chunk in _generar_stream(client, prompt, None, 'estadisticas'):
+                    if chunk.text:
+                        partes.append(chunk.text)
+                        yield {"evento": "token", "texto": chunk.text}
+            else:
+                yield {"evento": "token", "texto": texto}
+            msg = {"role":"assistant", "text":"".join(partes) or texto}
+        elif call is not None:
+            msg = _ejecutar_herramienta(call, profile)
+        msg = msg or {"role":"assistant", "text":"".join(partes) or "Entendido."}
+        if 'horario' in msg: yield {"evento": "horario", "horario": msg['horario']}
+        if 'hitos' in msg: yield {"evento": "hitos", "hitos": msg['hitos']}
+        _persistir_turno(history, msg)
+        yield {"evento": "fin", "mensaje": msg}
+    except Exception as e:
+        _error_silenciado('process_chat_stream', e)
+        yield {"evento": "error", "texto": str(e)}
@@ -6,6 +6,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Directorio de datos (perfil, chat, proyectos, historial, modelo, token de Google, jobs). Las rutas
+# son absolutas para que no dependan del directorio de trabajo de cada worker del servidor.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATOS_DIR = os.path.abspath(os.getenv('DATOS_DIR') or BASE_DIR)
+
+def ruta_datos(nombre, variable=None):
+    """Ruta absoluta de un archivo de datos: la variable de entorno `variable` si está definida (relativa a DATOS_DIR), si no DATOS_DIR/nombre."""
+    return os.path.abspath(os.path.join(DATOS_DIR, (variable and os.getenv(variable)) or nombre))
+
 def cargar_api_key():
     """
     Carga la clave de la API de Gemini desde el archivo .env.
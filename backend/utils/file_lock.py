@@ -0,0 +1,62 @@
+# file_lock.py - Lock exclusivo entre hilos y procesos para archivos de datos
+
+import os
+import threading
+from contextlib import contextmanager
+
+_tomados = threading.local()
+
+
+@contextmanager
+def bloqueo_archivo(ruta):
+    """
+    Bloqueo exclusivo sobre '<ruta>.lock'. Sirve tanto entre hilos como entre
+    procesos (varios workers escribiendo el mismo CSV/JSON). Es reentrante dentro
+    del mismo hilo: un flock nuevo sobre otro descriptor se bloquearía a sí mismo.
+    """
+    clave = os.path.abspath(ruta)
+    tomados = _tomados.__dict__.setdefault('rutas', {})
+    if clave in tomados:
+        tomados[clave] += 1
+        try: yield
+        finally: tomados[clave] -= 1
+        return
+    with open(ruta + '.lock', 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                # LK_LOCK reintenta ~10s y luego lanza OSError; seguimos esperando
+                try: msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1); break
+                except OSError: continue
+            tomados[clave] = 1
+            try: yield
+            finally:
+                del tomados[clave]
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            tomados[clave] = 1
+            try: yield
+            finally:
+                del tomados[clave]
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def escribir_atomico(ruta, contenido, encoding='utf-8'):
+    """
+    Reemplaza el archivo completo bajo su lock: escribe un temporal propio del
+    proceso/hilo y lo publica con os.replace (los lectores nunca ven un archivo a medias).
+    `contenido`: str, bytes o una función que recibe el archivo abierto en binario.
+    """
+    tmp = f"{ruta}.tmp{os.getpid()}.{threading.get_ident()}"
+    with bloqueo_archivo(ruta):
+        try:
+            with open(tmp, 'wb') as f:
+                if callable(contenido): contenido(f)
+                else: f.write(contenido.encode(encoding) if isinstance(contenido, str) else contenido)
+            os.replace(tmp, ruta)
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
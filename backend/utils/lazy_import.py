@@ -0,0 +1,58 @@
+# lazy_import.py - Importación diferida de dependencias pesadas (pandas, sklearn, google.*)
+
+import importlib
+import logging
+import sys
+import threading
+import time
+
+_lock = threading.Lock()
+_tiempos_ms = {}
+
+
+def _importar(nombre):
+    modulo = sys.modules.get(nombre)
+    # Un módulo que otro hilo aún está importando ya figura en sys.modules (a medias):
+    # import_module espera a que termine en vez de devolverlo incompleto
+    if modulo is not None and not getattr(getattr(modulo, '__spec__', None), '_initializing', False): return modulo
+    inicio = time.perf_counter()
+    modulo = importlib.import_module(nombre)
+    with _lock: _tiempos_ms.setdefault(nombre, round((time.perf_counter() - inicio) * 1000, 1))
+    return modulo
+
+
+class ModuloPerezoso:
+    """
+    Sustituto de un módulo que lo importa en el primer acceso a un atributo.
+    `pd = ModuloPerezoso('pandas')` se usa igual que `import pandas as pd`.
+    """
+
+    __slots__ = ('_nombre', '_modulo')
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None: self._modulo = _importar(self._nombre)
+        return getattr(self._modulo, atributo)
+
+    def __repr__(self):
+        estado = 'cargado' if self._modulo is not None or self._nombre in sys.modules else 'diferido'
+        return f"<ModuloPerezoso {self._nombre} ({estado})>"
+
+
+def precargar(nombres):
+    """Importa ya los módulos indicados (hook de calentamiento); los que fallen se registran y se omiten."""
+    for nombre in nombres:
+        try: _importar(nombre)
+        except ImportError as e: logging.warning(f"Precarga de {nombre} falló: {e}")
+
+
+def estado(nombres):
+    """Módulos cargados y diferidos de `nombres`, con el tiempo de import de los que se cargaron aquí."""
+    with _lock: tiempos = dict(_tiempos_ms)
+    return {
+        "cargados": {n: tiempos.get(n) for n in nombres if n in sys.modules},
+        "diferidos": [n for n in nombres if n not in sys.modules]
+    }
@@ -0,0 +1,178 @@
+# metricas.py - Contadores, histogramas de latencia y perfilador por muestreo (formato Prometheus)
+
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIJO = 'upn_'
+# Límites (segundos) de los buckets: cubren desde lecturas en memoria hasta llamadas LLM largas
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items() if v is not None))
+
+def _formatear(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares: return ''
+    valores = ','.join('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pares)
+    return '{' + valores + '}'
+
+def _numero(valor):
+    """Valor exacto para el texto de Prometheus (':g' redondea a 6 cifras: 1234567 -> 1.23457e+06)."""
+    return str(valor) if isinstance(valor, int) else repr(float(valor))
+
+
+class Registro:
+    """
+    Registro de métricas en memoria, thread-safe. Series identificadas por (nombre, etiquetas):
+    contadores, histogramas con buckets fijos y colecciones (funciones que devuelven un dict
+    numérico, p.ej. las estadísticas de cachés y colas) que se leen al exportar.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._contadores = collections.defaultdict(float)
+        self._histogramas = {}
+        self._ayuda = {}
+        self._colecciones = {}
+
+    def describir(self, nombre, ayuda):
+        self._ayuda[nombre] = ayuda
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        with self._lock: self._contadores[(nombre, _etiquetas(etiquetas))] += valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = (nombre, _etiquetas(etiquetas))
+        with self._lock:
+            h = self._histogramas.get(clave)
+            if h is None: h = self._histogramas[clave] = {"conteos": [0] * len(self.buckets), "suma": 0.0, "n": 0}
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    h["conteos"][i] += 1
+                    break
+            h["suma"] += valor
+            h["n"] += 1
+
+    @contextmanager
+    def cronometro(self, nombre, **etiquetas):
+        """Observa la duración del bloque en `<nombre>_segundos`; si lanza, cuenta el error y lo propaga."""
+        inicio = time.perf_counter()
+        try:
+            yield etiquetas
+        except Exception as e:
+            self.incrementar('errores_total', operacion=nombre, tipo=type(e).__name__)
+            raise
+        finally:
+            self.observar(f'{nombre}_segundos', time.perf_counter() - inicio, **etiquetas)
+
+    def registrar_coleccion(self, prefijo, fn):
+        self._colecciones[prefijo] = fn
+
+    def contador(self, nombre, **etiquetas):
+        with self._lock: return self._contadores.get((nombre, _etiquetas(etiquetas)), 0)
+
+    def resumen(self, nombre):
+        """{etiquetas: {n, suma, promedio}} de un histograma (para endpoints JSON y benchmarks)."""
+        with self._lock:
+            return {_formatear(et) or '{}': {"n": h["n"], "suma": round(h["suma"], 6), "promedio": round(h["suma"] / h["n"], 6)}
+                    for (n, et), h in self._histogramas.items() if n == nombre and h["n"]}
+
+    def reiniciar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+    def exportar(self):
+        """Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)."""
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((k, dict(h, conteos=list(h["conteos"]))) for k, h in self._histogramas.items())
+        lineas, vistos = [], set()
+        def cabecera(nombre, tipo, base):
+            if nombre in vistos: return
+            vistos.add(nombre)
+            if base in self._ayuda: lineas.append(f"# HELP {nombre} {self._ayuda[base]}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        for (nombre, et), valor in contadores:
+            cabecera(PREFIJO + nombre, 'counter', nombre)
+            lineas.append(f"{PREFIJO}{nombre}{_formatear(et)} {_numero(valor)}")
+        for (nombre, et), h in histogramas:
+            cabecera(PREFIJO + nombre, 'histogram', nombre)
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, h["conteos"]):
+                acumulado += conteo
+                lineas.append(f"{PREFIJO}{nombre}_bucket{_formatear(et, [('le', f'{limite:g}')])} {acumulado}")
+            lineas.append(f"{PREFIJO}{nombre}_bucket{_formatear(et, [('le', '+Inf')])} {h['n']}")
+            lineas.append(f"{PREFIJO}{nombre}_sum{_formatear(et)} {_numero(h['suma'])}")
+            lineas.append(f"{PREFIJO}{nombre}_count{_formatear(et)} {h['n']}")
+        for prefijo, fn in sorted(self._colecciones.items()):
+            try: valores = fn()
+            except Exception: continue
+            for clave, valor in sorted(valores.items()):
+                if isinstance(valor, bool) or not isinstance(valor, (int, float)): continue
+                nombre = f"{PREFIJO}{prefijo}_{clave}"
+                cabecera(nombre, 'gauge', nombre)
+                lineas.append(f"{nombre} {valor:g}")
+        return '\n'.join(lineas) + '\n'
+
+
+# --- PERFILADOR POR MUESTREO ---
+class PerfiladorMuestreo:
+    """
+    Muestrea cada `intervalo_s` la pila de todos los hilos (sys._current_frames) y acumula
+    pilas en formato "folded" (a;b;c N), listo para flamegraph.pl / speedscope.
+    Coste ~proporcional al número de hilos por muestra; pensado para activarlo bajo demanda.
+    """
+
+    def __init__(self, intervalo_s=0.01, profundidad=40):
+        self.intervalo_s = intervalo_s
+        self.profundidad = profundidad
+        self._pilas = collections.Counter()
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.muestras = 0
+
+    def _muestrear(self):
+        propio = threading.get_ident()
+        while not self._detener.wait(self.intervalo_s):
+            for ident, frame in sys._current_frames().items():
+                if ident == propio: continue
+                pila = []
+                while frame is not None and len(pila) < self.profundidad:
+                    codigo = frame.f_code
+                    pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    frame = frame.f_back
+                with self._lock: self._pilas[';'.join(reversed(pila))] += 1
+            self.muestras += 1
+
+    def iniciar(self):
+        if self._hilo is not None: return self
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._muestrear, name='perfilador', daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        if self._hilo is None: return self
+        self._detener.set()
+        self._hilo.join()
+        self._hilo = None
+        return self
+
+    def folded(self, top=None):
+        with self._lock: pilas = self._pilas.most_common(top)
+        return '\n'.join(f"{pila} {n}" for pila, n in pilas) + '\n'
+
+
+registro = Registro()
+cronometro = registro.cronometro
+incrementar = registro.incrementar
+observar = registro.observar
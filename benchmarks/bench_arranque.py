@@ -0,0 +1,82 @@
+# bench_arranque.py - Coste de arranque de la app medido con `python -X importtime`
+#
+# Importa main.py en procesos nuevos, desglosa el tiempo por módulo/paquete y comprueba
+# que las dependencias pesadas (pandas, sklearn, google.*) quedan diferidas.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_arranque [--json resultado.json]
+
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINEA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+PRIMERA_PETICION = """
+import time
+t = time.perf_counter()
+import main
+t_import = time.perf_counter()
+main.app.test_client().get('/api/check_perfil')
+t_peticion = time.perf_counter()
+main.precalentar()
+print(t_import - t, t_peticion - t_import, time.perf_counter() - t_peticion)
+"""
+
+
+def _python(codigo, *opciones):
+    return subprocess.run([sys.executable, *opciones, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+
+
+def medir_imports(repeticiones=3):
+    """Ejecución más rápida de `import main`: lista de (modulo, propio_us, acumulado_us, profundidad)."""
+    mejor = None
+    for _ in range(repeticiones):
+        filas = [(m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2)
+                 for m in map(LINEA.match, _python('import main', '-X', 'importtime').stderr.splitlines()) if m]
+        total = next(acum for mod, _, acum, prof in filas if mod == 'main' and prof == 0)
+        if mejor is None or total < mejor[0]: mejor = (total, filas)
+    return mejor
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    total_us, filas = medir_imports()
+    from main import MODULOS_PESADOS
+
+    print(f"import main: {total_us / 1000:.1f} ms ({len(filas)} módulos)")
+    print("\nMódulos por tiempo acumulado:")
+    for mod, _, acum, _ in sorted(filas, key=lambda f: -f[2])[1:11]:
+        print(f"  {mod:<40} {acum / 1000:8.1f} ms")
+
+    paquetes = defaultdict(int)
+    for mod, propio, _, _ in filas: paquetes[mod.split('.')[0]] += propio
+    print("\nTiempo propio por paquete:")
+    for paquete, us in sorted(paquetes.items(), key=lambda p: -p[1])[:10]:
+        print(f"  {paquete:<40} {us / 1000:8.1f} ms")
+
+    importados = {mod for mod, _, _, _ in filas}
+    pesados = [m for m in MODULOS_PESADOS if m in importados]
+    print(f"\nDependencias pesadas cargadas al importar: {pesados or 'ninguna'}")
+
+    t_import, t_peticion, t_calentar = map(float, _python(PRIMERA_PETICION).stdout.split())
+    print(f"proceso nuevo: import {t_import * 1000:.0f} ms, primera /api/check_perfil {t_peticion * 1000:.0f} ms, "
+          f"precalentar() {t_calentar * 1000:.0f} ms")
+
+    resultado = {
+        "import_main_ms": total_us / 1000,
+        "modulos": {mod: {"propio_ms": propio / 1000, "acumulado_ms": acum / 1000} for mod, propio, acum, _ in filas},
+        "paquetes_ms": {p: us / 1000 for p, us in paquetes.items()},
+        "pesados_importados": pesados,
+        "primera_peticion_ms": t_peticion * 1000,
+        "precalentar_ms": t_calentar * 1000,
+    }
+    if '--json' in argv:
+        with open(argv[argv.index('--json') + 1], 'w') as f: json.dump(resultado, f, indent=2)
+    return resultado
+
+
+if __name__ == '__main__':
+    main()
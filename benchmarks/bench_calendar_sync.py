@@ -0,0 +1,37 @@
+# bench_calendar_sync.py - Sincronización serial vs. motor por lotes con diff
+#
+# Usa un stub local de Calendar con 50 ms por viaje HTTP.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_calendar_sync
+
+import time
+
+from backend.services.calendar_sync import construir_evento, sincronizar_plan
+from benchmarks.calendar_stub import StubCalendar
+
+
+def generar_plan(dias=7, bloques=6):
+    return [{"dia": f"D{d}", "fecha": f"2025-12-{d + 1:02d}", "hora_inicio": f"{8 + 2 * b:02d}:00", "hora_fin": f"{9 + 2 * b:02d}:00",
+             "actividad": f"Bloque {b}", "tipo": "Estudio", "prioridad": "Media"} for d in range(dias) for b in range(bloques)]
+
+
+def main():
+    plan = generar_plan()
+
+    stub = StubCalendar()
+    inicio = time.perf_counter()
+    for item in plan:
+        body = construir_evento(item)
+        body.pop('id')  # comportamiento anterior: un insert por bloque y sin ID estable
+        stub.events().insert(calendarId='primary', body=dict(body, id=str(len(stub.eventos)))).execute()
+    print(f"serial:              {len(plan)} bloques, {stub.viajes_http} viajes HTTP, {time.perf_counter() - inicio:.2f}s")
+
+    stub = StubCalendar()
+    for etiqueta, p in [("lotes (inicial)", plan), ("re-sync idéntico", plan),
+                        ("re-sync con cambios", [dict(i, hora_fin="23:00") if n < 3 else i for n, i in enumerate(plan[:-2])])]:
+        viajes, inicio = stub.viajes_http, time.perf_counter()
+        resumen = sincronizar_plan(stub, p)['resumen']
+        print(f"{etiqueta:<20} {stub.viajes_http - viajes} viajes HTTP, {time.perf_counter() - inicio:.2f}s  {resumen}")
+
+
+if __name__ == '__main__':
+    main()
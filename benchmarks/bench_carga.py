@@ -0,0 +1,177 @@
+# bench_carga.py - Carga concurrente contra gunicorn (wsgi:app) con 1, 2, 4... workers
+#
+# Por cada número de workers arranca gunicorn (gunicorn.conf.py, gthread) sobre un DATOS_DIR temporal
+# con un historial sintético y lanza N procesos cliente durante --segundos con una mezcla de lecturas
+# (/api/predecir_horas, /api/dashboard_stats, /api/estadisticas/reporte) y escrituras
+# (POST /api/registrar_historial). Mide rps y latencias p50/p95 por endpoint y comprueba la
+# integridad de los datos compartidos:
+#   - filas del CSV = filas iniciales + POST respondidos con 200 (ninguna perdida ni duplicada)
+#   - el CSV se parsea entero (ninguna línea intercalada a medias entre workers)
+#   - todos los workers terminan viendo el mismo total en /api/dashboard_stats
+# El escalado depende de los núcleos disponibles: con uno solo, más workers solo reparten la espera.
+# Solo POSIX (gunicorn). Uso (desde la raíz del repo):
+#   python -m benchmarks.bench_carga [--workers 1,2,4] [--clientes 8] [--segundos 10] [--filas 20000] [--json salida.json]
+
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (peso, método, ruta); el cuerpo de los POST se arma en _cuerpo
+MEZCLA = [(40, 'POST', '/api/predecir_horas'), (25, 'GET', '/api/dashboard_stats'),
+          (20, 'GET', '/api/estadisticas/reporte'), (15, 'POST', '/api/registrar_historial')]
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _cuerpo(ruta, rng):
+    from benchmarks.datos_sinteticos import MATERIAS, sesion
+    if ruta == '/api/registrar_historial': return sesion(rng)
+    if ruta == '/api/predecir_horas':
+        return {"pares": [{"dificultad": int(rng.integers(1, 4)), "calificacion": int(rng.integers(10, 21)),
+                           "materia": str(rng.choice(MATERIAS))} for _ in range(5)]}
+    return None
+
+
+def _cliente(args):
+    """Proceso cliente: conexión keep-alive propia, peticiones en bucle hasta `fin` (time.time())."""
+    import numpy as np
+    puerto, fin, semilla = args
+    rng = np.random.default_rng(semilla)
+    pesos = np.array([m[0] for m in MEZCLA], dtype=float)
+    latencias, errores, escrituras_ok = {ruta: [] for _, _, ruta in MEZCLA}, {}, 0
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=60)
+    while time.time() < fin:
+        _, metodo, ruta = MEZCLA[rng.choice(len(MEZCLA), p=pesos / pesos.sum())]
+        cuerpo = _cuerpo(ruta, rng)
+        inicio = time.perf_counter()
+        try:
+            conexion.request(metodo, ruta, body=cuerpo and json.dumps(cuerpo), headers={'Content-Type': 'application/json'})
+            resp = conexion.getresponse()
+            resp.read()
+            estado = resp.status
+        except (OSError, http.client.HTTPException) as e:
+            estado = type(e).__name__
+            conexion.close()
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=60)
+        if estado == 200:
+            latencias[ruta].append(time.perf_counter() - inicio)
+            if ruta == '/api/registrar_historial': escrituras_ok += 1
+        else:
+            errores[f"{ruta} {estado}"] = errores.get(f"{ruta} {estado}", 0) + 1
+    conexion.close()
+    return latencias, errores, escrituras_ok
+
+
+def _pedir(puerto, ruta, timeout=60):
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=timeout)
+    try:
+        conexion.request('GET', ruta)
+        resp = conexion.getresponse()
+        return resp.status, resp.read()
+    finally:
+        conexion.close()
+
+
+def _esperar_servidor(puerto, proc, workers, limite_s=180):
+    """Hasta que 4·workers respuestas seguidas de /api/sistema/arranque no tengan imports diferidos (todos precalentados)."""
+    fin, seguidas = time.time() + limite_s, 0
+    while time.time() < fin and seguidas < 4 * workers:
+        if proc.poll() is not None: raise RuntimeError("gunicorn terminó al arrancar")
+        try:
+            estado, cuerpo = _pedir(puerto, '/api/sistema/arranque', timeout=5)
+            seguidas = seguidas + 1 if estado == 200 and not json.loads(cuerpo)["diferidos"] else 0
+        except OSError:
+            seguidas = 0
+        if seguidas == 0: time.sleep(0.5)
+    if seguidas < 4 * workers: raise RuntimeError("gunicorn no quedó listo a tiempo")
+
+
+def _filas_csv(ruta):
+    import pandas as pd
+    df = pd.read_csv(ruta)
+    return len(df), int(df['Materia'].isna().sum())
+
+
+def _ejecutar(workers, clientes, segundos, filas, calentamiento_s):
+    from benchmarks.datos_sinteticos import escribir_csv
+    tmp = tempfile.mkdtemp()
+    historial = os.path.join(tmp, 'historial.csv')
+    escribir_csv(historial, filas)
+    puerto = _puerto_libre()
+    env = dict(os.environ, DATOS_DIR=tmp, HISTORIAL_ARCHIVO=historial, MODELO_ARCHIVO=os.path.join(tmp, 'modelo_horas.pkl'),
+               GUNICORN_ACCESSLOG='', PRECALENTAR='1', PYTHONPATH=RAIZ)
+    log = open(os.path.join(tmp, 'gunicorn.log'), 'w')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(RAIZ, 'gunicorn.conf.py'),
+                             '--workers', str(workers), '--bind', f'127.0.0.1:{puerto}', 'wsgi:app'],
+                            cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    try:
+        _esperar_servidor(puerto, proc, workers)
+        with multiprocessing.Pool(clientes) as pool:
+            # Calentamiento (imports diferidos, modelo, reporte en cada worker); sus escrituras sí cuentan
+            previos = pool.map(_cliente, [(puerto, time.time() + calentamiento_s, 1000 + i) for i in range(clientes)])
+            inicio = time.time()
+            partes = pool.map(_cliente, [(puerto, inicio + segundos, i) for i in range(clientes)])
+            duracion = time.time() - inicio
+        latencias = {ruta: [x for p in partes for x in p[0][ruta]] for _, _, ruta in MEZCLA}
+        errores = {}
+        for p in partes + previos:
+            for clave, n in p[1].items(): errores[clave] = errores.get(clave, 0) + n
+        escrituras_ok = sum(p[2] for p in partes + previos)
+
+        # Todos los workers deben converger al mismo total (cada petición cae en el worker que la acepte)
+        vistos = {json.loads(_pedir(puerto, '/api/dashboard_stats')[1])["sesiones_totales"] for _ in range(4 * workers)}
+        filas_csv, materias_vacias = _filas_csv(historial)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try: proc.wait(timeout=30)
+        except subprocess.TimeoutExpired: proc.kill()
+        log.close()
+
+    total = sum(len(v) for v in latencias.values())
+    por_ruta = {ruta: {"n": len(v), "p50_ms": round(statistics.median(v) * 1000, 1) if v else None,
+                       "p95_ms": round(statistics.quantiles(v, n=20)[-1] * 1000, 1) if len(v) > 1 else None}
+                for ruta, v in latencias.items()}
+    return {"workers": workers, "log": log.name, "rps": round(total / duracion, 1), "peticiones": total, "errores": errores, "rutas": por_ruta,
+            "integridad": {"filas_esperadas": filas + escrituras_ok, "filas_csv": filas_csv, "materias_vacias": materias_vacias,
+                           "totales_dashboard": sorted(vistos),
+                           "ok": filas_csv == filas + escrituras_ok and not materias_vacias and vistos == {filas_csv}}}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opcion = lambda nombre, defecto=None: argv[argv.index(nombre) + 1] if nombre in argv else defecto
+    lista_workers = [int(w) for w in opcion('--workers', '1,2,4').split(',')]
+    clientes, segundos = int(opcion('--clientes', 8)), float(opcion('--segundos', 10))
+    filas, calentamiento_s = int(float(opcion('--filas', 20_000))), float(opcion('--calentamiento', 3))
+    ruta_json = opcion('--json') and os.path.abspath(opcion('--json'))
+
+    resultados = [_ejecutar(w, clientes, segundos, filas, calentamiento_s) for w in lista_workers]
+    print(f"\n{clientes} clientes, {segundos:.0f} s por configuración, historial inicial {filas:,} filas, {os.cpu_count()} CPU")
+    print(f"  {'workers':>7}{'rps':>9}" + ''.join(f"{r.split('/')[-1][:22]:>24}" for _, _, r in MEZCLA) + f"{'errores':>9}{'integridad':>12}")
+    print(f"  {'':>16}" + ''.join(f"{'p50 / p95 ms':>24}" for _ in MEZCLA))
+    for r in resultados:
+        celdas = ''.join(f"{str(x['p50_ms']) + ' / ' + str(x['p95_ms']):>24}" for x in r["rutas"].values())
+        print(f"  {r['workers']:>7}{r['rps']:>9.1f}{celdas}{sum(r['errores'].values()):>9}{'ok' if r['integridad']['ok'] else 'FALLA':>12}")
+    for r in resultados:
+        if not r["integridad"]["ok"] or r["errores"]: print(f"  workers={r['workers']}: {r['integridad']} {r['errores']} (log: {r['log']})")
+    salida = {"clientes": clientes, "segundos": segundos, "filas_iniciales": filas, "cpus": os.cpu_count(), "resultados": resultados}
+    if ruta_json:
+        with open(ruta_json, 'w') as f: json.dump(salida, f, indent=2)
+    return salida
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# bench_escalado.py - Escalado de las rutas calientes (analítica, ML, almacenamiento) con 10^2-10^6 sesiones
+#
+# Cada tamaño corre en un proceso nuevo con su propio historial sintético (HISTORIAL_ARCHIVO /
+# MODELO_ARCHIVO en un directorio temporal, Gemini falso): mide tiempo (mediana/mínimo) y pico
+# de memoria (tracemalloc) por función y por endpoint del test client de Flask.
+# Uso (desde la raíz del repo):
+#   python -m benchmarks.bench_escalado [--tamanos 100,1000,...] [--json salida.json] [--comparar base.json]
+
+import json
+import os
+import platform
+import subprocess
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TAMANOS = [100, 1000, 10_000, 100_000, 1_000_000]
+ENTRENAR_HASTA = 100_000   # RandomForest sobre 10^6 filas tarda minutos: se omite por defecto
+UMBRAL_REGRESION = 1.25
+
+
+def _medir(fn, presupuesto_s=1.0, max_repeticiones=25):
+    """Una ejecución de calentamiento, luego repite hasta agotar el presupuesto; el pico de memoria se mide aparte."""
+    fn()
+    tiempos, inicio = [], time.perf_counter()
+    while len(tiempos) < max_repeticiones and (not tiempos or time.perf_counter() - inicio < presupuesto_s):
+        t = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t) * 1000)
+    tracemalloc.start()
+    fn()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ms_mediana": round(statistics.median(tiempos), 3), "ms_min": round(min(tiempos), 3),
+            "repeticiones": len(tiempos), "pico_kb": round(pico / 1024, 1)}
+
+
+def _respuesta_estadisticas(contents, config):
+    """Gemini falso: el chat pide ConsultarEstadisticas; la segunda llamada (sin tools) responde texto."""
+    from types import SimpleNamespace
+    if config is None: return SimpleNamespace(text="Resumen.", function_calls=None)
+    return SimpleNamespace(text=None, function_calls=[SimpleNamespace(name="ConsultarEstadisticas", args={"consulta": "resumen"})])
+
+
+def trabajador(n, entrenar):
+    """Se ejecuta en el subproceso: ya tiene HISTORIAL_ARCHIVO/MODELO_ARCHIVO y el cwd apuntando al temporal."""
+    import google.genai as genai
+    import numpy as np
+    from benchmarks.datos_sinteticos import escribir_csv, sesion
+    from benchmarks.fake_gemini import FakeClient, FakeModels
+
+    inicio = time.perf_counter()
+    escribir_csv(os.environ['HISTORIAL_ARCHIVO'], n)
+    generacion_s = time.perf_counter() - inicio
+    genai.Client = FakeClient
+    FakeClient.models = FakeModels(0.0, _respuesta_estadisticas)
+
+    import main
+    from backend.models import ml_model as m
+    from backend.services.schedule_service import save_user_profile
+
+    save_user_profile({"nombre": "Ana", "carrera": "Sistemas", "trabaja": False})
+
+    df = m.inicializar_o_cargar_datos()
+    firma = m.historial_store.firma()
+    pares = [(d, c) for d in (1, 2, 3) for c in range(8, 21)]
+    casos = {
+        "cargar_historial_frio": lambda: (m.historial_cache.invalidar(), m.inicializar_o_cargar_datos()),
+        "cargar_historial_cache": m.inicializar_o_cargar_datos,
+        "obtener_materias_unicas": m.obtener_materias_unicas,
+        "dashboard_reconstruir": lambda: m.dashboard_agregados.reconstruir(df, firma),
+        "obtener_datos_dashboard": m.obtener_datos_dashboard,
+        "calcular_dashboard_pandas": lambda: m.calcular_dashboard_pandas(df.copy()),
+        "calcular_racha": lambda: m.calcular_racha(df),
+        "calcular_logros": lambda: m.calcular_logros(df),
+        "generar_reporte_analitico": m.generar_reporte_analitico,
+    }
+    if entrenar: casos["entrenar_modelo"] = m.entrenar_modelo
+    casos["predict_study_hours_batch"] = lambda: m.predict_study_hours_batch(pares)
+
+    cliente, rng = main.app.test_client(), np.random.default_rng(1)
+    historia = [{"role": "user", "text": "¿Cómo voy con mis estudios?"}]
+    casos.update({
+        "GET /api/dashboard_stats": lambda: cliente.get('/api/dashboard_stats'),
+        "GET /api/materias": lambda: cliente.get('/api/materias'),
+        "POST /api/registrar_historial": lambda: cliente.post('/api/registrar_historial', json=sesion(rng)),
+        "POST /api/conversar (estadísticas)": lambda: cliente.post('/api/conversar', json={"history": historia}),
+    })
+
+    resultados = {}
+    for nombre, fn in casos.items():
+        presupuesto = 0.2 if nombre == "entrenar_modelo" else 1.0
+        resultados[nombre] = _medir(fn, presupuesto_s=presupuesto, max_repeticiones=3 if nombre == "entrenar_modelo" else 25)
+    try:
+        import resource
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != 'darwin' else 1024 ** 2)
+    except ImportError:
+        rss_mb = None
+    return {"filas": n, "generacion_s": round(generacion_s, 3), "csv_mb": round(os.path.getsize(os.environ['HISTORIAL_ARCHIVO']) / 2 ** 20, 2),
+            "rss_pico_mb": rss_mb and round(rss_mb, 1), "casos": resultados}
+
+
+def _ejecutar_tamano(n, entrenar):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATOS_DIR=tmp, HISTORIAL_ARCHIVO=os.path.join(tmp, 'historial.csv'), MODELO_ARCHIVO=os.path.join(tmp, 'modelo_horas.pkl'),
+                   REENTRENO_DEBOUNCE_S='1e9', REENTRENO_UMBRAL_FILAS=str(10 ** 9), PYTHONPATH=RAIZ)
+        codigo = f"import json, benchmarks.bench_escalado as b; print(json.dumps(b.trabajador({n}, {entrenar})))"
+        proc = subprocess.run([sys.executable, '-c', codigo], cwd=tmp, env=env, capture_output=True, text=True)
+        if proc.returncode != 0: raise RuntimeError(f"Falló el tamaño {n}:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _meta():
+    try: commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True).stdout.strip() or None
+    except OSError: commit = None
+    return {"commit": commit, "fecha": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(), "plataforma": platform.platform()}
+
+
+def comparar(base, actual, umbral=UMBRAL_REGRESION):
+    """[(filas, caso, ms_base, ms_actual, ratio)] de los casos que empeoraron más de `umbral` veces."""
+    regresiones = []
+    for n, res in actual["resultados"].items():
+        previos = base.get("resultados", {}).get(n, {}).get("casos", {})
+        for caso, r in res["casos"].items():
+            if caso not in previos: continue
+            ratio = r["ms_mediana"] / max(previos[caso]["ms_mediana"], 1e-6)
+            if ratio > umbral: regresiones.append((int(n), caso, previos[caso]["ms_mediana"], r["ms_mediana"], round(ratio, 2)))
+    return regresiones
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opcion = lambda nombre, defecto=None: argv[argv.index(nombre) + 1] if nombre in argv else defecto
+    tamanos = [int(float(t)) for t in opcion('--tamanos', ','.join(map(str, TAMANOS))).split(',')]
+    entrenar_hasta = int(float(opcion('--entrenar-hasta', ENTRENAR_HASTA)))
+
+    salida = {"meta": _meta(), "resultados": {}}
+    for n in tamanos:
+        inicio = time.perf_counter()
+        salida["resultados"][str(n)] = _ejecutar_tamano(n, n <= entrenar_hasta)
+        print(f"{n:>9,} filas listo en {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+    casos = list(dict.fromkeys(c for r in salida["resultados"].values() for c in r["casos"]))
+    print(f"{'ms (mediana)':<36}" + "".join(f"{n:>12,}" for n in tamanos))
+    for caso in casos:
+        fila = [salida["resultados"][str(n)]["casos"].get(caso) for n in tamanos]
+        print(f"{caso:<36}" + "".join(f"{r['ms_mediana']:>12.2f}" if r else f"{'-':>12}" for r in fila))
+    print(f"{'pico tracemalloc (MB), máx.':<36}" + "".join(
+        f"{max(r['pico_kb'] for r in salida['resultados'][str(n)]['casos'].values()) / 1024:>12.1f}" for n in tamanos))
+    print(f"{'RSS pico del proceso (MB)':<36}" + "".join(f"{salida['resultados'][str(n)]['rss_pico_mb'] or 0:>12.0f}" for n in tamanos))
+
+    if opcion('--json'):
+        with open(opcion('--json'), 'w') as f: json.dump(salida, f, indent=2, ensure_ascii=False)
+    if opcion('--comparar'):
+        with open(opcion('--comparar')) as f: regresiones = comparar(json.load(f), salida)
+        for n, caso, antes, ahora, ratio in regresiones:
+            print(f"REGRESIÓN {caso} @ {n:,}: {antes:.2f} -> {ahora:.2f} ms (x{ratio})")
+        if regresiones: sys.exit(1)
+    return salida
+
+
+if __name__ == '__main__':
+    main()
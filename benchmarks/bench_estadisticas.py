@@ -0,0 +1,101 @@
+# bench_estadisticas.py - Latencia de /api/conversar para preguntas de estadísticas
+#
+# Con el cliente falso (latencia fija por llamada a Gemini) y un historial sintético compara:
+#   antes:                 reporte recalculado con pandas en cada pregunta + segunda llamada para redactarlo
+#   reporte + LLM:         reporte materializado, redacción con Gemini (ESTADISTICAS_LLM=1 / reformular_estadisticas)
+#   plantilla:             reporte materializado + respuesta por plantilla (por defecto, una sola llamada)
+#   plantilla tras escritura: primera pregunta después de registrar una sesión (paga el recálculo)
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_estadisticas [--filas 100000] [--latencia 0.4] [--json salida.json]
+
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+PREGUNTAS = [("¿Cuántas horas llevo de Calculo?", "horas por materia"), ("¿Qué día tengo más energía?", "energia"),
+             ("¿Cómo voy con mis estudios?", "resumen"), ("¿Qué es lo que más me distrae?", "bloqueos")]
+
+
+def _respuesta(contents, config):
+    """1ª llamada (con tools): Gemini elige ConsultarEstadisticas; 2ª (sin tools): texto redactado."""
+    if config is None: return SimpleNamespace(text="Según tus datos, vas muy bien.", function_calls=None)
+    pregunta = contents[-1]["parts"][0]["text"]
+    consulta = next((c for p, c in PREGUNTAS if p in pregunta), "resumen")
+    return SimpleNamespace(text=None, function_calls=[SimpleNamespace(name="ConsultarEstadisticas", args={"consulta": consulta})])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opcion = lambda nombre, defecto=None: argv[argv.index(nombre) + 1] if nombre in argv else defecto
+    filas, latencia = int(float(opcion('--filas', 100_000))), float(opcion('--latencia', 0.4))
+    repeticiones = int(opcion('--repeticiones', 12))
+    ruta_json = opcion('--json') and os.path.abspath(opcion('--json'))
+
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    os.environ.update(DATOS_DIR=tmp, HISTORIAL_ARCHIVO=os.path.join(tmp, 'historial.csv'), MODELO_ARCHIVO=os.path.join(tmp, 'modelo_horas.pkl'),
+                      REENTRENO_DEBOUNCE_S='1e9', REENTRENO_UMBRAL_FILAS=str(10 ** 9))
+    import google.genai as genai
+    import numpy as np
+    from benchmarks.datos_sinteticos import escribir_csv, sesion
+    from benchmarks.fake_gemini import FakeClient, FakeModels
+    escribir_csv(os.environ['HISTORIAL_ARCHIVO'], filas)
+    genai.Client = FakeClient
+    FakeClient.models = FakeModels(latencia, _respuesta)
+
+    import main as app_main
+    from backend.models import ml_model as m
+    from backend.services import gemini_client
+    gemini_client.reset_client()
+    cliente, rng = app_main.app.test_client(), np.random.default_rng(1)
+    m.inicializar_o_cargar_datos()
+
+    def preguntar(i, reformular, recalcular=False, escribir=False):
+        if recalcular: m.reporte_analitico.invalidar()
+        if escribir:
+            cliente.post('/api/registrar_historial', json=sesion(rng))
+            m.historial_cache.obtener()   # la recarga del DataFrame no es parte de lo medido
+        pregunta = PREGUNTAS[i % len(PREGUNTAS)][0]
+        inicio = time.perf_counter()
+        resp = cliente.post('/api/conversar', json={"history": [{"role": "user", "text": pregunta}], "reformular_estadisticas": reformular})
+        preguntar.ms = (time.perf_counter() - inicio) * 1000
+        preguntar.texto = resp.json["text"]
+
+    def medir(**kw):
+        FakeClient.models.llamadas = 0
+        tiempos = []
+        for i in range(repeticiones):
+            preguntar(i, **kw)
+            tiempos.append(preguntar.ms)
+        return {"ms_mediana": round(statistics.median(tiempos), 1), "ms_max": round(max(tiempos), 1),
+                "llamadas_llm_por_pregunta": round(FakeClient.models.llamadas / repeticiones, 2)}
+
+    casos = {
+        "antes (recalculo + 2 llamadas)": medir(reformular=True, recalcular=True),
+        "reporte materializado + LLM": medir(reformular=True),
+        "plantilla (defecto)": medir(reformular=False),
+        "plantilla tras escritura": medir(reformular=False, escribir=True),
+    }
+    inicio = time.perf_counter()
+    m.reporte_analitico.invalidar()
+    m.obtener_reporte_analitico()
+    recalculo_ms = (time.perf_counter() - inicio) * 1000
+
+    print(f"\n{filas:,} sesiones, latencia simulada de Gemini {latencia * 1000:.0f} ms por llamada; recálculo del reporte {recalculo_ms:.1f} ms")
+    print(f"  {'caso':<34}{'mediana ms':>12}{'máx ms':>10}{'llamadas LLM':>14}")
+    for nombre, r in casos.items():
+        print(f"  {nombre:<34}{r['ms_mediana']:>12.1f}{r['ms_max']:>10.1f}{r['llamadas_llm_por_pregunta']:>14.2f}")
+    for i, (pregunta, _) in enumerate(PREGUNTAS):
+        preguntar(i, False)
+        print(f"\n> {pregunta}\n{preguntar.texto}")
+    salida = {"filas": filas, "latencia_llm_s": latencia, "recalculo_reporte_ms": round(recalculo_ms, 2), "casos": casos}
+    if ruta_json:
+        with open(ruta_json, 'w') as f: json.dump(salida, f, indent=2)
+    return salida
+
+
+if __name__ == '__main__':
+    main()
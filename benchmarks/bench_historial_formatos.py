@@ -0,0 +1,95 @@
+# bench_historial_formatos.py - Memoria y tiempo de carga del historial: CSV inferido vs tipado vs snapshot binario
+#
+# Compara la lectura anterior (pd.read_csv + to_numeric, columnas object y Fecha en texto) con
+# el esquema tipado, el snapshot de columnas .npy (mmap), el snapshot + cola nueva del CSV y,
+# si pyarrow está instalado, Parquet.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_historial_formatos [--tamanos 10000,100000] [--json salida.json]
+
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from backend.models.historial_columnar import SnapshotHistorial, _hay_pyarrow, leer_csv
+from backend.models.ml_model import COLUMNAS, VALORES_DEFECTO
+from benchmarks.datos_sinteticos import generar_historial
+
+TAMANOS = [10_000, 100_000, 1_000_000]
+NUMERICAS = ['Horas_Estudio_Real', 'Dificultad_Num', 'Nivel_Energia', 'Calificacion', 'Horas_Sueno']
+
+
+def csv_inferido(ruta):
+    """Lectura previa al esquema: inferencia por defecto de pandas + coerción numérica."""
+    df = pd.read_csv(ruta)
+    for col in NUMERICAS: df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def _tamano_disco(ruta):
+    if os.path.isdir(ruta): return sum(os.path.getsize(os.path.join(d, f)) for d, _, archivos in os.walk(ruta) for f in archivos)
+    return os.path.getsize(ruta)
+
+
+def _medir(cargar, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = cargar()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tracemalloc.start()
+    cargar()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ms": round(statistics.median(tiempos), 1), "memoria_df_mb": round(df.memory_usage(deep=True).sum() / 2 ** 20, 2),
+            "pico_carga_mb": round(pico / 2 ** 20, 2), "filas": len(df)}
+
+
+def medir_tamano(n, tmp):
+    ruta = os.path.join(tmp, f'historial_{n}.csv')
+    generar_historial(n).to_csv(ruta, index=False)
+    resultados = {"csv_inferido": dict(_medir(lambda: csv_inferido(ruta)), disco_mb=round(_tamano_disco(ruta) / 2 ** 20, 2)),
+                  "csv_tipado": dict(_medir(lambda: leer_csv(ruta, COLUMNAS, VALORES_DEFECTO)[0]), disco_mb=round(_tamano_disco(ruta) / 2 ** 20, 2))}
+
+    formatos = ['npy'] + (['parquet'] if _hay_pyarrow() else [])
+    for formato in formatos:
+        snapshot = SnapshotHistorial(ruta, formato)
+        snapshot.eliminar()
+        snapshot.cargar(COLUMNAS, VALORES_DEFECTO)   # escribe el snapshot completo
+        r = _medir(lambda: snapshot.cargar(COLUMNAS, VALORES_DEFECTO))
+        r["disco_mb"] = round(_tamano_disco(snapshot.ruta) / 2 ** 20, 2)
+        resultados[f"snapshot_{formato}"] = r
+
+    # Snapshot + cola: 1% de filas nuevas añadidas al CSV después del snapshot (sin reescribirlo)
+    copia = ruta.replace('.csv', '_cola.csv')
+    shutil.copy(ruta, copia)
+    snapshot = SnapshotHistorial(copia, 'npy', min_filas_reescritura=10 ** 9)
+    snapshot.cargar(COLUMNAS, VALORES_DEFECTO)
+    generar_historial(max(1, n // 100), semilla=1).to_csv(copia, mode='a', header=False, index=False)
+    resultados["snapshot_npy_mas_cola_1pct"] = _medir(lambda: snapshot.cargar(COLUMNAS, VALORES_DEFECTO))
+    return resultados
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    tamanos = [int(float(t)) for t in argv[argv.index('--tamanos') + 1].split(',')] if '--tamanos' in argv else TAMANOS
+    salida = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in tamanos:
+            salida[str(n)] = medir_tamano(n, tmp)
+            print(f"\n{n:,} filas")
+            print(f"  {'formato':<28}{'carga ms':>10}{'df MB':>10}{'pico MB':>10}{'disco MB':>10}")
+            for formato, r in salida[str(n)].items():
+                print(f"  {formato:<28}{r['ms']:>10.1f}{r['memoria_df_mb']:>10.2f}{r['pico_carga_mb']:>10.2f}{r.get('disco_mb', float('nan')):>10.2f}")
+    if '--json' in argv:
+        with open(argv[argv.index('--json') + 1], 'w') as f: json.dump(salida, f, indent=2)
+    return salida
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# bench_importacion.py - Throughput y memoria de la importación/exportación masiva del historial
+#
+# Genera un archivo sintético (con ~0.5% de filas inválidas) y compara:
+#   registro uno a uno:  POST /api/registrar_historial por sesión (muestra, extrapolada al total)
+#   importar CSV/JSONL:  POST /api/historial/importar con el cuerpo en streaming (un solo append)
+#   exportar CSV/JSONL:  GET /api/historial/exportar consumido por bloques
+# Memoria: pico de tracemalloc (debe quedar acotado por el tamaño de lote, no por el archivo). tracemalloc
+# ralentiza mucho el parseo, así que el tiempo se mide sin él y la memoria de la importación en una segunda
+# pasada con ?estricto=1 (mismo parseo/validación/volcado; al haber filas inválidas no se escribe nada).
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_importacion [--filas 100000] [--muestra 2000] [--json salida.json]
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def _medir(fn):
+    inicio = time.perf_counter()
+    resultado = fn()
+    return resultado, time.perf_counter() - inicio
+
+
+def _pico_mb(fn):
+    tracemalloc.start()
+    fn()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pico / 2 ** 20
+
+
+def _archivos(tmp, filas):
+    import numpy as np
+    from benchmarks.datos_sinteticos import generar_historial
+    df = generar_historial(filas, semilla=3)
+    df.columns = [c.lower() for c in df.columns]
+    malas = np.random.default_rng(3).choice(filas, max(1, filas // 200), replace=False)
+    df['horas_estudio_real'] = df['horas_estudio_real'].astype(object)
+    df.loc[malas, 'horas_estudio_real'] = 'n/a'
+    rutas = {'csv': os.path.join(tmp, 'import.csv'), 'jsonl': os.path.join(tmp, 'import.jsonl')}
+    df.to_csv(rutas['csv'], index=False)
+    df.to_json(rutas['jsonl'], orient='records', lines=True, force_ascii=False)
+    return rutas, len(malas)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opcion = lambda nombre, defecto=None: argv[argv.index(nombre) + 1] if nombre in argv else defecto
+    filas, muestra = int(float(opcion('--filas', 100_000))), int(float(opcion('--muestra', 2000)))
+    ruta_json = opcion('--json') and os.path.abspath(opcion('--json'))
+
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    os.environ.update(DATOS_DIR=tmp, HISTORIAL_ARCHIVO=os.path.join(tmp, 'historial.csv'), MODELO_ARCHIVO=os.path.join(tmp, 'modelo_horas.pkl'),
+                      REENTRENO_DEBOUNCE_S='1e9', REENTRENO_UMBRAL_FILAS=str(10 ** 12))
+    import numpy as np
+    import main as app_main
+    from backend.models import ml_model as m
+    from benchmarks.datos_sinteticos import sesion
+
+    rutas, malas = _archivos(tmp, filas)
+    cliente, rng = app_main.app.test_client(), np.random.default_rng(1)
+    resultados = {}
+
+    def uno_a_uno():
+        for _ in range(muestra): cliente.post('/api/registrar_historial', json=sesion(rng))
+    _, segundos = _medir(uno_a_uno)
+    resultados["registro uno a uno"] = {"filas_s": round(muestra / segundos), "segundos_extrapolados": round(segundos * filas / muestra, 2),
+                                        "pico_mb": round(_pico_mb(lambda: cliente.post('/api/registrar_historial', json=sesion(rng))), 2),
+                                        "solicitudes_reentreno": muestra}
+
+    for formato, tipo in (('csv', 'text/csv'), ('jsonl', 'application/x-ndjson')):
+        solicitudes = m.planificador_entrenamiento.estado()["solicitudes"]
+        def importar(estricto=False):
+            with open(rutas[formato], 'rb') as f:
+                return cliente.post('/api/historial/importar' + ('?estricto=1' if estricto else ''), input_stream=f, content_type=tipo,
+                                    headers={'Content-Length': str(os.path.getsize(rutas[formato]))}).json
+        r, segundos = _medir(importar)
+        pico = _pico_mb(lambda: importar(estricto=True))
+        resultados[f"importar {formato}"] = {"filas_s": round(r["leidas"] / segundos), "segundos": round(segundos, 2), "pico_mb": round(pico, 2),
+                                             "importadas": r["importadas"], "rechazadas": r["rechazadas"],
+                                             "archivo_mb": round(os.path.getsize(rutas[formato]) / 2 ** 20, 1),
+                                             "solicitudes_reentreno": m.planificador_entrenamiento.estado()["solicitudes"] - solicitudes}
+        assert r["importadas"] + r["rechazadas"] == filas, r
+        assert r["rechazadas"] == malas, r
+
+    total = len(m.inicializar_o_cargar_datos())
+    for formato in ('csv', 'jsonl'):
+        def exportar():
+            resp = cliente.get(f'/api/historial/exportar?formato={formato}', buffered=False)
+            n = sum(len(b) for b in resp.response)
+            resp.close()
+            return n
+        n, segundos = _medir(exportar)
+        resultados[f"exportar {formato}"] = {"filas_s": round(total / segundos), "segundos": round(segundos, 2),
+                                             "pico_mb": round(_pico_mb(exportar), 2), "salida_mb": round(n / 2 ** 20, 1)}
+
+    print(f"\n{filas:,} filas por archivo ({malas} inválidas); historial final {total:,} filas")
+    print(f"  {'operación':<22}{'filas/s':>12}{'segundos':>10}{'pico MB':>10}{'reentrenos':>12}")
+    for nombre, r in resultados.items():
+        segundos = r.get("segundos", r.get("segundos_extrapolados"))
+        extrapolado = '*' if "segundos_extrapolados" in r else ' '
+        print(f"  {nombre:<22}{r['filas_s']:>12,}{segundos:>9.2f}{extrapolado}{r['pico_mb']:>10.2f}{r.get('solicitudes_reentreno', '-'):>12}")
+    print(f"  * extrapolado desde {muestra:,} registros")
+    salida = {"filas": filas, "invalidas": malas, "historial_final": total, "resultados": resultados}
+    if ruta_json:
+        with open(ruta_json, 'w') as f: json.dump(salida, f, indent=2)
+    return salida
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# bench_llm_cache.py - Tasa de aciertos, expulsión y single-flight de la caché LLM
+#
+# Usa un cliente falso local (sin red) que simula la latencia de cada llamada.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_llm_cache
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import google.genai as genai
+
+from backend.services import schedule_service
+from backend.services.llm_cache import CacheRespuestas
+from benchmarks.fake_gemini import FakeClient
+
+
+def main():
+    genai.Client = FakeClient
+    perfil = {"nombre": "Ana", "carrera": "Sistemas", "trabaja": True, "horario_trabajo_inicio": "15:00", "horario_trabajo_fin": "20:00"}
+    examenes = [{"materia": m, "fecha": f"2025-12-{d:02d}"} for m, d in [("Calculo", 10), ("Fisica", 12), ("Quimica", 15)]]
+
+    # 1) Single-flight: 20 peticiones idénticas concurrentes -> 1 llamada
+    schedule_service.respuestas_cache = CacheRespuestas(max_entradas=64)
+    FakeClient.models.llamadas = 0
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(20) as pool:
+        list(pool.map(lambda _: schedule_service.generate_exam_schedule(perfil, examenes), range(20)))
+    print(f"single-flight: 20 peticiones concurrentes -> {FakeClient.models.llamadas} llamada(s) en {time.perf_counter() - inicio:.2f}s")
+
+    # 2) Hit rate con una carga repetitiva (30 variantes de examenes, 300 peticiones) y expulsión LRU
+    FakeClient.models.latencia_s = 0.01
+    for max_entradas in (64, 10):
+        schedule_service.respuestas_cache = CacheRespuestas(max_entradas=max_entradas)
+        FakeClient.models.llamadas = 0
+        random.seed(1)
+        inicio = time.perf_counter()
+        for _ in range(300):
+            i = random.randint(0, 29)
+            schedule_service.generate_exam_schedule(perfil, examenes + [{"materia": f"Materia {i}", "fecha": "2025-12-20"}])
+        stats = schedule_service.respuestas_cache.estadisticas()
+        print(f"max_entradas={max_entradas}: hit_rate={stats['hit_rate']} expulsiones={stats['expulsiones']} "
+              f"llamadas={FakeClient.models.llamadas} tiempo={time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# bench_modelo_horas.py - Entrenamiento/evaluación del modelo de horas a distintos tamaños de historial
+#
+# Compara la heurística (1 + 0.5·dificultad), el RandomForest anterior (dificultad + calificación)
+# y el pipeline incremental (ModeloHoras): tiempo de fit, de actualización con 1% de filas nuevas,
+# latencia de predicción (lote de 40 y una fila) y error (MAE/RMSE) sobre el 20% más reciente.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_modelo_horas [--tamanos 1000,10000] [--rf-hasta 100000] [--json salida.json]
+
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from backend.models.historial_columnar import tipar
+from backend.models.ml_model import COLUMNAS, VALORES_DEFECTO
+from backend.models.modelo_horas import CATEGORICAS, NUMERICAS, ModeloHoras
+from benchmarks.datos_sinteticos import generar_historial
+
+TAMANOS = [1_000, 10_000, 100_000, 1_000_000]
+RF_HASTA = 100_000
+
+
+def _errores(y, pred):
+    err = np.asarray(pred, dtype='float64') - y
+    return {"mae": round(float(np.abs(err).mean()), 4), "rmse": round(float(np.sqrt((err ** 2).mean())), 4)}
+
+
+def _latencia_ms(fn, repeticiones=50):
+    fn()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return round(statistics.median(tiempos), 3)
+
+
+def _cronometrar(fn):
+    inicio = time.perf_counter()
+    resultado = fn()
+    return resultado, round(time.perf_counter() - inicio, 4)
+
+
+def evaluar(n, rf_hasta=RF_HASTA):
+    df = tipar(generar_historial(n), COLUMNAS, VALORES_DEFECTO)
+    corte = int(n * 0.8)
+    entrenamiento, prueba = df.iloc[:corte], df.iloc[corte:]
+    y = prueba['Horas_Estudio_Real'].to_numpy(dtype='float64')
+    filas = prueba[NUMERICAS + CATEGORICAS].to_dict('records')
+    lote, una = filas[:40], filas[:1]
+    resultados = {}
+
+    heuristica = lambda fs: [1.0 + f['Dificultad_Num'] * 0.5 for f in fs]
+    resultados["heuristica"] = dict(_errores(y, heuristica(filas)), fit_s=0.0, lote_ms=_latencia_ms(lambda: heuristica(lote)))
+
+    if n <= rf_hasta:
+        X = entrenamiento[['Dificultad_Num', 'Calificacion']]
+        rf, fit_s = _cronometrar(lambda: RandomForestRegressor(n_estimators=100, random_state=42).fit(X, entrenamiento['Horas_Estudio_Real']))
+        Xp = prueba[['Dificultad_Num', 'Calificacion']]
+        resultados["random_forest_2_features"] = dict(
+            _errores(y, np.clip(rf.predict(Xp), 0.5, 12)), fit_s=fit_s,
+            lote_ms=_latencia_ms(lambda: rf.predict(Xp.iloc[:40]), 20), una_fila_ms=_latencia_ms(lambda: rf.predict(Xp.iloc[:1]), 20))
+
+    modelo, fit_s = _cronometrar(lambda: ModeloHoras().ajustar(entrenamiento))
+    resultados["pipeline_completo"] = dict(
+        _errores(y, modelo.predecir(filas)), fit_s=fit_s,
+        lote_ms=_latencia_ms(lambda: modelo.predecir(lote)), una_fila_ms=_latencia_ms(lambda: modelo.predecir(una)))
+
+    # Incremental: fit hasta el 79% y una pasada de partial_fit con el último 1% + repaso (lo que hace el planificador)
+    previo = int(n * 0.79)
+    base = ModeloHoras().ajustar(df.iloc[:previo])
+    actualizado, update_s = _cronometrar(lambda: base.actualizar(df.iloc[previo:corte], corte, repaso=base.muestra_repaso(df, corte - previo)))
+    resultados["pipeline_incremental_1pct"] = dict(_errores(y, actualizado.predecir(filas)), fit_s=update_s)
+    return resultados
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opcion = lambda nombre, defecto=None: argv[argv.index(nombre) + 1] if nombre in argv else defecto
+    tamanos = [int(float(t)) for t in opcion('--tamanos', ','.join(map(str, TAMANOS))).split(',')]
+    rf_hasta = int(float(opcion('--rf-hasta', RF_HASTA)))
+    salida = {}
+    for n in tamanos:
+        salida[str(n)] = evaluar(n, rf_hasta)
+        print(f"\n{n:,} sesiones (80% entrenamiento / 20% prueba)")
+        print(f"  {'modelo':<28}{'fit s':>9}{'lote40 ms':>11}{'1 fila ms':>11}{'MAE':>8}{'RMSE':>8}")
+        for nombre, r in salida[str(n)].items():
+            lote = f"{r['lote_ms']:>11.3f}" if 'lote_ms' in r else f"{'-':>11}"
+            una = f"{r['una_fila_ms']:>11.3f}" if 'una_fila_ms' in r else f"{'-':>11}"
+            print(f"  {nombre:<28}{r['fit_s']:>9.3f}{lote}{una}{r['mae']:>8.3f}{r['rmse']:>8.3f}")
+    if opcion('--json'):
+        with open(opcion('--json'), 'w') as f: json.dump(salida, f, indent=2)
+    return salida
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# bench_planificador_local.py - Planificador local para un semestre completo de exámenes
+#
+# 16 semanas, 6 materias con 3-4 evaluaciones cada una, perfil con trabajo L-V.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_planificador_local
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from backend.services.local_scheduler import planificar
+
+PERFIL = {"nombre": "Ana", "trabaja": True, "horario_trabajo_inicio": "03:00 pm", "horario_trabajo_fin": "08:00 pm"}
+MATERIAS = ["Calculo", "Fisica", "Quimica", "Programacion", "Estadistica", "Etica"]
+
+
+def semestre(inicio, semanas=16):
+    random.seed(7)
+    examenes = []
+    for materia in MATERIAS:
+        for semana in sorted(random.sample(range(2, semanas), random.randint(3, 4))):
+            fecha = inicio + timedelta(weeks=semana, days=random.randint(0, 4))
+            examenes.append({"materia": materia, "fecha": fecha.isoformat(), "dificultad": random.choice(["baja", "media", "alta"])})
+    return examenes
+
+
+def main(repeticiones=20):
+    hoy = datetime.now().date()
+    examenes = semestre(hoy)
+    planificar(PERFIL, examenes, hoy=hoy)  # calentamiento (carga del modelo si existe)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones): plan, sin_asignar = planificar(PERFIL, examenes, hoy=hoy)
+    ms = (time.perf_counter() - inicio) / repeticiones * 1000
+    horas = sum(1 for i in plan if i['tipo'] == 'Estudio')
+    print(f"{len(examenes)} exámenes en 16 semanas -> {len(plan)} bloques ({horas} de estudio), "
+          f"{len(sin_asignar)} sin asignar, {ms:.1f} ms por plan")
+    return {"examenes": len(examenes), "bloques": len(plan), "ms_por_plan": ms}
+
+
+if __name__ == '__main__':
+    main()
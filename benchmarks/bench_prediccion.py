@@ -0,0 +1,60 @@
+# bench_prediccion.py - Micro-benchmark de predict_study_hours
+#
+# Compara: cargar el .pkl en cada llamada (comportamiento anterior), el modelo
+# residente en memoria, y la predicción en lote para un ciclo completo.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_prediccion
+
+import os
+import random
+import tempfile
+import time
+
+import joblib
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from backend.models import ml_model
+
+
+def _medir(fn, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones): fn()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main(n_materias=40, repeticiones=20):
+    random.seed(42)
+    X = pd.DataFrame({'Dificultad_Num': [random.randint(1, 3) for _ in range(500)],
+                      'Calificacion': [random.randint(10, 20) for _ in range(500)]})
+    y = X['Dificultad_Num'] * 1.5 + (X['Calificacion'] - 10) * 0.2
+    modelo = RandomForestRegressor(n_estimators=100, random_state=42).fit(X, y)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ml_model.MODEL_FILE = os.path.join(tmp, 'modelo_horas.pkl')
+        joblib.dump(modelo, ml_model.MODEL_FILE)
+        pares = [(random.randint(1, 3), random.randint(12, 20)) for _ in range(n_materias)]
+
+        def por_llamada_con_carga():
+            for d, c in pares:
+                m = joblib.load(ml_model.MODEL_FILE)
+                m.predict(pd.DataFrame([[d, c]], columns=['Dificultad_Num', 'Calificacion']))
+
+        def por_llamada_residente():
+            for d, c in pares: ml_model.predict_study_hours(d, c)
+
+        def en_lote():
+            ml_model.predict_study_hours_batch(pares)
+
+        ml_model.cargar_modelo()
+        resultados = {
+            "carga_por_llamada_ms": _medir(por_llamada_con_carga, max(1, repeticiones // 5)),
+            "residente_por_llamada_ms": _medir(por_llamada_residente, repeticiones),
+            "lote_ms": _medir(en_lote, repeticiones),
+        }
+    print(f"{n_materias} materias por ciclo:")
+    for nombre, ms in resultados.items(): print(f"  {nombre:<26} {ms:10.2f} ms")
+    return resultados
+
+
+if __name__ == '__main__':
+    main()
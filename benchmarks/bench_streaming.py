@@ -0,0 +1,45 @@
+# bench_streaming.py - Tiempo al primer byte de /api/conversar con y sin streaming
+#
+# Usa el cliente falso local con 1 s de generación repartida en 20 chunks.
+# Uso (desde la raíz del repo):  python -m benchmarks.bench_streaming
+
+import os
+import tempfile
+import time
+
+import google.genai as genai
+
+from backend.services import gemini_client, schedule_service
+from benchmarks.fake_gemini import FakeClient
+
+
+def main(latencia_s=1.0):
+    genai.Client = FakeClient
+    gemini_client.reset_client()
+    FakeClient.models.latencia_s = latencia_s
+    tmp = tempfile.mkdtemp()
+    schedule_service.CHAT_FILE = os.path.join(tmp, 'chat_history.jsonl')
+    schedule_service.CHAT_SUMMARY_FILE = os.path.join(tmp, 'chat_summary.json')
+    import main as app_main
+    cliente = app_main.app.test_client()
+    history = [{"role": "user", "text": "Hola, ¿cómo organizo mi semana?"}]
+
+    inicio = time.perf_counter()
+    cliente.post('/api/conversar', json={"history": list(history)})
+    bloqueante = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resp = cliente.post('/api/conversar', json={"history": list(history), "stream": True}, buffered=False)
+    chunks = iter(resp.response)
+    next(chunks)
+    ttfb = time.perf_counter() - inicio
+    eventos = 1 + sum(1 for _ in chunks)
+    total = time.perf_counter() - inicio
+
+    print(f"bloqueante: primer byte = respuesta completa = {bloqueante * 1000:.0f} ms")
+    print(f"streaming:  primer byte {ttfb * 1000:.0f} ms, completo {total * 1000:.0f} ms, {eventos} eventos SSE")
+    return {"bloqueante_ms": bloqueante * 1000, "ttfb_stream_ms": ttfb * 1000, "total_stream_ms": total * 1000}
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# calendar_stub.py - Stub local de la API de Google Calendar (events + batch)
+
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def _error(status):
+    return HttpError(httplib2.Response({'status': str(status)}), b'{}')
+
+
+class _Request:
+    def __init__(self, stub, operacion):
+        self.stub = stub
+        self.operacion = operacion
+
+    def execute(self):
+        self.stub._viaje_http()
+        return self.operacion()
+
+
+class _Batch:
+    def __init__(self, stub, callback):
+        self.stub = stub
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.stub._viaje_http()
+        for request_id, req in self.requests:
+            try: self.callback(request_id, req.operacion(), None)
+            except HttpError as e: self.callback(request_id, None, e)
+
+
+class _Events:
+    def __init__(self, stub):
+        self.stub = stub
+
+    def insert(self, calendarId, body):
+        def op():
+            if body['id'] in self.stub.eventos: raise _error(409)
+            self.stub.eventos[body['id']] = dict(body, status='confirmed')
+            return self.stub.eventos[body['id']]
+        return _Request(self.stub, op)
+
+    def update(self, calendarId, eventId, body):
+        def op():
+            if eventId not in self.stub.eventos: raise _error(404)
+            self.stub.eventos[eventId] = dict(body, status='confirmed')
+            return self.stub.eventos[eventId]
+        return _Request(self.stub, op)
+
+    def delete(self, calendarId, eventId):
+        def op():
+            ev = self.stub.eventos.get(eventId)
+            if ev is None or ev['status'] == 'cancelled': raise _error(410)
+            ev['status'] = 'cancelled'
+        return _Request(self.stub, op)
+
+    def list(self, calendarId, privateExtendedProperty, timeMin, timeMax, pageToken=None, **kwargs):
+        clave, valor = privateExtendedProperty.split('=', 1)
+        def op():
+            items = [ev for ev in self.stub.eventos.values()
+                     if ev['status'] != 'cancelled' and ev.get('extendedProperties', {}).get('private', {}).get(clave) == valor
+                     and timeMin[:10] <= ev['start']['dateTime'][:10] < timeMax[:10]]
+            return {'items': items}
+        return _Request(self.stub, op)
+
+
+class StubCalendar:
+    """Imita el servicio de googleapiclient; cada execute() cuesta `latencia_s` (un viaje HTTP)."""
+
+    def __init__(self, latencia_s=0.05):
+        self.latencia_s = latencia_s
+        self.eventos = {}
+        self.viajes_http = 0
+
+    def _viaje_http(self):
+        self.viajes_http += 1
+        time.sleep(self.latencia_s)
+
+    def events(self):
+        return _Events(self)
+
+    def new_batch_http_request(self, callback):
+        return _Batch(self, callback)
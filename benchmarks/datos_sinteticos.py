@@ -0,0 +1,73 @@
+# datos_sinteticos.py - Historial de estudio sintético con el esquema de ml_model.COLUMNAS
+#
+# Distribuciones plausibles para un estudiante (varias sesiones por día, materias con
+# peso desigual, racha activa hasta hoy). Las horas dependen de dificultad, calificación,
+# energía, sueño y materia (más ruido) para poder evaluar modelos. Reproducible con `semilla`.
+# Uso:  python -m benchmarks.datos_sinteticos 100000 /tmp/historial.csv
+
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend.models.ml_model import COLUMNAS
+
+MATERIAS = ["Calculo", "Fisica", "Quimica", "Programacion", "Estadistica", "Etica", "Algebra",
+            "Biologia", "Economia", "Historia", "Ingles", "Redes"]
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+DIFICULTADES = ["baja", "media", "alta"]
+BLOQUEOS = ["Ninguno", "Cansancio", "Distracciones", "Celular", "Ruido", "Falta de material"]
+LUGARES = ["Casa", "Biblioteca", "Universidad", "Cafetería"]
+ACTIVIDADES = ["Ninguna", "Gimnasio", "Deporte", "Caminata"]
+
+
+def generar_historial(n, semilla=0, hoy=None):
+    """DataFrame de `n` sesiones repartidas en hasta ~4 años que terminan hoy (columnas = COLUMNAS)."""
+    rng = np.random.default_rng(semilla)
+    hoy = hoy or date.today()
+    dias = min(1460, max(7, n // 3))
+    atras = np.sort(rng.integers(0, dias, n))[::-1]
+    fechas = pd.to_datetime(hoy) - pd.to_timedelta(atras, unit='D')
+    pesos = rng.dirichlet(np.ones(len(MATERIAS)) * 2)
+    dificultad = rng.integers(0, 3, n)
+    materia = rng.choice(len(MATERIAS), n, p=pesos)
+    energia, calificacion = rng.integers(1, 6, n), rng.integers(0, 21, n)
+    sueno = np.round(rng.normal(7, 1.2, n).clip(3, 11), 1)
+    efecto_materia = np.linspace(-0.6, 0.8, len(MATERIAS))[rng.permutation(len(MATERIAS))]
+    horas = (0.4 + 0.6 * dificultad + 0.05 * calificacion + 0.2 * (energia - 3) + 0.1 * (sueno - 7)
+             + efecto_materia[materia] + rng.gamma(2.0, 0.25, n))
+    df = pd.DataFrame({
+        'Materia': np.array(MATERIAS)[materia],
+        'Horas_Estudio_Real': np.round(np.clip(horas, 0.25, 8), 2),
+        'Dificultad_Cat': np.array(DIFICULTADES)[dificultad],
+        'Dificultad_Num': dificultad + 1,
+        'Nivel_Energia': energia,
+        'Cumplio_Objetivo': rng.choice(["sí", "no", "parcial"], n, p=[0.6, 0.15, 0.25]),
+        'Factor_Bloqueo': rng.choice(BLOQUEOS, n),
+        'Calificacion': calificacion,
+        'Horas_Sueno': sueno,
+        'Lugar_Estudio': rng.choice(LUGARES, n),
+        'Actividad_Fisica': rng.choice(ACTIVIDADES, n, p=[0.55, 0.2, 0.15, 0.1]),
+        'Dia_Semana': np.array(DIAS_SEMANA)[fechas.dayofweek],
+        'Fecha': fechas.strftime('%Y-%m-%d'),
+        'Tipo_Sesion': rng.choice(["Manual", "Pomodoro"], n, p=[0.7, 0.3]),
+    })
+    return df[COLUMNAS]
+
+
+def escribir_csv(ruta, n, semilla=0, hoy=None):
+    generar_historial(n, semilla, hoy).to_csv(ruta, index=False)
+    return ruta
+
+
+def sesion(rng=None):
+    """Cuerpo JSON para POST /api/registrar_historial."""
+    rng = rng or np.random.default_rng()
+    return {"materia": str(rng.choice(MATERIAS)), "horas_reales": float(np.round(rng.gamma(2.0, 0.8), 2)),
+            "dificultad": str(rng.choice(DIFICULTADES)), "nivel_energia": int(rng.integers(1, 6)),
+            "horas_sueno": 7, "tipo_sesion": "Pomodoro"}
+
+
+if __name__ == '__main__':
+    escribir_csv(sys.argv[2] if len(sys.argv) > 2 else 'historial_sintetico.csv', int(float(sys.argv[1])))
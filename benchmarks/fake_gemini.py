@@ -0,0 +1,40 @@
+# fake_gemini.py - Cliente local que imita google.genai.Client para benchmarks
+
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeModels:
+    def __init__(self, latencia_s, respuesta):
+        self.latencia_s = latencia_s
+        self.respuesta = respuesta
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock: self.llamadas += 1
+        time.sleep(self.latencia_s)
+        return self.respuesta(contents, config)
+
+    def generate_content_stream(self, model, contents, config=None, fragmentos=20):
+        """Reparte la latencia total entre `fragmentos` chunks de texto."""
+        with self._lock: self.llamadas += 1
+        for i in range(fragmentos):
+            time.sleep(self.latencia_s / fragmentos)
+            yield SimpleNamespace(text=f"tok{i} ", function_calls=None)
+
+
+def plan_semanal(contents, config):
+    prompt = contents[-1]["parts"][0]["text"]
+    plan = {"planSemanal": [{"dia": "Lunes", "fecha": "2025-12-01", "hora_inicio": "08:00", "hora_fin": "10:00",
+                             "actividad": f"Estudio ({len(prompt)})", "tipo": "Estudio", "prioridad": "Alta"}]}
+    return SimpleNamespace(text=None, function_calls=[SimpleNamespace(name="PlanSemanal", args=plan)])
+
+
+class FakeClient:
+    """Sustituto de genai.Client(): todas las instancias comparten los mismos `models`."""
+    models = FakeModels(0.2, plan_semanal)
+
+    def __init__(self, *args, **kwargs):
+        pass
@@ -0,0 +1,60 @@
+# verificar_dashboard.py - Consistencia de los agregados incrementales del dashboard contra pandas
+#
+# Reproduce historiales sintéticos (varios tamaños y semillas, en texto y ya tipados como los
+# sirve la caché) fila a fila por AgregadosDashboard y exige que verificar_agregados_dashboard()
+# no encuentre diferencias con calcular_dashboard_pandas(). También comprueba el camino real:
+# POST /api/registrar_historial (listener del store) y la reconstrucción vectorizada.
+# Sale con código 1 si hay alguna diferencia.
+# Uso (desde la raíz del repo):  python -m benchmarks.verificar_dashboard [--tamanos 10,500,5000] [--semillas 0,1,2]
+
+import os
+import sys
+import tempfile
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opcion = lambda nombre, defecto=None: argv[argv.index(nombre) + 1] if nombre in argv else defecto
+    tamanos = [int(float(t)) for t in opcion('--tamanos', '10,500,5000').split(',')]
+    semillas = [int(s) for s in opcion('--semillas', '0,1,2').split(',')]
+
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    os.environ.update(DATOS_DIR=tmp, HISTORIAL_ARCHIVO=os.path.join(tmp, 'historial.csv'), MODELO_ARCHIVO=os.path.join(tmp, 'modelo_horas.pkl'),
+                      REENTRENO_DEBOUNCE_S='1e9', REENTRENO_UMBRAL_FILAS=str(10 ** 9))
+    import numpy as np
+    from benchmarks.datos_sinteticos import escribir_csv, generar_historial, sesion
+    from backend.models import ml_model as m
+    from backend.models.historial_columnar import tipar
+
+    fallos = []
+    for n in tamanos:
+        for semilla in semillas:
+            crudo = generar_historial(n, semilla=semilla)
+            for nombre, df in (("texto", crudo), ("tipado", tipar(crudo.copy(), m.COLUMNAS, m.VALORES_DEFECTO))):
+                diferencias = m.verificar_agregados_dashboard(df)
+                if diferencias: fallos.append((f"replay {nombre} n={n} semilla={semilla}", diferencias))
+
+    # Camino de la app: reconstrucción + filas aplicadas por el listener en cada registro
+    import main as app_main
+    escribir_csv(os.environ['HISTORIAL_ARCHIVO'], max(tamanos))
+    cliente, rng = app_main.app.test_client(), np.random.default_rng(7)
+    cliente.get('/api/dashboard_stats')
+    for _ in range(200): cliente.post('/api/registrar_historial', json=sesion(rng))
+    obtenido = cliente.get('/api/dashboard_stats').json
+    esperado = m.calcular_dashboard_pandas(m.inicializar_o_cargar_datos())
+    for clave in ('sesiones_totales', 'tasa_exito', 'nivel', 'racha_dias'):
+        if obtenido[clave] != esperado[clave]: fallos.append((f"listener {clave}", (esperado[clave], obtenido[clave])))
+    if abs(float(obtenido['total_horas']) - float(esperado['total_horas'])) > 0.1 + 1e-9:
+        fallos.append(("listener total_horas", (esperado['total_horas'], obtenido['total_horas'])))
+    diferencias = m.verificar_agregados_dashboard()
+    if diferencias: fallos.append(("replay del historial registrado", diferencias))
+
+    casos = len(tamanos) * len(semillas) * 2 + 2
+    for caso, diferencias in fallos: print(f"FALLA {caso}: {diferencias}")
+    print(f"{casos - len(fallos)}/{casos} historiales coinciden con calcular_dashboard_pandas")
+    if fallos: sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -47,11 +47,13 @@ export class AppComponent implements OnInit {
   ngOnInit(): void { this.checkProfileStatus(); this.checkGoogleStatus(); }
 
   async checkGoogleStatus() { try { const res: any = await this.http.get(`${this.apiUrl}/google/status`).toPromise(); this.isGoogleConnected = res.conectado; } catch(e) { this.isGoogleConnected = false; } }
-  async conectarGoogle() { this.loading = true; try { await this.http.get(`${this.apiUrl}/google/connect`).toPromise(); this.isGoogleConnected = true; alert("✅ ¡Conectado a Google Calendar con éxito!"); } catch(e) { alert("Error al conectar."); } finally { this.loading = false; } }
+  async conectarGoogle() { this.loading = true; try { const res: any = await this.http.get(`${this.apiUrl}/google/connect`).toPromise(); window.open(res.auth_url, '_blank'); for (let i = 0; i < 150 && !this.isGoogleConnected; i++) { await new Promise(r => setTimeout(r, 2000)); await this.checkGoogleStatus(); } if (this.isGoogleConnected) alert("✅ ¡Conectado a Google Calendar con éxito!"); } catch(e) { alert("Error al conectar."); } finally { this.loading = false; } }
   async guardarEnCalendario(horario: any) { if (!this.isGoogleConnected) { if(confirm("No estás conectado. ¿Conectar?")) this.conectarGoogle(); return; } this.loading = true; try { const res: any = await this.http.post(`${this.apiUrl}/google/sync`, { horario }).toPromise(); alert(res.mensaje); this.triggerGamification(300); } catch(e) { alert("Error al sincronizar."); } finally { this.loading = false; } }
 
   async checkProfileStatus() { try { const res: any = await this.http.get(`${this.apiUrl}/check_perfil`).toPromise(); this.hasProfile = res.existe; if (this.hasProfile) { this.loadChatHistory(); this.loadProfileForEdit(false); } } catch (e) {} }
-  async guardarPerfilInicial() { this.loading = true; try { await this.http.post(`${this.apiUrl}/crear_perfil`, this.profileData).toPromise(); this.hasProfile = true; this.loadChatHistory(); } catch(e){} finally { this.loading = false; } }
+  // Los endpoints con Gemini responden 202 + job_id: se consulta /jobs/<id> hasta que termina
+  private async resultadoJob(res: any): Promise<any> { if (!res?.job_id) return res; while (true) { await new Promise(r => setTimeout(r, 1500)); const job: any = await this.http.get(`${this.apiUrl}/jobs/${res.job_id}`).toPromise(); if (job.estado === 'en_cola' || job.estado === 'ejecutando') continue; if (job.estado === 'completado' || job.respaldo) return job.resultado; throw new Error(job.error || job.estado); } }
+  async guardarPerfilInicial() { this.loading = true; try { await this.resultadoJob(await this.http.post(`${this.apiUrl}/crear_perfil`, this.profileData).toPromise()); this.hasProfile = true; this.loadChatHistory(); } catch(e){} finally { this.loading = false; } }
   async resetProfile() { if(confirm('⚠️ Reset total. ¿Continuar?')) { await this.http.post(`${this.apiUrl}/reset_perfil`, {}).toPromise(); window.location.reload(); } }
   async loadChatHistory() { try { const h: any = await this.http.get(`${this.apiUrl}/chat_history`).toPromise(); if (h) { this.chatHistory = h; this.scrollToBottom(); } } catch (e) {} }
   async enviarMensaje(silentSave: boolean = false) { if (!silentSave && (!this.userInput.trim() || this.loading)) return; if (!silentSave) { this.chatHistory.push({ role: 'user', text: this.userInput }); this.userInput = ''; this.loading = true; this.scrollToBottom(); } try { const res = await this.http.post<ChatMessage>(`${this.apiUrl}/conversar`, { history: this.chatHistory }).toPromise(); if (res && !silentSave) { this.chatHistory.push(res); this.scrollToBottom(); } } catch (e) { if (!silentSave) this.chatHistory.push({ role: 'assistant', text: 'Error.' }); } finally { this.loading = false; } }
@@ -63,7 +65,7 @@ export class AppComponent implements OnInit {
   closeExamModal() { this.showExamModal = false; }
   addExamRow() { const tomorrow = new Date(); tomorrow.setDate(tomorrow.getDate() + 1); this.examsList.push({ materia: '', fecha: tomorrow.toISOString().split('T')[0], hora: '08:00', duracion: 2, temas: '', dificultad: 'Alta', formato: 'Teórico', confianza: 50 }); }
   removeExamRow(i: number) { if (this.examsList.length > 1) this.examsList.splice(i, 1); }
-  async generateExamPlan() { this.isUpdating = true; try { const ep = this.isCrisisMode ? '/planificar_crisis' : '/planificar_examenes'; const r:any = await this.http.post(`${this.apiUrl}${ep}`, {examenes:this.examsList}).toPromise(); this.showExamModal = false; this.chatHistory.push(r); this.enviarMensaje(true); } catch(e){} finally { this.isUpdating = false; } }
+  async generateExamPlan() { this.isUpdating = true; try { const ep = this.isCrisisMode ? '/planificar_crisis' : '/planificar_examenes'; const r:any = await this.resultadoJob(await this.http.post(`${this.apiUrl}${ep}`, {examenes:this.examsList}).toPromise()); this.showExamModal = false; this.chatHistory.push(r); this.enviarMensaje(true); } catch(e){} finally { this.isUpdating = false; } }
   async openCheckinModal() { this.cargarMaterias(); this.showCheckinModal = true; }
   closeCheckinModal() { this.showCheckinModal = false; }
   getDiaSemanaActual(): string { const dias = ['Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']; return dias[new Date().getDay()]; }
@@ -81,7 +83,7 @@ export class AppComponent implements OnInit {
   async openProjectsModal() { this.showProjectsModal = true; this.activeProject = null; this.loadProjects(); }
   closeProjectsModal() { this.showProjectsModal = false; }
   async loadProjects() { try { const d: any = await this.http.get(`${this.apiUrl}/proyectos`).toPromise(); this.projectsList = d||[]; } catch(e){} }
-  async createProject() { if(!this.newProjectData.nombre) return; this.isUpdating=true; try { await this.http.post(`${this.apiUrl}/crear_proyecto`, this.newProjectData).toPromise(); this.loadProjects(); this.newProjectData={nombre:'', descripcion:'', fecha_fin:''}; } catch(e){} finally { this.isUpdating=false; } }
+  async createProject() { if(!this.newProjectData.nombre) return; this.isUpdating=true; try { await this.resultadoJob(await this.http.post(`${this.apiUrl}/crear_proyecto`, this.newProjectData).toPromise()); this.loadProjects(); this.newProjectData={nombre:'', descripcion:'', fecha_fin:''}; } catch(e){} finally { this.isUpdating=false; } }
   selectProject(p: Project) { this.activeProject = p; }
   async toggleMilestone(m: Milestone) { if(!this.activeProject) return; try { await this.http.post(`${this.apiUrl}/actualizar_hitos`, {project_id:this.activeProject.id, hitos:this.activeProject.hitos}).toPromise(); const t=this.activeProject.hitos.length; const c=this.activeProject.hitos.filter(h=>h.completado).length; this.activeProject.progreso=Math.floor((c/t)*100); if(m.completado) this.triggerGamification(200); } catch(e){} }
   async deleteProject(id: string) { if(confirm("¿Borrar?")) { await this.http.post(`${this.apiUrl}/eliminar_proyecto`, {id}).toPromise(); this.activeProject=null; this.loadProjects(); } }
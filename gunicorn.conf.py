@@ -0,0 +1,28 @@
+# gunicorn.conf.py - Servidor de producción (Linux/macOS; en Windows usar `python main.py`)
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Varios procesos (cada uno con su copia de cachés, modelo y métricas) con hilos dentro de cada uno:
+# las llamadas a Gemini y el SSE pasan la mayor parte del tiempo esperando red, así que gthread
+# atiende muchas a la vez sin multiplicar la memoria de pandas/sklearn por petición.
+# Lo compartido vive en disco: historial (append bajo flock), perfil/chat/proyectos/modelo
+# (temporal + os.replace bajo flock) y el estado de los jobs (JOBS_COMPARTIDOS).
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY') or min(os.cpu_count() or 1, 4))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+# Chat sin streaming y planes con Gemini pueden tardar; el SSE mantiene la conexión viva
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Sin preload: cada worker importa la app tras el fork (hilos de reentreno/cola y clientes HTTP propios)
+preload_app = False
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-') or None   # GUNICORN_ACCESSLOG= (vacío) lo desactiva
+
+# Proyectos con escritura inmediata (sin el temporizador de agrupado por proceso) y jobs visibles
+# desde cualquier worker; se respetan si ya vienen definidos en el entorno.
+os.environ.setdefault('PROYECTOS_RETARDO_ESCRITURA_S', '0')
+os.environ.setdefault('JOBS_COMPARTIDOS', '1')
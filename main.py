@@ -1,245 +1,447 @@
 import logging
 import os
 import json
-import pandas as pd 
+import threading
+import time
 from datetime import datetime
 
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, g, jsonify, redirect, request, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv 
 
-# --- LIBRERÍAS DE GOOGLE CALENDAR ---
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-
 from backend.services.schedule_service import (
-    process_chat, save_user_profile, generate_initial_schedule, 
+    process_chat, process_chat_stream, save_user_profile, generate_initial_schedule, 
     load_user_profile, delete_user_profile, generate_exam_schedule,
     generate_crisis_schedule, load_chat_history, save_chat_history,
-    load_projects, save_projects, generate_project_plan_ai
+    load_projects, generate_project_plan_ai, respuestas_cache, proyectos_repo,
+    todas_las_herramientas
 )
+from backend.services import gemini_client, google_oauth
+from backend.services.calendar_sync import CLAVE_PLAN_VALIDA, PLAN_POR_DEFECTO, obtener_servicio, sincronizar_plan
+from backend.services.historial_io import DIAS_SEMANA, DIFICULTADES, ErrorImportacion, detectar_formato, exportar, importar
+from backend.services.job_queue import cola_trabajos
+from backend.services.local_scheduler import generate_local_schedule, validar_examenes
+from backend.services.plan_validator import validar_plan
 from backend.models.ml_model import (
-    inicializar_o_cargar_datos, entrenar_modelo, DATA_FILE, 
-    obtener_datos_dashboard, obtener_materias_unicas
+    registrar_sesion, obtener_datos_dashboard, obtener_materias_unicas,
+    historial_cache, planificador_entrenamiento, predict_study_hours_batch,
+    cargar_modelo, obtener_reporte_analitico, reporte_analitico
 )
+from backend.utils import lazy_import, metricas
+from backend.utils.config_utils import ruta_datos
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 load_dotenv() 
 
-app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "*"}}) 
+api = Blueprint('api', __name__)
 
 # --- CONFIGURACIÓN GOOGLE CALENDAR ---
 SCOPES = ['https://www.googleapis.com/auth/calendar']
-TOKEN_FILE = 'token.json'
-CREDENTIALS_FILE = 'client_secret.json'
+TOKEN_FILE = ruta_datos('token.json', 'GOOGLE_TOKEN_ARCHIVO')
+CREDENTIALS_FILE = ruta_datos('client_secret.json', 'GOOGLE_CREDENCIALES_ARCHIVO')
+
+# --- ARRANQUE: IMPORTS DIFERIDOS + CALENTAMIENTO ---
+# pandas/sklearn/google.* no se importan al cargar la app; el primer endpoint que los usa los carga.
+# Con PRECALENTAR=1 (por defecto al ejecutar main.py) un hilo los carga tras arrancar el servidor.
+MODULOS_PESADOS = [
+    'pandas', 'sklearn.linear_model', 'sklearn.feature_extraction', 'sklearn.preprocessing', 'joblib', 'httpx', 'google.genai', 'google.genai.types',
+    'google.oauth2.credentials', 'googleapiclient.discovery', 'google_auth_oauthlib.flow'
+]
+
+def precalentar():
+    """Deja listos imports, tools de Gemini, modelo e historial para que la primera petición no pague el arranque."""
+    lazy_import.precargar(MODULOS_PESADOS)
+    todas_las_herramientas()
+    cargar_modelo()
+    obtener_reporte_analitico()
+
+def precalentar_en_segundo_plano():
+    threading.Thread(target=precalentar, name='precalentar', daemon=True).start()
+
+@api.route('/api/sistema/arranque', methods=['GET'])
+def estado_arranque(): return jsonify(lazy_import.estado(MODULOS_PESADOS))
+
+# --- MÉTRICAS ---
+# Histograma de latencia por ruta/método/estado; /api/metrics expone todo en formato Prometheus
+@api.before_app_request
+def _inicio_peticion(): g.inicio_peticion = time.perf_counter()
+
+@api.after_app_request
+def _medir_peticion(response):
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is not None:
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        metricas.observar('http_peticion_segundos', time.perf_counter() - inicio, ruta=ruta, metodo=request.method, estado=response.status_code)
+        if response.status_code >= 500: metricas.incrementar('errores_total', operacion='http', tipo=str(response.status_code))
+    return response
+
+def _registrar_metricas():
+    metricas.registro.describir('http_peticion_segundos', 'Duración de las peticiones HTTP por ruta.')
+    metricas.registro.describir('gemini_llamada_segundos', 'Duración de las llamadas a Gemini.')
+    metricas.registro.describir('errores_total', 'Excepciones por operación y tipo.')
+    metricas.registro.registrar_coleccion('llm_cache', respuestas_cache.estadisticas)
+    metricas.registro.registrar_coleccion('gemini_cliente', gemini_client.estadisticas)
+    metricas.registro.registrar_coleccion('historial_cache', historial_cache.estadisticas)
+    metricas.registro.registrar_coleccion('reporte_analitico', reporte_analitico.estadisticas)
+    metricas.registro.registrar_coleccion('cola_trabajos', cola_trabajos.metricas)
+
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    return Response(metricas.registro.exportar(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/metrics/perfil', methods=['GET'])
+def perfil_muestreo():
+    """Perfila el proceso durante ?segundos=N (máx. 60) y devuelve las pilas en formato folded."""
+    try: segundos, intervalo_ms = float(request.args.get('segundos', 5)), float(request.args.get('intervalo_ms', 10))
+    except ValueError: return jsonify({"error": "segundos e intervalo_ms deben ser números"}), 400
+    # intervalo_ms=0 dejaría el hilo muestreando sin pausa; NaN no pasa ninguna comparación
+    if not 0 < segundos or not 1 <= intervalo_ms <= 1000:
+        return jsonify({"error": "segundos debe ser > 0 e intervalo_ms estar entre 1 y 1000"}), 400
+    segundos = min(segundos, 60.0)
+    perfilador = metricas.PerfiladorMuestreo(intervalo_s=intervalo_ms / 1000).iniciar()
+    time.sleep(segundos)
+    return Response(perfilador.detener().folded(top=request.args.get('top', type=int)), mimetype='text/plain')
 
 # --- ENDPOINTS EXISTENTES ---
-@app.route('/api/chat_history', methods=['GET'])
+@api.route('/api/chat_history', methods=['GET'])
 def get_chat_history(): return jsonify(load_chat_history())
 
-@app.route('/api/conversar', methods=['POST'])
+def _sse(eventos):
+    for e in eventos:
+        nombre = e.pop('evento')
+        yield f"event: {nombre}\ndata: {json.dumps(e, ensure_ascii=False)}\n\n"
+
+@api.route('/api/conversar', methods=['POST'])
 def conversar():
+    """Respuesta JSON completa, o SSE si se envía "stream": true o Accept: text/event-stream."""
     try:
         data = request.get_json()
-        return jsonify(process_chat(data.get('history', [])))
+        reformular = data.get('reformular_estadisticas')
+        if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+            eventos = _sse(process_chat_stream(data.get('history', []), reformular))
+            return Response(stream_with_context(eventos), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        return jsonify(process_chat(data.get('history', []), reformular))
     except Exception as e: return jsonify({"error": str(e)}), 500
 
-@app.route('/api/check_perfil', methods=['GET'])
+@api.route('/api/llm/cache_stats', methods=['GET'])
+def llm_cache_stats(): return jsonify(respuestas_cache.estadisticas())
+
+@api.route('/api/llm/client_stats', methods=['GET'])
+def llm_client_stats(): return jsonify(gemini_client.estadisticas())
+
+@api.route('/api/check_perfil', methods=['GET'])
 def check_perfil(): return jsonify({"existe": load_user_profile() is not None})
 
-@app.route('/api/obtener_perfil', methods=['GET'])
+@api.route('/api/obtener_perfil', methods=['GET'])
 def obtener_perfil():
     p = load_user_profile()
     return jsonify(p) if p else (jsonify({"error": "No perfil"}), 404)
 
-@app.route('/api/crear_perfil', methods=['POST'])
+# --- TRABAJOS LLM (COLA) ---
+def responder_job(tipo, tarea, respaldo=None, al_completar=None):
+    """
+    Encola `tarea` en la cola de trabajos y devuelve 202 con el job id al momento: el
+    cliente consulta /api/jobs/<id> y el worker no queda ocupado durante la llamada a
+    Gemini. Con ?async=0 (o Prefer: wait) espera el resultado en la misma petición.
+    Si Gemini falla y hay `respaldo` (planificador local), el resultado es el de respaldo.
+    `tarea` y `respaldo` solo calculan; lo que se guarda va en `al_completar`.
+    """
+    job_id = cola_trabajos.enviar(tipo, tarea, respaldo, al_completar)
+    if request.args.get('async') != '0' and 'wait' not in request.headers.get('Prefer', ''):
+        return jsonify({"job_id": job_id, "estado": "en_cola", "url": f"/api/jobs/{job_id}"}), 202
+    job = cola_trabajos.esperar(job_id)
+    if job['estado'] == 'completado' or job['respaldo']: return jsonify(job['resultado'])
+    return jsonify({"error": job['error'], "job_id": job_id}), 504 if job['estado'] == 'expirado' else 502
+
+@api.route('/api/jobs/metricas', methods=['GET'])
+def jobs_metricas(): return jsonify(cola_trabajos.metricas())
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def job_estado(job_id):
+    job = cola_trabajos.estado(job_id)
+    return jsonify(job) if job else (jsonify({"error": "Job no encontrado"}), 404)
+
+def con_plan(clave):
+    """Marca el horario de una respuesta con su plan: al sincronizarlo solo se reemplazan eventos de ese plan."""
+    def marcar(resultado):
+        if isinstance(resultado, dict) and isinstance(resultado.get('horario'), dict):
+            return dict(resultado, horario=dict(resultado['horario'], plan=clave))
+        return resultado
+    return marcar
+
+@api.route('/api/crear_perfil', methods=['POST'])
 def crear_perfil():
     try:
         data = request.get_json()
         save_user_profile(data)
-        schedule = generate_initial_schedule(data)
-        save_chat_history([schedule])
-        return jsonify(schedule)
+        def guardar(schedule):
+            schedule = con_plan(PLAN_POR_DEFECTO)(schedule)
+            save_chat_history([schedule])
+            return schedule
+        if data.get('modo') == 'local': return jsonify(guardar(generate_local_schedule(data)))
+        return responder_job('crear_perfil', lambda: generate_initial_schedule(data, raise_errors=True),
+                             respaldo=lambda: generate_local_schedule(data), al_completar=guardar)
     except Exception as e: return jsonify({"error": str(e)}), 500
 
-@app.route('/api/actualizar_perfil', methods=['POST'])
+@api.route('/api/actualizar_perfil', methods=['POST'])
 def actualizar_perfil():
     save_user_profile(request.get_json())
     return jsonify({"mensaje": "Ok"})
 
-@app.route('/api/reset_perfil', methods=['POST'])
+@api.route('/api/reset_perfil', methods=['POST'])
 def reset_perfil():
     delete_user_profile()
     # También borramos el token de Google para desconectar
     if os.path.exists(TOKEN_FILE): os.remove(TOKEN_FILE)
     return jsonify({"mensaje": "Reset"})
 
-@app.route('/api/planificar_examenes', methods=['POST'])
+@api.route('/api/planificar_examenes', methods=['POST'])
 def planificar_examenes():
-    data = request.get_json()
-    return jsonify(generate_exam_schedule(load_user_profile(), data.get('examenes', [])))
+    data = request.get_json(silent=True) or {}
+    try: examenes = validar_examenes(data.get('examenes', []))
+    except ValueError as e: return jsonify({"error": str(e)}), 400
+    profile = load_user_profile()
+    local = lambda: generate_local_schedule(profile, examenes)
+    if data.get('modo') == 'local': return jsonify(con_plan('examenes')(local()))
+    return responder_job('planificar_examenes', lambda: generate_exam_schedule(profile, examenes, raise_errors=True), respaldo=local,
+                         al_completar=con_plan('examenes'))
 
-@app.route('/api/planificar_crisis', methods=['POST'])
+@api.route('/api/planificar_crisis', methods=['POST'])
 def planificar_crisis():
-    data = request.get_json()
-    return jsonify(generate_crisis_schedule(load_user_profile(), data.get('examenes', [])))
+    data = request.get_json(silent=True) or {}
+    try: examenes = validar_examenes(data.get('examenes', []))
+    except ValueError as e: return jsonify({"error": str(e)}), 400
+    profile = load_user_profile()
+    local = lambda: generate_local_schedule(profile, examenes, crisis=True)
+    if data.get('modo') == 'local': return jsonify(con_plan('crisis')(local()))
+    return responder_job('planificar_crisis', lambda: generate_crisis_schedule(profile, examenes, raise_errors=True), respaldo=local,
+                         al_completar=con_plan('crisis'))
 
-@app.route('/api/dashboard_stats', methods=['GET'])
+@api.route('/api/dashboard_stats', methods=['GET'])
 def dashboard_stats():
     return jsonify(obtener_datos_dashboard())
 
-@app.route('/api/materias', methods=['GET'])
+@api.route('/api/estadisticas/reporte', methods=['GET'])
+def reporte_estadisticas():
+    return jsonify(obtener_reporte_analitico())
+
+@api.route('/api/materias', methods=['GET'])
 def get_materias():
     return jsonify(obtener_materias_unicas())
 
-@app.route('/api/registrar_historial', methods=['POST'])
+@api.route('/api/historial/cache_stats', methods=['GET'])
+def historial_cache_stats():
+    return jsonify(historial_cache.estadisticas())
+
+@api.route('/api/modelo/estado', methods=['GET'])
+def modelo_estado():
+    return jsonify(planificador_entrenamiento.estado())
+
+CAMPOS_PREDICCION = {'materia': 'Materia', 'dia_semana': 'Dia_Semana', 'nivel_energia': 'Nivel_Energia',
+                     'horas_sueno': 'Horas_Sueno', 'lugar_estudio': 'Lugar_Estudio', 'tipo_sesion': 'Tipo_Sesion'}
+
+@api.route('/api/predecir_horas', methods=['POST'])
+def predecir_horas():
+    """Estimación en lote: {"pares": [{"dificultad": 2, "calificacion": 18, "materia": "Calculo"}, ...]}"""
+    try:
+        pares = request.get_json().get('pares', [])
+        if not isinstance(pares, list): return jsonify({'error': 'pares debe ser una lista'}), 400
+        horas = predict_study_hours_batch([
+            {col: p[clave] for clave, col in CAMPOS_PREDICCION.items() if p.get(clave) is not None}
+            | {'Dificultad_Num': p.get('dificultad', 2), 'Calificacion': p.get('calificacion', 20)}
+            for p in pares
+        ])
+        return jsonify({'horas': horas})
+    except (TypeError, ValueError, AttributeError) as e: return jsonify({'error': str(e)}), 400
+
+@api.route('/api/registrar_historial', methods=['POST'])
 def registrar_historial():
     try:
         data = request.get_json()
         materia = data.get('materia', '').strip().title()
         if not materia: return jsonify({'error': 'Falta materia'}), 400
-        
-        df = inicializar_o_cargar_datos()
-        nuevo = pd.DataFrame([{
+        dificultad = str(data.get('dificultad') or 'media').strip().lower()
+        if dificultad not in DIFICULTADES: return jsonify({'error': 'dificultad debe ser baja, media o alta'}), 400
+        # Sin calificación queda vacía (el modelo la toma como la media), no un 0 que aprendería como dato
+        calificacion = data.get('calificacion', data.get('calificacion_deseada'))
+        ahora = datetime.now()
+
+        registrar_sesion({
             'Materia': materia,
             'Horas_Estudio_Real': float(data.get('horas_reales', 0)),
-            'Dificultad_Cat': data.get('dificultad', 'media'),
-            'Dificultad_Num': 2,
+            'Dificultad_Cat': dificultad,
+            'Dificultad_Num': DIFICULTADES[dificultad],
             'Nivel_Energia': data.get('nivel_energia', 3),
             'Cumplio_Objetivo': data.get('cumplio_objetivo', 'sí'),
             'Factor_Bloqueo': data.get('factor_bloqueo', 'Ninguno'),
-            'Calificacion': 0,
+            'Calificacion': None if calificacion in (None, '') else float(calificacion),
             'Horas_Sueno': data.get('horas_sueno', 7),
             'Lugar_Estudio': data.get('lugar_estudio', 'Casa'),
             'Actividad_Fisica': data.get('actividad_fisica', 'Ninguna'),
-            'Dia_Semana': data.get('dia_semana', 'Lunes'),
-            'Fecha': datetime.now().strftime("%Y-%m-%d"),
+            'Dia_Semana': data.get('dia_semana') or DIAS_SEMANA[ahora.weekday()],
+            'Fecha': ahora.strftime("%Y-%m-%d"),
             'Tipo_Sesion': data.get('tipo_sesion', 'Manual')
-        }])
-        
-        pd.concat([df, nuevo], ignore_index=True).to_csv(DATA_FILE, index=False)
-        try: entrenar_modelo()
-        except: pass
+        })
+        # El reentrenamiento lo agenda el planificador en segundo plano (suscrito al store)
         return jsonify({'mensaje': 'Registrado'})
     except Exception as e: return jsonify({'error': str(e)}), 500
 
-@app.route('/api/proyectos', methods=['GET'])
+@api.route('/api/historial/importar', methods=['POST'])
+def importar_historial():
+    """
+    Carga masiva CSV/JSONL: multipart (campo 'archivo') o el cuerpo crudo, parseado en streaming.
+    Query: formato=csv|jsonl (si no, por extensión/Content-Type), estricto=1, separador=;
+    """
+    try:
+        archivo = request.files.get('archivo')
+        stream = archivo.stream if archivo else request.stream
+        formato = detectar_formato(request.args.get('formato'), archivo.filename if archivo else None,
+                                   archivo.content_type if archivo else request.content_type)
+        resultado = importar(stream, formato, estricto=request.args.get('estricto') == '1',
+                             separador=request.args.get('separador', ','))
+        # Un solo append → el planificador agenda un único reentrenamiento
+        return jsonify(resultado), (422 if resultado['estricto'] and resultado['rechazadas'] else 200)
+    except ErrorImportacion as e: return jsonify({'error': str(e)}), 400
+    except Exception as e: return jsonify({'error': str(e)}), 500
+
+@api.route('/api/historial/exportar', methods=['GET'])
+def exportar_historial():
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'jsonl'): return jsonify({'error': 'formato debe ser csv o jsonl'}), 400
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(exportar(formato)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=historial.{formato}'})
+
+@api.route('/api/proyectos', methods=['GET'])
 def get_proyectos(): return jsonify(load_projects())
 
-@app.route('/api/crear_proyecto', methods=['POST'])
+@api.route('/api/crear_proyecto', methods=['POST'])
 def crear_proyecto():
     try:
         data = request.get_json()
         profile = load_user_profile()
-        hitos = generate_project_plan_ai(profile, data)
-        nuevo_proyecto = {
-            "id": datetime.now().strftime("%Y%m%d%H%M%S"),
-            "nombre": data['nombre'], "descripcion": data['descripcion'],
-            "fecha_fin": data['fecha_fin'], "progreso": 0, "hitos": hitos
-        }
-        for h in nuevo_proyecto['hitos']: h['completado'] = False
-        projects = load_projects()
-        projects.append(nuevo_proyecto)
-        save_projects(projects)
-        return jsonify(nuevo_proyecto)
+        def tarea():
+            hitos = generate_project_plan_ai(profile, data, raise_errors=True)
+            nuevo_proyecto = {
+                "nombre": data['nombre'], "descripcion": data['descripcion'],
+                "fecha_fin": data['fecha_fin'], "progreso": 0, "hitos": hitos
+            }
+            for h in nuevo_proyecto['hitos']: h['completado'] = False
+            return nuevo_proyecto
+        return responder_job('crear_proyecto', tarea, al_completar=proyectos_repo.agregar)
     except Exception as e: return jsonify({"error": str(e)}), 500
 
-@app.route('/api/actualizar_hitos', methods=['POST'])
+@api.route('/api/actualizar_hitos', methods=['POST'])
 def actualizar_hitos():
     try:
         data = request.get_json()
-        projects = load_projects()
-        for p in projects:
-            if p['id'] == data['project_id']:
-                p['hitos'] = data['hitos']
-                total = len(p['hitos'])
-                completados = sum(1 for h in p['hitos'] if h.get('completado'))
-                p['progreso'] = int((completados / total) * 100) if total > 0 else 0
-                break
-        save_projects(projects)
+        if proyectos_repo.reemplazar_hitos(data['project_id'], data['hitos']) is None:
+            return jsonify({"error": "Proyecto no encontrado"}), 404
         return jsonify({"mensaje": "Actualizado"})
     except Exception as e: return jsonify({"error": str(e)}), 500
 
-@app.route('/api/eliminar_proyecto', methods=['POST'])
+@api.route('/api/proyectos/<project_id>/hitos', methods=['PATCH'])
+def actualizar_hito(project_id):
+    """Cambia un solo hito: {"indice": 2} o {"hito_id": "..."}; "completado" opcional (si falta, alterna)."""
+    try:
+        data = request.get_json(silent=True) or {}
+        indice = data.get('indice')
+        if indice is not None and (isinstance(indice, bool) or not isinstance(indice, (int, str)) or not str(indice).lstrip('-').isdigit()):
+            return jsonify({"error": "indice debe ser un entero"}), 400
+        hito_id = data.get('hito_id')
+        if hito_id is not None and (isinstance(hito_id, bool) or not isinstance(hito_id, (str, int))):
+            return jsonify({"error": "hito_id debe ser un texto o un entero"}), 400
+        p = proyectos_repo.marcar_hito(project_id, indice=None if indice is None else int(indice),
+                                       hito_id=hito_id, completado=data.get('completado'))
+        if p is None: return jsonify({"error": "Proyecto o hito no encontrado"}), 404
+        return jsonify({"id": p['id'], "progreso": p['progreso']})
+    except Exception as e: return jsonify({"error": str(e)}), 500
+
+@api.route('/api/eliminar_proyecto', methods=['POST'])
 def eliminar_proyecto():
     try:
-        pid = request.get_json().get('id')
-        projects = [p for p in load_projects() if p['id'] != pid]
-        save_projects(projects)
+        proyectos_repo.eliminar(request.get_json().get('id'))
         return jsonify({"mensaje": "Eliminado"})
     except Exception as e: return jsonify({"error": str(e)}), 500
 
 # --- NUEVOS ENDPOINTS: GOOGLE CALENDAR ---
 
-@app.route('/api/google/connect', methods=['GET'])
+@api.route('/api/google/connect', methods=['GET'])
 def google_connect():
-    """Inicia el flujo de autenticación local"""
+    """Devuelve la URL de autorización; el navegador vuelve a /api/google/callback (no bloquea el worker)."""
     if not os.path.exists(CREDENTIALS_FILE):
         return jsonify({"error": "Falta client_secret.json"}), 400
-    
-    flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
-    creds = flow.run_local_server(port=0)
-    
-    with open(TOKEN_FILE, 'w') as token:
-        token.write(creds.to_json())
-        
-    return jsonify({"mensaje": "Conectado", "email": "usuario@gmail.com"}) # Simplificado
+    redirect_uri = os.getenv('GOOGLE_REDIRECT_URI') or request.url_root.rstrip('/') + '/api/google/callback'
+    return jsonify({"auth_url": google_oauth.iniciar(CREDENTIALS_FILE, SCOPES, redirect_uri)})
+
+@api.route('/api/google/callback', methods=['GET'])
+def google_callback():
+    if request.args.get('error'): return Response(f"Autorización cancelada: {request.args['error']}", status=400, mimetype='text/plain')
+    try:
+        google_oauth.completar(CREDENTIALS_FILE, SCOPES, TOKEN_FILE, request.args.to_dict(), request.args.get('state'))
+    except google_oauth.ErrorOAuth as e: return Response(str(e), status=400, mimetype='text/plain')
+    except Exception as e:
+        logging.exception("Error completando OAuth de Google")
+        return Response(f"Error al conectar: {e}", status=502, mimetype='text/plain')
+    if os.getenv('FRONTEND_URL'): return redirect(os.getenv('FRONTEND_URL'))
+    return Response("<p>✅ Conectado a Google Calendar. Ya puedes cerrar esta ventana.</p><script>window.close()</script>", mimetype='text/html')
 
-@app.route('/api/google/status', methods=['GET'])
+@api.route('/api/google/status', methods=['GET'])
 def google_status():
     return jsonify({"conectado": os.path.exists(TOKEN_FILE)})
 
-@app.route('/api/google/sync', methods=['POST'])
+@api.route('/api/google/sync', methods=['POST'])
 def google_sync():
-    """Recibe el horario JSON y lo sube a la nube"""
+    """
+    Sincroniza el horario JSON con la nube: solo el diff respecto a la última sincronización
+    del mismo plan ("plan" del horario o del cuerpo; sin él, el semanal).
+    """
     if not os.path.exists(TOKEN_FILE):
         return jsonify({"error": "No autenticado"}), 401
     
-    creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
-    
     data = request.get_json()
-    horario = data.get('horario', {}).get('planSemanal', [])
+    clave_plan = data.get('plan') or (data.get('horario') or {}).get('plan') or PLAN_POR_DEFECTO
+    if not isinstance(clave_plan, str) or not CLAVE_PLAN_VALIDA.match(clave_plan):
+        return jsonify({"error": "plan debe ser un identificador corto (a-z, 0-9, _ o -)"}), 400
+    # Se revalida/repara antes de subir (parte los bloques nocturnos, reubica los solapados);
+    # lo que sigue marcado con conflicto (inválido, solapado sin hueco...) no se sube
+    horario = validar_plan(data.get('horario', {}), load_user_profile())
+    eventos = [i for i in horario['planSemanal'] if not i.get('conflicto')]
+    try:
+        resultado = sincronizar_plan(obtener_servicio(TOKEN_FILE, SCOPES), eventos, clave_plan)
+    except Exception as e:
+        logging.exception("Error sincronizando con Google Calendar")
+        return jsonify({"error": str(e)}), 502
     
-    contador = 0
-    for item in horario:
-        try:
-            # Construir fechas ISO (Asumiendo hora local)
-            # Formato fecha: YYYY-MM-DD, Formato hora: HH:MM
-            start_dt = f"{item['fecha']}T{item['hora_inicio']}:00"
-            end_dt = f"{item['fecha']}T{item['hora_fin']}:00"
-            
-            # Definir color según tipo (ID de colores de Google Calendar: 1-11)
-            color_id = '1' # Lavanda (Default)
-            tipo = item.get('tipo', 'Estudio')
-            if tipo == 'Examen' or tipo == 'Crisis': color_id = '11' # Rojo
-            elif tipo == 'Trabajo': color_id = '8' # Gris
-            elif tipo == 'Estudio': color_id = '9' # Azul oscuro
-            elif tipo == 'Proyecto': color_id = '7' # Azul pavo
-            
-            event = {
-                'summary': f"📚 {item['actividad']}",
-                'description': f"Generado por Asistente UPN.\nTipo: {tipo}\nPrioridad: {item.get('prioridad','Normal')}",
-                'start': {'dateTime': start_dt, 'timeZone': 'America/Lima'}, # Ajusta tu zona horaria
-                'end': {'dateTime': end_dt, 'timeZone': 'America/Lima'},
-                'colorId': color_id,
-                'reminders': {
-                    'useDefault': False,
-                    'overrides': [
-                        {'method': 'popup', 'minutes': 15},
-                    ],
-                },
-            }
-            
-            service.events().insert(calendarId='primary', body=event).execute()
-            contador += 1
-        except Exception as e:
-            print(f"Error subiendo evento: {e}")
-            
-    return jsonify({"mensaje": f"¡Éxito! {contador} eventos sincronizados con tu nube."})
+    contador = sum(1 for r in resultado['resultados'] if r['ok'] and r['accion'] != 'eliminado')
+    return jsonify({"mensaje": f"¡Éxito! {contador} eventos sincronizados con tu nube.", "conflictos": horario['conflictos'],
+                    "omitidos": [i for i in horario['planSemanal'] if i.get('conflicto')], **resultado})
+
+# --- APLICACIÓN ---
+def create_app(precalentar=False):
+    """
+    Fábrica de la app; el módulo construye una sola instancia (`app`), que reutilizan wsgi.py y
+    el servidor de desarrollo. El estado compartido entre workers vive en disco (historial,
+    perfil, chat, proyectos, jobs) con escrituras atómicas bajo bloqueo_archivo; cachés y
+    métricas son por proceso.
+    Detrás de un proxy inverso, PROXY_SALTOS=N confía en N cabeceras X-Forwarded-* (esquema,
+    host) para que request.url_root sea la URL pública (https) y no la interna.
+    """
+    aplicacion = Flask(__name__)
+    saltos = int(os.getenv('PROXY_SALTOS', 0))
+    if saltos:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        aplicacion.wsgi_app = ProxyFix(aplicacion.wsgi_app, x_for=saltos, x_proto=saltos, x_host=saltos, x_prefix=saltos)
+    CORS(aplicacion, resources={r"/api/*": {"origins": "*"}})
+    aplicacion.register_blueprint(api)
+    _registrar_metricas()
+    if precalentar: precalentar_en_segundo_plano()
+    return aplicacion
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Servidor de desarrollo; en producción: gunicorn -c gunicorn.conf.py wsgi:app
+    if os.getenv('PRECALENTAR', '1') != '0': precalentar_en_segundo_plano()
+    app.run(debug=os.getenv('FLASK_DEBUG', '1') == '1', port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
@@ -0,0 +1,7 @@
+# wsgi.py - Punto de entrada de producción: gunicorn -c gunicorn.conf.py wsgi:app
+# Reutiliza la app que ya construye main (una sola por worker) y solo añade el precalentamiento.
+import os
+
+from main import app, precalentar_en_segundo_plano
+
+if os.getenv('PRECALENTAR', '1') != '0': precalentar_en_segundo_plano()